@@ -1,16 +1,22 @@
 # Basic outline for app.py
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_marshmallow import Marshmallow
 from dotenv import find_dotenv, load_dotenv
-from server.database import db
+from server.database import init_database
+from server.passwords import passwords
+from server.cache import cache
+from server.metrics import metrics
+from server.jobs import jobs
+from server.ratelimit import limiter
 import os
 
 
-# Import Seed Data function from server/__main__.py
-from seed_data.main import seedData
+# Import CLI Commands
+from server.commands import register_commands
 
 
 # Import Environment Variables
@@ -22,20 +28,110 @@ if ENV_FILE:
 # Create Instance of Flask App
 ma = Marshmallow()
 
+# Building an app never touches the database - schema changes and seeding are explicit commands:
+    # flask migrate, flask seed / flask generate-fixtures, flask serve
 def create_app():
     app = Flask(__name__)
     CORS(app)
 
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite'   
+    # Database: a local SQLite file by default, or a server database (e.g. postgresql://) shared by several nodes
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///db.sqlite')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Connection pool per process: size, extra connections under load, seconds to wait for one,
+    # seconds before a connection is replaced, and a liveness check before each checkout
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+    # SQLite only: WAL journal (readers don't block on writers) and seconds to wait for the write lock
+    app.config['SQLITE_WAL'] = os.getenv('SQLITE_WAL', 'true').lower() == 'true'
+    app.config['SQLITE_BUSY_TIMEOUT'] = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET')
 
+    # bcrypt cost factor and number of threads hashing passwords (defaults to one per core)
+    app.config['BCRYPT_ROUNDS'] = int(os.getenv('BCRYPT_ROUNDS', 12))
+    app.config['PASSWORD_WORKERS'] = int(os.getenv('PASSWORD_WORKERS', 0)) or None
+
+    # Relationship loading strategy for serialized listings ('subquery', 'select', 'joined' or 'lazy')
+        # LOADING_STRATEGIES overrides the default per route, keyed by endpoint name
+    app.config['LOADING_STRATEGY'] = os.getenv('LOADING_STRATEGY', 'subquery')
+    app.config['LOADING_STRATEGIES'] = {}
+
+    # Default and maximum page size for cursor-paginated listings
+    app.config['PAGE_SIZE'] = int(os.getenv('PAGE_SIZE', 50))
+    app.config['MAX_PAGE_SIZE'] = int(os.getenv('MAX_PAGE_SIZE', 500))
+
+    # Opening hours, slot granularity (minutes) and longest date range for availability lookups
+    app.config['BUSINESS_HOURS'] = (os.getenv('OPENING_TIME', '09:00'), os.getenv('CLOSING_TIME', '17:00'))
+    app.config['SLOT_INTERVAL'] = int(os.getenv('SLOT_INTERVAL', 30))
+    app.config['MAX_AVAILABILITY_DAYS'] = int(os.getenv('MAX_AVAILABILITY_DAYS', 31))
+
+    # Longest date range of one business statistics request
+    app.config['MAX_STATS_DAYS'] = int(os.getenv('MAX_STATS_DAYS', 366))
+
+    # Largest radius (km) of one nearby business search
+    app.config['MAX_NEARBY_RADIUS'] = float(os.getenv('MAX_NEARBY_RADIUS', 100))
+
+    # Rows read and written at a time by streaming exports
+    app.config['STREAM_BATCH_SIZE'] = int(os.getenv('STREAM_BATCH_SIZE', 1000))
+
+    # Most appointments accepted by one batch request
+    app.config['BATCH_LIMIT'] = int(os.getenv('BATCH_LIMIT', 1000))
+
+    # Response cache for catalog routes: 'memory' (per process), 'sqlite' (shared by workers on one node) or 'none'
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+    app.config['CACHE_TTL'] = int(os.getenv('CACHE_TTL', 60))
+    app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+    app.config['CACHE_PATH'] = os.getenv('CACHE_PATH')
+
+    # Request metrics at /metrics; requests slower than SLOW_REQUEST_MS or running more than
+        # MAX_REQUEST_QUERIES statements are logged with their slowest statements
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['SLOW_REQUEST_MS'] = int(os.getenv('SLOW_REQUEST_MS', 500))
+    app.config['MAX_REQUEST_QUERIES'] = int(os.getenv('MAX_REQUEST_QUERIES', 20))
+
+    # Background jobs (notifications) in a local SQLite queue shared by the workers on one node: worker threads
+        # per process (0 leaves them to `flask run-jobs`), attempts per job and seconds before the first retry
+    app.config['JOBS_PATH'] = os.getenv('JOBS_PATH')
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))
+    app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+    app.config['JOB_RETRY_DELAY'] = int(os.getenv('JOB_RETRY_DELAY', 30))
+
+    # Notification delivery ('log' or 'none') and the hour after which next-day reminders go out (-1 disables)
+    app.config['NOTIFIER'] = os.getenv('NOTIFIER', 'log')
+    app.config['REMINDER_HOUR'] = int(os.getenv('REMINDER_HOUR', 18))
+
+    # Rate limits for login, signup and booking: 'memory' (per process), 'sqlite' (shared by workers on one node)
+        # or 'none'; RATE_LIMITS overrides the defaults, e.g. 'login.ip=5/minute,booking.account=off'
+    app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    app.config['RATE_LIMIT_PATH'] = os.getenv('RATE_LIMIT_PATH')
+    app.config['RATE_LIMITS'] = os.getenv('RATE_LIMITS')
+
+    # Requests per process allowed to wait on bcrypt (default twice PASSWORD_WORKERS) and to book at once
+        # (default DB_POOL_SIZE) - further requests get a 503 instead of queueing; -1 removes the cap
+    app.config['MAX_PASSWORD_REQUESTS'] = int(os.getenv('MAX_PASSWORD_REQUESTS', 0))
+    app.config['MAX_BOOKING_REQUESTS'] = int(os.getenv('MAX_BOOKING_REQUESTS', 0))
+
+    # Reverse proxies in front of the app - their X-Forwarded-For header gives the client IP used by rate limits
+    app.config['TRUSTED_PROXIES'] = int(os.getenv('TRUSTED_PROXIES', 0))
+
     jwt = JWTManager(app)
 
-    db.init_app(app)
+    init_database(app)
     ma.init_app(app)
+    passwords.init_app(app)
+    cache.init_app(app)
+    metrics.init_app(app)
+    jobs.init_app(app)
+    limiter.init_app(app)
 
-    # Import Routes
+    if app.config['TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+
+    # Import Routes - blueprints (and the models they use) load only when an app is built
     from server.routes import user, business, auth
 
     # Routes
@@ -43,17 +139,13 @@ def create_app():
     app.register_blueprint(user, url_prefix='/user')
     app.register_blueprint(business, url_prefix='/business')
 
-    with app.app_context():
-        db.create_all()
-        seedData()
+    # Commands: migrate, seed, generate-fixtures, serve, run-jobs, send-reminders, complete-appointments, rebuild-stats, import-geocodes
+    register_commands(app)
 
     return app
 
-# Database Setup
-app = create_app()
-
 
 
-# Run the application
+# Run the development server - run `flask migrate` first; production uses `flask serve`
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,83 @@
+# Booking Race Benchmark
+    # Fires parallel bookings at the same slot and checks exactly one wins,
+    # while bookings for other businesses made at the same time all succeed
+    # Run from the repository root: python -m benchmarks.booking_race
+
+
+# Import dependencies
+import os, sys, tempfile, threading, time
+import server.booking
+from flask_jwt_extended import create_access_token
+from benchmarks.common import make_app, populate
+
+# Number of clients racing for the same slot and number of other businesses booked concurrently
+RACERS = 32
+OTHER_BUSINESSES = 16
+
+# Pause between the overlap check and the insert - without the booking lock this lets racers double-book
+RACE_WINDOW = 0.01
+
+
+# Slow Find Conflict: Holds the race window open after every overlap check
+find_conflict = server.booking.find_conflict
+
+def slow_find_conflict(*args, **kwargs):
+    conflict = find_conflict(*args, **kwargs)
+    time.sleep(RACE_WINDOW)
+    return conflict
+
+
+def main():
+    server.booking.find_conflict = slow_find_conflict
+
+    path = os.path.join(tempfile.mkdtemp(), 'booking_race.sqlite')
+    app = make_app(f'sqlite:///{path}')
+
+    with app.app_context():
+        populate(OTHER_BUSINESSES + 1, appointments_per_business=0, users=RACERS + OTHER_BUSINESSES)
+
+        # Access token per user - booking routes only accept the booking user's token
+        tokens = {user_id: create_access_token(identity=str(user_id)) for user_id in range(1, RACERS + OTHER_BUSINESSES + 1)}
+
+    barrier = threading.Barrier(RACERS + OTHER_BUSINESSES)
+    results = {'race': [], 'other': []}
+
+    # Book: Waits for every client, then books one slot
+    def book(kind, user_id, business_id):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post(f'/user/{user_id}/appointments', headers={'Authorization': f'Bearer {tokens[user_id]}'}, json={
+            'date': '2024-06-03',
+            'time': '10:00',
+            'business_id': business_id,
+            # Services are numbered 3 per business in populate()
+            'service_id': (business_id - 1) * 3 + 1,
+            'notes': None
+        })
+        results[kind].append(response.status_code)
+
+    threads = [threading.Thread(target=book, args=('race', i, 1)) for i in range(1, RACERS + 1)]
+    threads += [threading.Thread(target=book, args=('other', RACERS + i, i + 1)) for i in range(1, OTHER_BUSINESSES + 1)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        from server.models import Appointment
+        booked = Appointment.query.filter_by(business_id=1).count()
+
+    wins = results['race'].count(200)
+    print(f'{RACERS} racers for one slot: {wins} booked, {results["race"].count(409)} conflicts, statuses {sorted(set(results["race"]))}')
+    print(f'{OTHER_BUSINESSES} other businesses: {results["other"].count(200)} booked')
+    print(f'rows for contested business: {booked}, elapsed {elapsed:.2f}s')
+
+    ok = wins == 1 and booked == 1 and results['other'].count(200) == OTHER_BUSINESSES
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
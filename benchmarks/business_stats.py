@@ -0,0 +1,122 @@
+# Business Statistics Benchmark
+    # Loads appointments, changes them through every write path (booking, batch cancel, reschedule, status sweep,
+    # delete) and checks the incrementally maintained rollup matches one rebuilt from scratch
+    # Then times /business/<id>/stats over a year against aggregating the appointment rows directly
+    # Run from the repository root: python -m benchmarks.business_stats [appointments]
+
+
+# Import dependencies
+import os, statistics, sys, tempfile, time
+from datetime import date
+from unittest import mock
+from sqlalchemy import text
+from server.database import db
+from server.models import Appointment, User
+from server.tokens import create_user_token
+from server.lifecycle import complete_past_appointments
+from server.derived import rebuild_all
+from server.stats import STATS_TABLE, STATS_ROLLUP
+from benchmarks.common import make_app, populate, QueryCounter
+
+# Businesses in the dataset - few, so each has a long history
+BUSINESSES = 100
+
+# Business whose statistics are measured, and requests timed per mode
+STATS_BUSINESS = 42
+REQUESTS = 30
+
+
+# Snapshot: Returns every rollup row in key order
+def snapshot():
+    return db.session.execute(text(f'SELECT * FROM {STATS_TABLE} ORDER BY business_id, date, service_id')).all()
+
+
+# Measure: Returns the median latency (ms) and statements per request of a year of statistics
+def measure(client):
+    timings = []
+    with QueryCounter(db.engine) as counter:
+        for _ in range(REQUESTS):
+            started = time.perf_counter()
+            response = client.get(f'/business/{STATS_BUSINESS}/stats?start=2024-01-01&end=2024-12-31')
+            timings.append((time.perf_counter() - started) * 1000)
+    if response.status_code != 200:
+        raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return statistics.median(timings), counter.count / REQUESTS, response.get_json()
+
+
+def main():
+    appointments = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    path = os.path.join(tempfile.mkdtemp(), 'business_stats.sqlite')
+    app = make_app(f'sqlite:///{path}', {'CACHE_BACKEND': 'none'})
+    client = app.test_client()
+    failures = []
+
+    with app.app_context():
+        started = time.perf_counter()
+        populate(BUSINESSES, appointments_per_business=appointments // BUSINESSES, users=BUSINESSES * 10)
+        print(f'Loaded {appointments} appointments in {time.perf_counter() - started:.1f}s')
+
+        # Write paths: every fifth appointment of the business is cancelled, the first is moved to another
+        # service and day, past appointments are completed, and a few are deleted
+        ids = [id for id, in db.session.query(Appointment.id).filter_by(business_id=STATS_BUSINESS).order_by(Appointment.id)]
+        service_id = (STATS_BUSINESS - 1) * 3 + 1
+
+        # Batch bookings act for the token's user - the moved appointment's owner, and user 1 for the new one
+        def token(user_id):
+            return {'Authorization': f'Bearer {create_user_token(db.session.get(User, user_id))}'}
+        owner, booker = token(db.session.get(Appointment, ids[1]).user_id), token(1)
+
+        # Batch cancels act for the token's user too, so the cancelled appointments are sent one batch per owner
+        cancels = {}
+        for id, user_id in db.session.query(Appointment.id, Appointment.user_id).filter(Appointment.id.in_(ids[::5])):
+            cancels.setdefault(user_id, []).append(id)
+        cancels = [(token(user_id), cancelled) for user_id, cancelled in cancels.items()]
+
+    for headers, cancelled in cancels:
+        response = client.post(f'/business/{STATS_BUSINESS}/appointments/batch/cancel', headers=headers, json={'ids': cancelled})
+        if response.get_json()['failed']:
+            failures.append('batch cancel failed')
+            break
+    client.put(f'/business/{STATS_BUSINESS}/appointments/batch', headers=owner, json={'appointments': [
+        {'id': ids[1], 'date': '2024-12-30', 'time': '08:00', 'service_id': service_id + 2}
+    ]})
+    client.post(f'/business/{STATS_BUSINESS}/appointments/batch', headers=booker, json={'appointments': [
+        {'user_id': 1, 'service_id': service_id, 'date': '2024-12-31', 'time': '08:00'}
+    ]})
+
+    with app.app_context():
+        complete_past_appointments(date(2024, 6, 1))
+        Appointment.query.filter(Appointment.id.in_(ids[2:5])).delete(synchronize_session=False)
+        db.session.commit()
+
+        incremental = snapshot()
+        rebuild_all(STATS_ROLLUP)
+        rebuilt = snapshot()
+    print(f'rollup: {len(incremental)} rows kept incrementally, {len(rebuilt)} rebuilt, '
+          f'{"identical" if incremental == rebuilt else "DIFFERENT"}')
+    if incremental != rebuilt:
+        failures.append('incrementally maintained rollup differs from a rebuild')
+
+    with app.app_context():
+        rollup_ms, rollup_queries, rollup = measure(client)
+        # Without the rollup the same statistics aggregate every appointment in the range
+        with mock.patch.object(STATS_ROLLUP, 'enabled', lambda: False):
+            direct_ms, direct_queries, direct = measure(client)
+
+    print(f'{"mode":24s} {"p50 ms":>8s} {"queries":>8s}')
+    print(f'{"rollup":24s} {rollup_ms:8.2f} {rollup_queries:8g}')
+    print(f'{"aggregate appointments":24s} {direct_ms:8.2f} {direct_queries:8g}')
+    totals = rollup['totals']
+    print(f'totals: {totals["bookings"]} bookings, {totals["cancelled"]} cancelled ({totals["cancellation_rate"]:.1%}), '
+          f'{totals["completed"]} completed, revenue {totals["revenue"]:.2f}')
+    if rollup != direct:
+        failures.append('rollup and direct aggregation disagree')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    print('FAILED' if failures else 'OK')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
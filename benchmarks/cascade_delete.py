@@ -0,0 +1,67 @@
+# Cascading Delete Benchmark
+    # Deletes a business with 100k appointments through DELETE /business/<id> and counts the statements issued,
+    # then deletes a business of the same size the old way (one ORM delete per loaded appointment) for comparison
+    # Run from the repository root: python -m benchmarks.cascade_delete [appointments]
+
+
+# Import dependencies
+import os, sys, tempfile, time
+from server.database import db
+from server.models import Appointment, Service, Business
+from benchmarks.common import make_app, populate, QueryCounter
+
+# Most statements a set-based business delete may issue, including the existence check
+MAX_STATEMENTS = 10
+
+
+# Legacy Delete: Deletes a business the way the route used to, loading every appointment into the session
+def legacy_delete(business_id):
+    for appointment in Appointment.query.filter_by(business_id=business_id).all():
+        db.session.delete(appointment)
+    for service in Service.query.filter_by(business_id=business_id).all():
+        db.session.delete(service)
+    db.session.delete(db.session.get(Business, business_id))
+    db.session.commit()
+
+
+# Remaining: Returns the rows left behind for a business, per table
+def remaining(business_id):
+    return (
+        Appointment.query.filter_by(business_id=business_id).count(),
+        Service.query.filter_by(business_id=business_id).count(),
+        Business.query.filter_by(id=business_id).count(),
+    )
+
+
+def main():
+    appointments = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    path = os.path.join(tempfile.mkdtemp(), 'cascade_delete.sqlite')
+    app = make_app(f'sqlite:///{path}')
+
+    with app.app_context():
+        populate(2, appointments_per_business=appointments, users=1000)
+        client = app.test_client()
+
+        with QueryCounter(db.engine) as counter:
+            started = time.perf_counter()
+            response = client.delete('/business/1')
+            set_based = time.perf_counter() - started
+        statements = counter.count
+
+        with QueryCounter(db.engine) as counter:
+            started = time.perf_counter()
+            legacy_delete(2)
+            legacy = time.perf_counter() - started
+
+        left = remaining(1)
+
+    print(f'set-based: {statements:6d} statements  {set_based:8.2f}s  (status {response.status_code})')
+    print(f'legacy:    {counter.count:6d} statements  {legacy:8.2f}s')
+
+    ok = response.status_code == 200 and statements <= MAX_STATEMENTS and left == (0, 0, 0)
+    print('OK' if ok else f'FAILED - rows left (appointments, services, business): {left}')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
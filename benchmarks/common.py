@@ -0,0 +1,90 @@
+# Benchmark Helpers
+    # Builds an app against a throwaway database and fills it with synthetic rows
+
+
+# Import dependencies
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from sqlalchemy import event
+from server.database import init_database
+from server.derived import create_all
+from server.migrations import migrate
+from server.passwords import passwords
+from server.cache import cache
+from server.jobs import jobs
+from server.ratelimit import limiter
+import os, tempfile
+
+# Import Synthetic Data Generator
+from seed_data.generate import generate_fixtures
+
+# Precomputed bcrypt hash of 'password' - synthetic rows skip hashing entirely
+PASSWORD_HASH = '$2b$04$7MNnhdrm4ISzVD3e3z4IKO485cfwSKqo8mDPhJ15BSLIIsEekQdXS'
+
+
+# Make App: Creates an app with every blueprint registered and an empty schema
+def make_app(uri='sqlite://', config=None):
+    app = Flask('booksy-benchmarks')
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET_KEY'] = 'booksy-benchmark-secret-key-0123456789'
+    app.config['BCRYPT_ROUNDS'] = 4
+    # Jobs are queued in a throwaway file and not run unless JOB_WORKERS is set
+    app.config['JOBS_PATH'] = os.path.join(tempfile.mkdtemp(), 'jobs.sqlite')
+    app.config['JOB_WORKERS'] = 0
+    # Every request comes from one client and races run many at once - limits and caps are off unless set
+    app.config['RATE_LIMIT_BACKEND'] = 'none'
+    app.config['MAX_PASSWORD_REQUESTS'] = -1
+    app.config['MAX_BOOKING_REQUESTS'] = -1
+    app.config.update(config or {})
+
+    JWTManager(app)
+    init_database(app)
+    passwords.init_app(app)
+    cache.init_app(app)
+    jobs.init_app(app)
+    limiter.init_app(app)
+
+    # Import Routes
+    from server.routes import user, business, auth
+
+    # Routes
+    app.register_blueprint(auth, url_prefix='/auth')
+    app.register_blueprint(user, url_prefix='/user')
+    app.register_blueprint(business, url_prefix='/business')
+
+    with app.app_context():
+        migrate()
+        create_all()
+
+    return app
+
+
+# Populate: Bulk inserts synthetic businesses, services, users and appointments
+    # Service s of business b has ID (b - 1) * services_per_business + s; appointments fill hourly slots from 09:00
+def populate(businesses, services_per_business=3, appointments_per_business=10, users=None):
+    return generate_fixtures(
+        users=users or max(businesses, 1),
+        businesses=businesses,
+        appointments=businesses * appointments_per_business if services_per_business else 0,
+        services_per_business=services_per_business,
+        password_hash=PASSWORD_HASH
+    )
+
+
+# Query Counter: Counts SQL statements executed against the engine while active
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
@@ -0,0 +1,114 @@
+# Load Test
+    # Serves a synthetic database with gunicorn at several worker counts and measures requests per second
+    # Clients run in separate processes with keep-alive connections, so the load generator is not the bottleneck
+    # Run from the repository root: python -m benchmarks.load_test [workers,...] [seconds] [clients]
+    # Throughput scales with workers up to the number of cores on the machine
+
+
+# Import dependencies
+import http.client, os, signal, socket, subprocess, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.common import make_app, populate
+
+# Read-only routes cycled through by every client
+PATHS = ['/business/all?limit=20', '/business/7', '/business/7/services', '/business/search?query=braid', '/user/all?limit=20']
+
+HOST = '127.0.0.1'
+
+
+# Free Port: Returns a port nothing is listening on
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+# Wait Until Ready: Blocks until the server accepts connections
+def wait_until_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('Server did not start')
+
+
+# Client: Sends requests over one keep-alive connection for the given seconds and returns (latencies, errors)
+def client(port, seconds, offset):
+    connection = http.client.HTTPConnection(HOST, port, timeout=10)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + seconds
+    i = offset
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request('GET', PATHS[i % len(PATHS)])
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(HOST, port, timeout=10)
+        latencies.append(time.perf_counter() - started)
+        i += 1
+    connection.close()
+    return latencies, errors
+
+
+# Run: Starts gunicorn with the given workers, applies load and returns (requests/s, p50 ms, p99 ms, errors)
+def run(workers, database_url, seconds, clients):
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        WEB_CONCURRENCY=str(workers),
+        BIND=f'{HOST}:{port}',
+        ACCESS_LOG='',
+        CACHE_BACKEND='none',
+        JWT_SECRET='booksy-benchmark-secret-key-0123456789',
+    )
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], env=env)
+    try:
+        wait_until_ready(port)
+        # Warm up every worker before measuring
+        client(port, 1, 0)
+
+        with ProcessPoolExecutor(clients) as pool:
+            results = list(pool.map(client, [port] * clients, [seconds] * clients, range(clients)))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return len(latencies) / seconds, percentile(0.5), percentile(0.99), errors
+
+
+def main():
+    worker_counts = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1, 2, 4]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    path = os.path.join(tempfile.mkdtemp(), 'load_test.sqlite')
+    database_url = f'sqlite:///{path}'
+    app = make_app(database_url)
+    with app.app_context():
+        populate(1000, appointments_per_business=20, users=5000)
+
+    print(f'{clients} clients, {seconds:.0f}s per run, {os.cpu_count()} cores')
+    failed = False
+    for workers in worker_counts:
+        throughput, p50, p99, errors = run(workers, database_url, seconds, clients)
+        failed = failed or errors > 0
+        print(f'{workers:3d} workers: {throughput:8.1f} req/s   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms   {errors} errors')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
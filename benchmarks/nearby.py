@@ -0,0 +1,148 @@
+# Nearby Search Benchmark
+    # Loads geocoded businesses around six cities and times /business/nearby with the R*Tree against the
+    # (latitude, longitude) index used on server databases and a scan of every business
+    # Checks each page matches a brute force distance sort, that the service filter and paging agree with it,
+    # that moved businesses are re-indexed, and that a search across the antimeridian finds both sides
+    # Run from the repository root: python -m benchmarks.nearby [businesses]
+
+
+# Import dependencies
+import os, statistics, sys, tempfile, time
+from unittest import mock
+from server.database import db
+from server.models import Business, Service
+from server.geo import distance_km, LOCATION_INDEX
+from benchmarks.common import make_app, populate, QueryCounter
+
+# Search point (downtown Chicago), radius (km) and requests timed per mode
+LAT, LNG, RADIUS = 41.8781, -87.6298, 5
+REQUESTS = 30
+
+# A rural point on Denver's and Baltimore's latitudes - an index on (latitude, longitude) reads both cities'
+# businesses to find none, while the R*Tree reads only the empty box
+RURAL_LAT, RURAL_LNG, RURAL_RADIUS = 39.5, -90.0, 50
+
+# Service name searched with the filter - generated businesses of one city all offer the same services,
+# so every other one gets this service in place of its facial
+SERVICE = 'Brow Lamination'
+
+
+# Brute Force: Returns (distance, id) of every business within the radius, nearest first, reading every row
+def brute_force(lat, lng, radius, service=None):
+    query = db.session.query(Business.id, Business.latitude, Business.longitude).filter(Business.latitude.isnot(None))
+    if service:
+        query = query.filter(Business.services.any(Service.name.ilike(f'%{service}%')))
+    return sorted(
+        (round(distance, 3), id) for id, distance in
+        ((id, distance_km(lat, lng, latitude, longitude)) for id, latitude, longitude in query)
+        if distance <= radius
+    )
+
+
+# Fetch All: Follows next cursors and returns (distance, id) of every result
+def fetch_all(client, url):
+    results, after = [], None
+    while True:
+        body = client.get(url + (f'&after={after}' if after else '')).get_json()
+        results += [(business['distance_km'], business['id']) for business in body['results']]
+        after = body['next_cursor']
+        if not after:
+            return results
+
+
+# Measure: Returns the median latency (ms), statements per request and first page of one nearby search
+def measure(client, url):
+    timings = []
+    with QueryCounter(db.engine) as counter:
+        for _ in range(REQUESTS):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+    if response.status_code != 200:
+        raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return statistics.median(timings), counter.count / REQUESTS, response.get_json()
+
+
+def main():
+    businesses = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    path = os.path.join(tempfile.mkdtemp(), 'nearby.sqlite')
+    app = make_app(f'sqlite:///{path}', {'CACHE_BACKEND': 'none'})
+    client = app.test_client()
+    failures = []
+
+    with app.app_context():
+        started = time.perf_counter()
+        populate(businesses, appointments_per_business=0)
+        db.session.query(Service).filter(Service.name == 'Facial', Service.business_id % 4 == 0).update({'name': SERVICE})
+        db.session.commit()
+        print(f'Loaded {businesses} businesses in {time.perf_counter() - started:.1f}s')
+
+        expected = brute_force(LAT, LNG, RADIUS)
+        expected_service = brute_force(LAT, LNG, RADIUS, SERVICE)
+    print(f'{len(expected)} businesses within {RADIUS} km, {len(expected_service)} offering {SERVICE}')
+
+    url = f'/business/nearby?lat={LAT}&lng={LNG}&radius={RADIUS}&fields=id,name&limit=20'
+    rural_url = f'/business/nearby?lat={RURAL_LAT}&lng={RURAL_LNG}&radius={RURAL_RADIUS}&fields=id,name&limit=20'
+    with app.app_context():
+        rtree_ms, rtree_queries, rtree = measure(client, url)
+        rural_rtree_ms, _, rural = measure(client, rural_url)
+        # Server databases read the bounding box through the (latitude, longitude) index
+        with mock.patch.object(LOCATION_INDEX, 'enabled', lambda: False):
+            index_ms, index_queries, indexed = measure(client, url)
+            rural_index_ms, _, _ = measure(client, rural_url)
+        # A scan reads every business and computes every distance
+        timings = []
+        for _ in range(REQUESTS):
+            started = time.perf_counter()
+            brute_force(LAT, LNG, RADIUS)
+            timings.append((time.perf_counter() - started) * 1000)
+        scan_ms = statistics.median(timings)
+
+    print(f'{"mode":24s} {"city ms":>8s} {"rural ms":>9s} {"queries":>8s}')
+    print(f'{"r*tree":24s} {rtree_ms:8.2f} {rural_rtree_ms:9.2f} {rtree_queries:8g}')
+    print(f'{"lat/lng index":24s} {index_ms:8.2f} {rural_index_ms:9.2f} {index_queries:8g}')
+    print(f'{"scan every business":24s} {scan_ms:8.2f} {scan_ms:9.2f} {1:8g}')
+    if rural['results']:
+        failures.append('rural search found businesses')
+
+    first_page = [(business['distance_km'], business['id']) for business in rtree['results']]
+    if first_page != expected[:20] or indexed != rtree:
+        failures.append('first page differs from the brute force result')
+
+    # Every page, with and without the service filter, against the brute force result
+    if fetch_all(client, f'/business/nearby?lat={LAT}&lng={LNG}&radius={RADIUS}&fields=id&limit=100') != expected:
+        failures.append('paged results differ from the brute force result')
+    if fetch_all(client, f'/business/nearby?lat={LAT}&lng={LNG}&radius={RADIUS}&service={SERVICE.split()[0].lower()}&fields=id&limit=100') != expected_service:
+        failures.append('service filtered results differ from the brute force result')
+
+    # A business moved next to the search point is found at its new location
+    moved = expected[-1][1] if expected else 1
+    client.put(f'/business/{moved}/update', json={'latitude': LAT, 'longitude': LNG + 0.00001})
+    body = client.get(f'/business/nearby?lat={LAT}&lng={LNG}&radius=0.01&fields=id').get_json()
+    if [business['id'] for business in body['results']] != [moved]:
+        failures.append('moved business is not found at its new location')
+
+    # Businesses either side of the antimeridian, searched from one side
+    for lng in (179.999, -179.999):
+        client.post('/business/new', json={
+            'name': f'Dateline {lng}', 'address': '1 Dateline Rd', 'city': 'Suva', 'state': 'FJ',
+            'phone_number': f'{lng}', 'email': f'dateline{lng}@example.com', 'password': 'password',
+            'latitude': -17.0, 'longitude': lng
+        })
+    body = client.get('/business/nearby?lat=-17&lng=179.9999&radius=5&fields=name').get_json()
+    print(f'antimeridian: {len(body["results"])} of 2 businesses found')
+    if len(body['results']) != 2:
+        failures.append('search across the antimeridian misses businesses')
+
+    for url in ('/business/nearby?lng=1', '/business/nearby?lat=1&lng=1&radius=1000', '/business/nearby?lat=95&lng=1'):
+        if client.get(url).status_code != 400:
+            failures.append(f'{url} is not rejected')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    print('FAILED' if failures else 'OK')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# Notification Pipeline Benchmark
+    # Books appointments while a slow notifier (SLOW_SEND seconds per message, like a mail provider) is configured
+    # and compares booking latency with no notifications, notifications queued for the background workers,
+    # and the same notifications sent on the request thread
+    # Then checks that every queued confirmation is delivered, that failing deliveries are retried with backoff,
+    # and that next-day reminders are sent as one batch per business with a constant number of statements each
+    # Run from the repository root: python -m benchmarks.notifications
+
+
+# Import dependencies
+import os, statistics, sys, tempfile, threading, time
+from datetime import date, time as clock_time, timedelta
+from server.database import db
+from server.models import User, Appointment
+from server.tokens import create_user_token
+from server.jobs import jobs
+import server.notifications as notifications
+from benchmarks.common import make_app, populate, QueryCounter
+
+# Seconds the simulated provider takes per message, and bookings measured per mode
+SLOW_SEND = 0.02
+BOOKINGS = 100
+
+# Businesses with appointments tomorrow, and reminders per business
+REMINDER_BUSINESSES = 20
+REMINDERS_PER_BUSINESS = 8
+
+# Deliveries that fail before the retried job succeeds
+FAILURES = 2
+
+
+# Outbox: Notifier recording every batch it is handed, optionally failing the first few calls
+class Outbox:
+    def __init__(self, delay=0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, messages):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError('provider unavailable')
+        time.sleep(self.delay * len(messages))
+        with self.lock:
+            self.batches.append(messages)
+
+    @property
+    def messages(self):
+        return [message for batch in self.batches for message in batch]
+
+
+# Wait Until: Polls a condition until it holds or the timeout passes
+def wait_until(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+# Measure Bookings: Books BOOKINGS appointments on fresh days and returns the median latency in ms
+    # inline sends each confirmation on the request thread, as a synchronous implementation would
+def measure_bookings(app, first_day, inline=False):
+    client = app.test_client()
+    with app.app_context():
+        user = db.session.get(User, 1)
+        headers = {'Authorization': f'Bearer {create_user_token(user)}'}
+
+    timings = []
+    for i in range(BOOKINGS):
+        day = first_day + timedelta(days=i)
+        started = time.perf_counter()
+        response = client.post('/user/1/appointments', headers=headers, json={
+            'date': day.isoformat(), 'time': '10:00', 'business_id': 1, 'service_id': 1
+        })
+        if inline:
+            with app.app_context():
+                id = Appointment.query.filter_by(business_id=1, date=day).one().id
+                notifications.send_confirmation({'appointment_id': id})
+        timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return statistics.median(timings)
+
+
+def main():
+    outbox = Outbox(SLOW_SEND)
+    notifications.NOTIFIERS['outbox'] = outbox
+
+    directory = tempfile.mkdtemp()
+    app = make_app(f'sqlite:///{os.path.join(directory, "notifications.sqlite")}', {
+        'CACHE_BACKEND': 'none',
+        'NOTIFIER': 'outbox',
+        'JOB_WORKERS': 2,
+        'JOB_RETRY_DELAY': 0.1,
+        'REMINDER_HOUR': -1,
+    })
+    queue = app.extensions['jobs']
+
+    with app.app_context():
+        populate(REMINDER_BUSINESSES, appointments_per_business=0, users=REMINDER_BUSINESSES * REMINDERS_PER_BUSINESS)
+
+    failures = []
+
+    # Booking latency: without a queue nothing is enqueued, with it the workers start on the next request
+        # and deliver confirmations while later bookings are measured
+    app.extensions.pop('jobs')
+    baseline = measure_bookings(app, date(2030, 1, 1))
+    app.extensions['jobs'] = queue
+
+    queued = measure_bookings(app, date(2031, 1, 1))
+    delivered = wait_until(lambda: len(outbox.messages) >= BOOKINGS)
+    inline = measure_bookings(app, date(2032, 1, 1), inline=True)
+
+    print(f'{"booking mode":28s} {"p50 ms":>8s}')
+    print(f'{"no notifications":28s} {baseline:8.2f}')
+    print(f'{"queued (background)":28s} {queued:8.2f}')
+    print(f'{"sent on request thread":28s} {inline:8.2f}')
+
+    if not delivered:
+        failures.append(f'only {len(outbox.messages)} of {BOOKINGS} queued confirmations delivered')
+    # The queue insert is the only work added to the request
+    if queued > baseline + SLOW_SEND * 1000 / 2:
+        failures.append(f'queued bookings took {queued:.2f} ms against {baseline:.2f} ms without notifications')
+
+    # Retries: the provider fails FAILURES times, then the job succeeds on a later attempt
+    retry = Outbox(failures=FAILURES)
+    notifications.NOTIFIERS['outbox'] = retry
+    with app.app_context():
+        notifications.queue_reminders(date(2031, 1, 1))
+    retried = wait_until(lambda: retry.batches, timeout=10)
+    with queue._connection() as connection:
+        attempts = connection.execute(
+            "SELECT MAX(attempts) FROM job WHERE kind = 'reminders.business' AND status = 'done'"
+        ).fetchone()[0]
+    print(f'retry: delivered after {attempts} attempts' if retried else 'retry: not delivered')
+    if not retried or attempts != FAILURES + 1:
+        failures.append(f'expected delivery on attempt {FAILURES + 1}, got {attempts}')
+
+    # Reminders: REMINDERS_PER_BUSINESS appointments tomorrow at each business, one batch per business
+    tomorrow = date.today() + timedelta(days=1)
+    with app.app_context():
+        for business_id in range(1, REMINDER_BUSINESSES + 1):
+            for i in range(REMINDERS_PER_BUSINESS):
+                db.session.add(Appointment(
+                    date=tomorrow, time=clock_time(9 + i), user_id=(business_id - 1) * REMINDERS_PER_BUSINESS + i + 1,
+                    business_id=business_id, service_id=(business_id - 1) * 3 + 1, notes=None
+                ))
+        db.session.commit()
+
+    reminders = Outbox()
+    notifications.NOTIFIERS['outbox'] = reminders
+    queue.stop()
+    with app.app_context():
+        notifications.queue_reminders(tomorrow)
+        # Queueing the same date again is a no-op
+        notifications.queue_reminders(tomorrow)
+        with QueryCounter(db.engine) as counter:
+            processed = jobs.run(app, once=True)
+
+    print(f'reminders: {len(reminders.messages)} messages in {len(reminders.batches)} batches, '
+          f'{processed} jobs, {counter.count} statements')
+    if len(reminders.batches) != REMINDER_BUSINESSES or len(reminders.messages) != REMINDER_BUSINESSES * REMINDERS_PER_BUSINESS:
+        failures.append(f'expected {REMINDER_BUSINESSES} batches of {REMINDERS_PER_BUSINESS} reminders')
+    # One statement to find the businesses, then one per business
+    if counter.count > REMINDER_BUSINESSES + 1:
+        failures.append(f'{counter.count} statements for {REMINDER_BUSINESSES} businesses')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    print('FAILED' if failures else 'OK')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Query Count Benchmark
+    # Asserts catalog listings issue a constant number of queries as the seed size grows
+    # Run from the repository root: python -m benchmarks.query_counts
+
+
+# Import dependencies
+import sys
+from server.database import db
+from benchmarks.common import make_app, populate, QueryCounter
+
+# Seed sizes (number of businesses) to compare
+SIZES = [10, 100, 1000]
+
+# Routes whose query count must not depend on the number of rows returned, with the key of the rows each returns
+    # Every route must return rows - a count measured on an empty result says nothing about how it grows
+ROUTES = {
+    '/business/all': 'results',
+    '/business/1': 'appointments',
+    '/business/search?query=braid': 'results',
+    '/user/all': 'results',
+}
+
+
+# Measure: Returns {route: query count} for a database seeded with the given number of businesses
+def measure(size, strategy):
+    app = make_app(config={'LOADING_STRATEGY': strategy})
+    client = app.test_client()
+
+    with app.app_context():
+        populate(size)
+
+        counts = {}
+        for route, key in ROUTES.items():
+            with QueryCounter(db.engine) as counter:
+                response = client.get(route)
+            assert response.status_code == 200, (route, response.get_json())
+            assert response.get_json()[key], (route, 'returned no rows')
+            counts[route] = counter.count
+
+        db.session.remove()
+        db.drop_all()
+
+    return counts
+
+
+def main():
+    failed = False
+
+    for strategy in ['subquery', 'joined']:
+        results = {size: measure(size, strategy) for size in SIZES}
+
+        for route in ROUTES:
+            counts = [results[size][route] for size in SIZES]
+            constant = len(set(counts)) == 1
+            failed = failed or not constant
+            print(f'{strategy:<7} {route:<35} queries at {SIZES}: {counts} {"OK" if constant else "GROWS"}')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Query Plan Benchmark
+    # Loads 1M appointments into a database without the model indexes, then runs migrate()
+    # and shows the hot appointment queries switching from table scans to index lookups
+    # Run from the repository root: python -m benchmarks.query_plans [appointments]
+
+
+# Import dependencies
+import os, sys, tempfile, time
+from sqlalchemy import text
+from server.database import db
+from server.migrations import migrate
+from benchmarks.common import make_app, populate
+
+# Businesses in the dataset - appointments are spread evenly across them
+BUSINESSES = 1000
+
+# Hot queries issued by the routes, with the table each one reads
+QUERIES = {
+    'appointments by user': ('appointment', 'SELECT * FROM appointment WHERE user_id = 42 ORDER BY id LIMIT 51'),
+    'appointments by business': ('appointment', 'SELECT * FROM appointment WHERE business_id = 42'),
+    'appointments by service': ('appointment', 'SELECT * FROM appointment WHERE service_id = 125 AND business_id = 42'),
+    'pending queue': ('appointment', "SELECT * FROM appointment WHERE business_id = 42 AND status = 'PENDING_CONFIRMATION' ORDER BY id LIMIT 51"),
+    'business day': ('appointment', "SELECT * FROM appointment WHERE business_id = 42 AND date = '2024-01-05' ORDER BY time"),
+    'services by business': ('service', 'SELECT * FROM service WHERE business_id = 42'),
+}
+
+# Runs per query when timing
+RUNS = 5
+
+
+# Measure: Returns {name: (query plan, average milliseconds)} for every hot query
+def measure():
+    results = {}
+    with db.engine.connect() as connection:
+        for name, (table, sql) in QUERIES.items():
+            plan = ' / '.join(row[-1] for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}')))
+            started = time.perf_counter()
+            for _ in range(RUNS):
+                connection.execute(text(sql)).all()
+            results[name] = (plan, (time.perf_counter() - started) / RUNS * 1000)
+    return results
+
+
+def main():
+    appointments = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = os.path.join(tempfile.mkdtemp(), 'query_plans.sqlite')
+    app = make_app(f'sqlite:///{path}')
+
+    with app.app_context():
+        started = time.perf_counter()
+        populate(BUSINESSES, appointments_per_business=appointments // BUSINESSES, users=BUSINESSES * 10)
+        print(f'Loaded {appointments} appointments in {time.perf_counter() - started:.1f}s')
+
+        # Drop the model indexes to reproduce a database created before they existed
+        with db.engine.begin() as connection:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.drop(connection)
+
+        before = measure()
+        _, indexes = migrate()
+        after = measure()
+        print(f'migrate() created {len(indexes)} indexes')
+
+    failed = False
+    for name, (table, sql) in QUERIES.items():
+        scans = f'SCAN {table}' in after[name][0] and 'USING' not in after[name][0]
+        failed = failed or scans
+        print(f'{name}')
+        print(f'    before: {before[name][1]:9.2f} ms  {before[name][0]}')
+        print(f'    after:  {after[name][1]:9.2f} ms  {after[name][0]}')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# Rate Limit Benchmark
+    # Load shedding: a fixed pool of server threads (like one gunicorn gthread worker) receives a burst of logins
+    # from distinct clients while a steady stream of catalog reads arrives - without the bcrypt cap the logins
+    # hold every thread while they queue for the hashing pool and the reads wait behind them; with it, logins
+    # beyond the cap get a 503 at once and the reads keep their latency
+    # Rate limits: checks the per-IP and per-account buckets, refill, that 429s are answered without bcrypt,
+    # and that the SQLite backend shares one budget between processes
+    # Run from the repository root: python -m benchmarks.rate_limit [logins]
+
+
+# Import dependencies
+import os, statistics, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from server.database import db
+from server.models import User
+from server.passwords import passwords
+from server.ratelimit import MemoryBuckets, SQLiteBuckets
+from benchmarks.common import make_app, populate
+
+# Server threads per process (gunicorn's default GUNICORN_THREADS) and bcrypt cost of the flooded account
+SERVER_THREADS = 4
+ROUNDS = 10
+
+# Catalog reads sent during the flood, one every READ_INTERVAL seconds
+READS = 100
+READ_INTERVAL = 0.01
+
+# Bucket takes timed per backend
+TAKES = 10_000
+
+
+# Percentile: Returns the p-th percentile of a list of latencies
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# Flood: Sends logins from distinct clients at once and catalog reads at a steady rate through SERVER_THREADS
+# threads - returns the read latencies (ms, including time queued for a thread) and the login statuses
+def flood(app, logins):
+    client = app.test_client()
+    server = ThreadPoolExecutor(max_workers=SERVER_THREADS)
+
+    def login(i):
+        return client.post('/auth/login', json={'email': 'user1@example.com', 'password': 'wrong'},
+                           environ_base={'REMOTE_ADDR': f'10.0.{i // 250}.{i % 250}'}).status_code
+
+    def read(submitted):
+        client.get('/business/7/services')
+        return (time.perf_counter() - submitted) * 1000
+
+    statuses = [server.submit(login, i) for i in range(logins)]
+    reads = []
+    for _ in range(READS):
+        reads.append(server.submit(read, time.perf_counter()))
+        time.sleep(READ_INTERVAL)
+
+    reads = [future.result() for future in reads]
+    statuses = [future.result() for future in statuses]
+    server.shutdown()
+    return reads, statuses
+
+
+# Login App: Returns an app with in-memory rate limits whose first user's password is hashed at ROUNDS
+def login_app(path, config):
+    app = make_app(f'sqlite:///{path}', {
+        'CACHE_BACKEND': 'none', 'RATE_LIMIT_BACKEND': 'memory', 'PASSWORD_WORKERS': 1, 'BCRYPT_ROUNDS': ROUNDS, **config
+    })
+    with app.app_context():
+        user = db.session.get(User, 1)
+        user.password = passwords.hash('password')
+        db.session.commit()
+    return app
+
+
+# Send: Sends logins one after another and returns their responses
+def send(client, count, email=lambda i: 'user1@example.com', ip=lambda i: '10.1.0.1'):
+    return [client.post('/auth/login', json={'email': email(i), 'password': 'wrong'},
+                        environ_base={'REMOTE_ADDR': ip(i)}) for i in range(count)]
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'rate_limit.sqlite')
+    failures = []
+
+    app = make_app(f'sqlite:///{path}')
+    with app.app_context():
+        populate(10, appointments_per_business=0, users=20)
+
+    # Load shedding - every login comes from its own client and limits are off, so only the concurrency cap applies
+    print(f'{logins} logins at bcrypt cost {ROUNDS} with {READS} catalog reads, {SERVER_THREADS} server threads')
+    print(f'{"mode":16s} {"read p50":>9s} {"read p95":>9s} {"logins run":>11s} {"shed (503)":>11s}')
+    results = {}
+    for mode, cap in (('uncapped', -1), ('capped', 0)):
+        reads, statuses = flood(login_app(path, {'RATE_LIMIT_BACKEND': 'none', 'MAX_PASSWORD_REQUESTS': cap}), logins)
+        results[mode] = percentile(reads, 95)
+        print(f'{mode:16s} {percentile(reads, 50):9.1f} {percentile(reads, 95):9.1f} '
+              f'{statuses.count(401):11d} {statuses.count(503):11d}')
+        if mode == 'capped' and not statuses.count(503):
+            failures.append('no login was shed')
+    if results['capped'] * 2 > results['uncapped']:
+        failures.append('the bcrypt cap does not protect read latency')
+
+    # Per-IP limit: logins for different accounts from one client
+    client = login_app(path, {'RATE_LIMITS': 'login.ip=5/minute'}).test_client()
+    responses = send(client, 8, email=lambda i: f'user{i + 1}@example.com')
+    statuses = [response.status_code for response in responses]
+    print(f'per-IP limit 5/minute, 8 logins: {statuses.count(401)} checked, {statuses.count(429)} limited, '
+          f'Retry-After {responses[-1].headers.get("Retry-After")}s')
+    if statuses.count(429) != 3 or responses[-1].headers.get('Retry-After') != '12':
+        failures.append(f'per-IP limit returned {statuses}')
+
+    # Per-account limit: one account from many clients - the 429s skip bcrypt, so they are answered at once
+    client = login_app(path, {'RATE_LIMITS': 'login.account=3/minute'}).test_client()
+    timings = []
+    for i in range(10):
+        started = time.perf_counter()
+        status = send(client, 1, ip=lambda _: f'10.2.0.{i}')[0].status_code
+        timings.append((status, (time.perf_counter() - started) * 1000))
+    checked = [ms for status, ms in timings if status == 401]
+    limited = [ms for status, ms in timings if status == 429]
+    print(f'per-account limit 3/minute, 10 logins: {len(checked)} checked ({statistics.median(checked):.1f} ms), '
+          f'{len(limited)} limited ({statistics.median(limited):.2f} ms)')
+    if len(limited) != 7 or statistics.median(limited) * 5 > statistics.median(checked):
+        failures.append('per-account limit is not enforced before bcrypt')
+
+    # Refill: a bucket of 2 per second allows another login half a second after it is emptied
+    client = login_app(path, {'RATE_LIMITS': 'login.ip=2/second'}).test_client()
+    before = [response.status_code for response in send(client, 3)]
+    time.sleep(0.6)
+    after = send(client, 1)[0].status_code
+    print(f'refill 2/second: {before} then {after} after 0.6s')
+    if before != [401, 401, 429] or after != 401:
+        failures.append('bucket does not refill')
+
+    # Shared backend: two apps (standing in for worker processes) on one bucket file share a 5/minute budget
+    config = {'RATE_LIMITS': 'login.ip=5/minute', 'RATE_LIMIT_BACKEND': 'sqlite', 'RATE_LIMIT_PATH': os.path.join(directory, 'buckets.sqlite')}
+    statuses = [response.status_code for response in
+                send(login_app(path, config).test_client(), 3) + send(login_app(path, config).test_client(), 3)]
+    print(f'shared sqlite buckets, 3 + 3 logins: {statuses.count(401)} checked, {statuses.count(429)} limited')
+    if statuses.count(429) != 1:
+        failures.append('sqlite buckets are not shared')
+
+    # Overhead of one take per backend
+    for name, buckets in (('memory', MemoryBuckets()), ('sqlite', SQLiteBuckets(os.path.join(directory, 'takes.sqlite')))):
+        started = time.perf_counter()
+        for i in range(TAKES):
+            buckets.take(f'login:ip:10.3.{i % 100}', 30, 0.5)
+        print(f'{name} bucket take: {(time.perf_counter() - started) / TAKES * 1e6:.1f} us')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    print('FAILED' if failures else 'OK')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
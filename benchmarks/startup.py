@@ -0,0 +1,81 @@
+# Startup Benchmark
+    # Starts fresh processes against a populated database and times import, create_app() and the first request
+    # Fails if cold start exceeds the bound, or if starting a process changed any rows
+    # Run from the repository root: python -m benchmarks.startup [runs] [max seconds]
+
+
+# Import dependencies
+# The app and database helpers are imported inside main(), so child processes start cold
+import json, os, statistics, subprocess, sys, tempfile, time
+
+# Default bound on cold start to first response, in seconds
+MAX_STARTUP = 3.0
+
+TABLES = ('user', 'business', 'service', 'appointment')
+
+
+# Child: Runs in a fresh interpreter and prints the time of each startup phase
+def child():
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+    response = app.test_client().get('/business/all?limit=20')
+    answered = time.perf_counter()
+
+    print(json.dumps({
+        'status': response.status_code,
+        'import': imported - started,
+        'create_app': created - imported,
+        'first_request': answered - created,
+    }))
+
+
+# Row Counts: Returns the number of rows in each table
+def row_counts():
+    from sqlalchemy import text
+    from server.database import db
+
+    with db.engine.connect() as connection:
+        return {table: connection.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar() for table in TABLES}
+
+
+def main():
+    from benchmarks.common import make_app, populate
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    bound = float(sys.argv[2]) if len(sys.argv) > 2 else MAX_STARTUP
+
+    path = os.path.join(tempfile.mkdtemp(), 'startup.sqlite')
+    app = make_app(f'sqlite:///{path}')
+    with app.app_context():
+        populate(1000, appointments_per_business=100, users=10000)
+        before = row_counts()
+
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', JWT_SECRET='booksy-benchmark-secret-key-0123456789')
+    results = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.startup', 'child'], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['total'] = time.perf_counter() - started
+        results.append(result)
+
+    with app.app_context():
+        after = row_counts()
+
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        print(f'{phase:14s} median {statistics.median(result[phase] for result in results) * 1000:8.1f} ms')
+
+    total = statistics.median(result['total'] for result in results)
+    ok = total <= bound and before == after and all(result['status'] == 200 for result in results)
+    print(f'rows before {before}')
+    print(f'rows after  {after}')
+    print('OK' if ok else f'FAILED - bound {bound:.1f}s')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    child() if sys.argv[1:] == ['child'] else main()
@@ -0,0 +1,128 @@
+# Status Lifecycle Benchmark
+    # Loads appointments dated in the past, then:
+    # - completes them with the sweeper and shows a second sweep touching nothing
+    # - books a few future appointments at one business and times its pending queue, which must read only those rows
+    #   however long the business's completed history is
+    # - races parallel confirmations of one appointment and checks exactly one wins
+    # Run from the repository root: python -m benchmarks.status_lifecycle [appointments]
+
+
+# Import dependencies
+import os, statistics, sys, tempfile, threading, time
+from datetime import date, time as clock_time
+from sqlalchemy import text
+from server.database import db
+from server.models import Appointment, AppointmentStatus, User
+from server.tokens import create_user_token
+from server.lifecycle import complete_past_appointments
+from benchmarks.common import make_app, populate, QueryCounter
+
+# Businesses in the dataset - appointments are spread evenly across them
+BUSINESSES = 1000
+
+# Business whose pending queue is measured, its pending appointments, and requests timed
+QUEUE_BUSINESS = 42
+PENDING = 20
+REQUESTS = 50
+
+# Clients confirming the same appointment at once
+RACERS = 16
+
+# Day every generated appointment is before
+TODAY = date(2030, 1, 1)
+
+
+def main():
+    appointments = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    path = os.path.join(tempfile.mkdtemp(), 'status_lifecycle.sqlite')
+    app = make_app(f'sqlite:///{path}', {'CACHE_BACKEND': 'none'})
+    failures = []
+
+    with app.app_context():
+        started = time.perf_counter()
+        populate(BUSINESSES, appointments_per_business=appointments // BUSINESSES, users=BUSINESSES)
+        print(f'Loaded {appointments} appointments in {time.perf_counter() - started:.1f}s')
+
+        # Sweep: every generated appointment is pending and in the past
+        for run in ('first', 'second'):
+            started = time.perf_counter()
+            with QueryCounter(db.engine) as counter:
+                completed = complete_past_appointments(TODAY)
+            print(f'{run} sweep: {completed} completed in {time.perf_counter() - started:.2f}s with {counter.count} statements')
+            expected = appointments // BUSINESSES * BUSINESSES if run == 'first' else 0
+            if completed != expected:
+                failures.append(f'{run} sweep completed {completed}, expected {expected}')
+
+        # Pending queue: a few new bookings on top of the completed history
+        service_id = (QUEUE_BUSINESS - 1) * 3 + 1
+        for hour in range(PENDING):
+            db.session.add(Appointment(date=date(2030, 6, 1 + hour), time=clock_time(10), user_id=1,
+                                       business_id=QUEUE_BUSINESS, service_id=service_id, notes=None))
+        db.session.commit()
+        first_pending = Appointment.query.filter_by(business_id=QUEUE_BUSINESS, status=AppointmentStatus.PENDING_CONFIRMATION).first().id
+
+        # Status changes act for the token's user - user 1 booked the pending appointments, user 2 did not
+        owner = {'Authorization': f'Bearer {create_user_token(db.session.get(User, 1))}'}
+        stranger = {'Authorization': f'Bearer {create_user_token(db.session.get(User, 2))}'}
+
+        plan = ' / '.join(row[-1] for row in db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM appointment WHERE business_id = :b AND status = 'PENDING_CONFIRMATION' ORDER BY id"
+        ), {'b': QUEUE_BUSINESS}))
+
+    client = app.test_client()
+    timings = []
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        response = client.get(f'/business/{QUEUE_BUSINESS}/appointments?status=pending&limit=50')
+        timings.append((time.perf_counter() - started) * 1000)
+    results = response.get_json()['results']
+    print(f'pending queue: {len(results)} of {appointments // BUSINESSES + PENDING} appointments, '
+          f'p50 {statistics.median(timings):.2f} ms')
+    print(f'    plan: {plan}')
+    if len(results) != PENDING:
+        failures.append(f'pending queue returned {len(results)} appointments, expected {PENDING}')
+    if 'ix_appointment_business_status_date' not in plan:
+        failures.append('pending queue does not use the (business_id, status, date) index')
+
+    # Race: parallel confirmations of one pending appointment
+    barrier = threading.Barrier(RACERS)
+    statuses = []
+
+    def confirm():
+        racer = app.test_client()
+        barrier.wait()
+        statuses.append(racer.post(f'/business/{QUEUE_BUSINESS}/appointments/{first_pending}/confirm', headers=owner).status_code)
+
+    threads = [threading.Thread(target=confirm) for _ in range(RACERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f'{RACERS} parallel confirmations: {statuses.count(200)} confirmed, {statuses.count(409)} conflicts')
+    if statuses.count(200) != 1 or statuses.count(409) != RACERS - 1:
+        failures.append(f'expected one confirmation, got statuses {sorted(set(statuses))}')
+
+    # Transitions: a confirmed appointment can be completed, and a completed one can no longer be cancelled
+    checks = [('complete', 200), ('cancel', 409), ('confirm', 409)]
+    for action, expected in checks:
+        status = client.post(f'/business/{QUEUE_BUSINESS}/appointments/{first_pending}/{action}', headers=owner).status_code
+        if status != expected:
+            failures.append(f'{action} returned {status}, expected {expected}')
+    if client.post(f'/business/{QUEUE_BUSINESS + 1}/appointments/{first_pending}/cancel', headers=owner).status_code != 404:
+        failures.append('another business could change the appointment')
+
+    # Access: another pending appointment cannot be changed without a token or by another user
+    second_pending = first_pending + 1
+    for headers, expected in (({}, 401), (stranger, 403)):
+        status = client.post(f'/business/{QUEUE_BUSINESS}/appointments/{second_pending}/cancel', headers=headers).status_code
+        if status != expected:
+            failures.append(f'cancel by {"stranger" if headers else "anonymous client"} returned {status}, expected {expected}')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    print('FAILED' if failures else 'OK')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Streaming Memory Benchmark
+    # Exports every appointment of one business through the streaming route and through a materialized
+    # jsonify() of the same rows, and compares peak Python memory while each response is produced
+    # Run from the repository root: python -m benchmarks.streaming_memory [appointments]
+    # The materialized side needs roughly 1.8 KiB per appointment, so keep large runs within available memory
+
+
+# Import dependencies
+import json, os, sys, tempfile, time, tracemalloc
+from flask import jsonify
+from server.models import Appointment
+from benchmarks.common import make_app, populate
+
+# Streaming peak memory must stay below this fraction of the materialized peak
+MAX_RATIO = 0.25
+
+
+# Measure: Runs produce() under tracemalloc and returns (result, peak MiB, seconds)
+def measure(produce):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = produce()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def main():
+    appointments = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    path = os.path.join(tempfile.mkdtemp(), 'streaming_memory.sqlite')
+    app = make_app(f'sqlite:///{path}')
+
+    with app.app_context():
+        # A single business holds every appointment, so one export covers the whole table
+        populate(1, services_per_business=3, appointments_per_business=appointments, users=1000)
+        client = app.test_client()
+
+        # Streamed: consume the response chunk by chunk, keeping only a running count
+        def streamed():
+            response = client.get('/business/1/appointments/export?format=ndjson', buffered=False)
+            rows = sum(chunk.count(b'\n') for chunk in response.response)
+            response.close()
+            return rows
+        streamed_rows, streamed_peak, streamed_time = measure(streamed)
+
+        # Materialized: the previous pattern - every object, dict and the full body in memory at once
+        def materialized():
+            with app.test_request_context():
+                rows = Appointment.query.filter_by(business_id=1).order_by(Appointment.date, Appointment.time, Appointment.id).all()
+                body = jsonify([row.serialize() for row in rows]).get_data()
+                return len(json.loads(body))
+        materialized_rows, materialized_peak, materialized_time = measure(materialized)
+
+    print(f'streamed:     {streamed_rows:9d} rows  peak {streamed_peak:8.1f} MiB  {streamed_time:6.1f}s')
+    print(f'materialized: {materialized_rows:9d} rows  peak {materialized_peak:8.1f} MiB  {materialized_time:6.1f}s')
+
+    ok = streamed_rows == materialized_rows == appointments and streamed_peak <= materialized_peak * MAX_RATIO
+    print('OK' if ok else 'FAILED')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
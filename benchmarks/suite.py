@@ -0,0 +1,215 @@
+# Benchmark Suite
+    # Measures latency, throughput and SQL statements per request for the auth, user and business routes
+    # against synthetic datasets of 1k, 100k and 1M appointments, using the Flask test client
+    # Results are compared with the baselines stored in benchmarks/baselines/<size>.json, and the run fails
+    # when a route gets slower than the threshold allows or issues more statements than its baseline
+    # Timing baselines are machine specific - record them with --save on the machine that runs the comparison
+    # Run from the repository root: python -m benchmarks.suite [--sizes 1k,100k,1m] [--save] [--threshold 0.25]
+
+
+# Import dependencies
+import argparse, json, os, statistics, sys, tempfile, time
+from datetime import date, timedelta
+from server.database import db
+from server.models import User, Appointment
+from server.tokens import create_user_token
+from benchmarks.common import make_app, populate, QueryCounter
+
+# Dataset sizes by name: (users, businesses, appointments) - every business has 3 services
+SIZES = {
+    '1k': (100, 10, 1_000),
+    '100k': (10_000, 1_000, 100_000),
+    '1m': (100_000, 10_000, 1_000_000),
+}
+
+# Directory holding the stored baselines
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Defaults: allowed slowdown over the baseline median, and differences too small to count as regressions
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 1.0
+
+# Requests measured per scenario, after warm-up requests that are not measured
+DEFAULT_ITERATIONS = 30
+WARMUP = 3
+
+# Plaintext password of every generated account
+PASSWORD = 'password'
+
+# Bookings made by the suite use dates after the generated data, one per request
+FIRST_FREE_DATE = date(2030, 1, 1)
+
+
+# Scenarios: Returns {name: request(i)} for every measured route - request(i) sends the i-th request
+    # Writes use a fresh date or account for every i, so each request does the same amount of work
+def scenarios(client, users, businesses):
+    user_id = users // 2
+    business_id = businesses // 2
+    service_id = (business_id - 1) * 3 + 1
+    headers = {'Authorization': f'Bearer {create_user_token(db.session.get(User, user_id))}'}
+
+    def day(i):
+        return (FIRST_FREE_DATE + timedelta(days=i)).isoformat()
+
+    def book(i):
+        return client.post(f'/user/{user_id}/appointments', headers=headers, json={
+            'date': day(i), 'time': '09:00', 'business_id': business_id, 'service_id': service_id
+        })
+
+    # Rescheduling moves one appointment, booked alone on its day, between two free slots
+    book(-1)
+    moved = Appointment.query.filter_by(user_id=user_id, date=FIRST_FREE_DATE - timedelta(days=1)).one().id
+
+    def reschedule(i):
+        return client.put(f'/user/{user_id}/appointments/{moved}', headers=headers, json={
+            'time': '13:00' if i % 2 else '14:00'
+        })
+
+    return {
+        # auth
+        'auth.login': lambda i: client.post('/auth/login', json={'email': f'user{user_id}@example.com', 'password': PASSWORD}),
+        'auth.register': lambda i: client.post('/auth/register', json={
+            'full_name': f'Benchmark {i}', 'email': f'benchmark{i}@example.com', 'username': f'benchmark{i}',
+            'phone_number': f'9{i:09d}', 'password': PASSWORD
+        }),
+
+        # user
+        'user.all': lambda i: client.get('/user/all?limit=50'),
+        'user.all.summary': lambda i: client.get('/user/all?limit=50&expand='),
+        'user.profile': lambda i: client.get('/user/profile', headers=headers),
+        'user.appointments': lambda i: client.get('/user/appointments?limit=50', headers=headers),
+        'user.book': book,
+        'user.reschedule': reschedule,
+
+        # business
+        'business.all': lambda i: client.get('/business/all?limit=50'),
+        'business.all.summary': lambda i: client.get('/business/all?limit=50&expand='),
+        'business.get': lambda i: client.get(f'/business/{business_id}'),
+        'business.services': lambda i: client.get(f'/business/{business_id}/services'),
+        'business.search': lambda i: client.get('/business/search?query=braid&limit=20'),
+        'business.search.city': lambda i: client.get('/business/search?query=rich&limit=20'),
+        'business.nearby': lambda i: client.get('/business/nearby?lat=37.5407&lng=-77.4360&radius=50&limit=20'),
+        'business.availability': lambda i: client.get(
+            f'/business/{business_id}/service/{service_id}/availability?start=2024-01-01&end=2024-01-07'
+        ),
+        'business.pending': lambda i: client.get(f'/business/{business_id}/appointments?status=pending&limit=50'),
+        'business.stats': lambda i: client.get(f'/business/{business_id}/stats?start=2024-01-01&end=2024-01-31'),
+        'business.schedule': lambda i: client.get(f'/business/{business_id}/schedule?date=2024-01-01'),
+        'business.batch': lambda i: client.post(f'/business/{business_id}/appointments/batch', headers=headers, json={'appointments': [
+            {'user_id': user_id, 'service_id': service_id, 'date': day(10_000 + i), 'time': f'{9 + hour}:00'}
+            for hour in range(8)
+        ]}),
+    }
+
+
+# Measure: Sends warm-up and measured requests for one scenario and returns its statistics
+def measure(send, iterations, offset):
+    for i in range(WARMUP):
+        response = send(offset + i)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+
+    timings = []
+    with QueryCounter(db.engine) as counter:
+        for i in range(WARMUP, WARMUP + iterations):
+            started = time.perf_counter()
+            send(offset + i)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'rps': round(1000 / statistics.mean(timings), 1),
+        'queries': round(counter.count / iterations, 2),
+    }
+
+
+# Run Size: Loads one dataset and measures every scenario against it
+def run_size(size, iterations, only):
+    users, businesses, appointments = SIZES[size]
+    path = os.path.join(tempfile.mkdtemp(), f'suite_{size}.sqlite')
+    # Caching is off so every request does the work being measured
+    app = make_app(f'sqlite:///{path}', {'CACHE_BACKEND': 'none'})
+
+    results = {}
+    with app.app_context():
+        started = time.perf_counter()
+        populate(businesses, appointments_per_business=appointments // businesses, users=users)
+        print(f'\n{size}: {users} users, {businesses} businesses, {appointments} appointments loaded in {time.perf_counter() - started:.1f}s')
+
+        client = app.test_client()
+        for n, (name, send) in enumerate(scenarios(client, users, businesses).items()):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            # Each scenario gets its own range of request numbers, so writes never collide
+            results[name] = measure(send, iterations, n * 10_000)
+    return results
+
+
+# Compare: Returns the regressions of results against a baseline
+    # A scenario without a baseline fails too - otherwise a new route is never checked at that size
+def compare(results, baseline, threshold, min_delta):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            regressions.append(f'{name}: no baseline - record one with --save --only {name}')
+            continue
+        before = baseline[name]
+        if result['p50_ms'] > before['p50_ms'] * (1 + threshold) and result['p50_ms'] - before['p50_ms'] > min_delta:
+            regressions.append(f'{name}: p50 {before["p50_ms"]:.2f} -> {result["p50_ms"]:.2f} ms')
+        # Statement counts are deterministic, so any increase is a regression (e.g. an N+1 in serialize())
+        if result['queries'] > before['queries']:
+            regressions.append(f'{name}: queries {before["queries"]:g} -> {result["queries"]:g} per request')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every blueprint against synthetic data.')
+    parser.add_argument('--sizes', default='1k,100k', help=f'Comma separated dataset sizes ({", ".join(SIZES)}).')
+    parser.add_argument('--only', default='', help='Comma separated scenario name filters, e.g. search,book.')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='Measured requests per scenario.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Allowed slowdown over the baseline median.')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS, help='Slowdowns below this are ignored.')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baselines.')
+    args = parser.parse_args()
+
+    only = [pattern for pattern in args.only.split(',') if pattern]
+    failed = False
+
+    for size in args.sizes.split(','):
+        if size not in SIZES:
+            parser.error(f'Unknown size: {size}')
+
+        results = run_size(size, args.iterations, only)
+        baseline_path = os.path.join(BASELINE_DIR, f'{size}.json')
+        baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+
+        print(f'{"scenario":24s} {"p50 ms":>9s} {"p95 ms":>9s} {"req/s":>8s} {"queries":>8s} {"baseline p50":>13s}')
+        for name, result in results.items():
+            before = f'{baseline[name]["p50_ms"]:13.2f}' if name in baseline else f'{"-":>13s}'
+            print(f'{name:24s} {result["p50_ms"]:9.2f} {result["p95_ms"]:9.2f} {result["rps"]:8.1f} {result["queries"]:8g} {before}')
+
+        if args.save:
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            # Scenarios left out with --only keep their previous baselines
+            with open(baseline_path, 'w') as f:
+                json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+                f.write('\n')
+            print(f'Saved baseline {os.path.relpath(baseline_path)}')
+            continue
+
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            print(f'REGRESSION {size} {regression}')
+        failed = failed or bool(regressions)
+
+    print('FAILED' if failed else 'OK')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# Gunicorn Configuration
+    # Pre-fork server: the master forks WEB_CONCURRENCY workers, each building the app from wsgi.py
+    # Migrations are not run here - use `flask serve --migrate` or run `flask migrate` before starting
+    # Each worker serves GUNICORN_THREADS requests at a time, so slow requests (bcrypt, large pages)
+    # don't hold up the rest, and idle keep-alive connections don't pin a whole process
+    # Graceful reload: `kill -HUP <master pid>` starts new workers on fresh code, then retires the old ones
+    # Every setting can be overridden on the command line or with GUNICORN_CMD_ARGS
+
+
+# Import dependencies
+import multiprocessing, os
+
+# Listen address - the Dockerfile exposes port 3000
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '3000')}")
+
+# Workers: one process per core plus one, so a core stays busy while another worker waits on the database
+workers = int(os.getenv('WEB_CONCURRENCY', 0)) or multiprocessing.cpu_count() + 1
+
+# Threads per worker - bcrypt releases the GIL, so hashing threads run in parallel with request threads
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Seconds an idle keep-alive connection is held open, so clients reuse connections between requests
+keepalive = int(os.getenv('KEEPALIVE', 5))
+
+# Seconds before a stuck worker is killed, and seconds workers get to finish requests on reload or shutdown
+timeout = int(os.getenv('WORKER_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers after this many requests (with jitter so they don't all restart at once)
+max_requests = int(os.getenv('MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# The app is imported by each worker rather than by the master, so a reload picks up new code
+preload_app = False
+
+# Access log to stdout for the container runtime
+accesslog = os.getenv('ACCESS_LOG', '-') or None
+
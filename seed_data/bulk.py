@@ -0,0 +1,108 @@
+# Bulk Loader
+    # Inserts large row sets with batched executemany, skipping ORM objects and per-row statement compilation
+    # Column values (dates, times, enums) are converted once per distinct value, not once per row
+
+
+# Import dependencies
+from contextlib import contextmanager
+from itertools import islice
+
+# Rows sent to the database per executemany call
+CHUNK_SIZE = 50000
+
+# Distinct values remembered per column before the conversion cache is reset
+CACHE_SIZE = 100000
+
+
+# Processor: Returns a converter from Python values to driver values for a whole column, or None
+    # Each distinct value is converted once and cached, the rest of the column is a dict lookup
+def _processor(column, dialect):
+    process = column.type.dialect_impl(dialect).bind_processor(dialect)
+    if process is None:
+        return None
+
+    cache = {}
+    def convert(values):
+        missing = set(values).difference(cache)
+        if len(cache) + len(missing) > CACHE_SIZE:
+            cache.clear()
+            missing = set(values)
+        for value in missing:
+            cache[value] = process(value)
+        return list(map(cache.__getitem__, values))
+    return convert
+
+
+# Bulk Insert: Inserts rows (tuples ordered like columns) into a table and returns the row count
+def bulk_insert(connection, table, columns, rows):
+    dialect = connection.dialect
+    compiled = table.insert().compile(dialect=dialect, column_keys=columns)
+    statement = str(compiled)
+
+    # Converters for the columns that need them, by position
+    processors = [(i, process) for i, process in enumerate(_processor(table.c[name], dialect) for name in columns) if process]
+
+    # Positional drivers (e.g. sqlite3) take tuples in statement order, others take dicts
+    order = [columns.index(name) for name in compiled.positiontup] if dialect.positional else range(len(columns))
+
+    count = 0
+    rows = iter(rows)
+    for chunk in iter(lambda: list(islice(rows, CHUNK_SIZE)), []):
+        # Convert column by column so conversion and reordering run in C-level loops
+        values = list(zip(*chunk))
+        for i, process in processors:
+            values[i] = process(values[i])
+
+        if dialect.positional:
+            params = list(zip(*(values[i] for i in order)))
+        else:
+            params = [dict(zip(columns, row)) for row in zip(*values)]
+
+        connection.exec_driver_sql(statement, params)
+        count += len(chunk)
+    return count
+
+
+# Reset Sequences: Moves each table's ID sequence past the largest loaded ID
+    # Rows loaded with explicit IDs do not advance PostgreSQL sequences, so later inserts would reuse them
+    # SQLite derives new IDs from the table itself and needs nothing
+def reset_sequences(connection, tables):
+    if connection.dialect.name != 'postgresql':
+        return
+
+    preparer = connection.dialect.identifier_preparer
+    for table in tables:
+        name = preparer.format_table(table)
+        connection.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {name}"
+        )
+
+
+# Fast Load: Yields a connection in a transaction with the tables' indexes dropped, rebuilding them before commit
+    # Building an index once over sorted data is much faster than updating it for every row
+    # On SQLite, fsync is also relaxed for the load - the pragma can only change outside a transaction
+@contextmanager
+def fast_load(engine, tables):
+    indexes = [index for table in tables for index in table.indexes]
+
+    with engine.connect() as connection:
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            synchronous = connection.exec_driver_sql('PRAGMA synchronous').scalar()
+            connection.exec_driver_sql('PRAGMA synchronous = OFF')
+            connection.commit()
+
+        try:
+            with connection.begin():
+                for index in indexes:
+                    index.drop(connection, checkfirst=True)
+
+                yield connection
+
+                reset_sequences(connection, tables)
+                for index in indexes:
+                    index.create(connection)
+        finally:
+            if sqlite:
+                connection.exec_driver_sql(f'PRAGMA synchronous = {synchronous}')
+                connection.commit()
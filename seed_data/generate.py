@@ -0,0 +1,110 @@
+# Synthetic Data Generator
+    # Produces realistic users, businesses, services and appointments in any volume
+    # Rows are generated lazily and bulk loaded, so millions of rows never sit in memory at once
+
+
+# Import dependencies
+from datetime import date, time, timedelta
+from server.database import db
+from server.passwords import passwords
+from server.derived import drop_triggers, rebuild_all
+
+# Import Models
+from server.models import User, Appointment, Service, Business, AppointmentStatus
+
+# Import Bulk Loader
+from seed_data.bulk import bulk_insert, fast_load
+
+# Plaintext password of every generated account
+DEFAULT_PASSWORD = 'password'
+
+# Values generated rows cycle through
+BUSINESS_KINDS = ['Braid Bar', 'Nail Studio', 'Beauty Lounge', 'Barber Shop', 'Lash Loft', 'Day Spa']
+LOCATIONS = [('Richmond', 'VA'), ('Baltimore', 'MD'), ('Atlanta', 'GA'), ('Houston', 'TX'), ('Chicago', 'IL'), ('Denver', 'CO')]
+# City centres (latitude, longitude) of LOCATIONS, in the same order
+CITY_CENTRES = [(37.5407, -77.4360), (39.2904, -76.6122), (33.7490, -84.3880), (29.7604, -95.3698), (41.8781, -87.6298), (39.7392, -104.9903)]
+# Businesses are spread up to this many degrees (about 22 km) from their city centre
+SPREAD_DEGREES = 0.2
+SERVICE_NAMES = ['Knotless Braids', 'Gel Manicure', 'Silk Press', 'Fade Haircut', 'Lash Extensions', 'Facial']
+# Durations are at most one hour, so hourly appointments never overlap
+SERVICE_DURATIONS = [30, 45, 60]
+
+# Appointments per business per day (hourly from 09:00)
+SLOTS_PER_DAY = 8
+
+# Columns filled by each generator, in tuple order
+USER_COLUMNS = ['id', 'full_name', 'email', 'username', 'phone_number', 'password']
+BUSINESS_COLUMNS = ['id', 'name', 'address', 'city', 'state', 'phone_number', 'email', 'password', 'latitude', 'longitude']
+SERVICE_COLUMNS = ['id', 'name', 'duration', 'price', 'description', 'business_id']
+APPOINTMENT_COLUMNS = ['id', 'date', 'time', 'status', 'user_id', 'business_id', 'service_id', 'notes']
+
+
+# Generate Users: Yields user rows
+def generate_users(count, password_hash):
+    for i in range(1, count + 1):
+        yield (i, f'User {i}', f'user{i}@example.com', f'user{i}', f'{i:010d}', password_hash)
+
+
+# Generate Businesses: Yields business rows
+    # Coordinates scatter businesses around their city centre - offsets come from the ID, so every run is the same
+def generate_businesses(count, password_hash):
+    for i in range(1, count + 1):
+        city, state = LOCATIONS[i % len(LOCATIONS)]
+        latitude, longitude = CITY_CENTRES[i % len(LOCATIONS)]
+        yield (i, f'{BUSINESS_KINDS[i % len(BUSINESS_KINDS)]} {i}', f'{i} Main St', city, state,
+               f'{i:010d}', f'business{i}@example.com', password_hash,
+               round(latitude + SPREAD_DEGREES * ((i * 7919 % 2001) / 1000 - 1), 6),
+               round(longitude + SPREAD_DEGREES * ((i * 6271 % 2003) / 1001 - 1), 6))
+
+
+# Generate Services: Yields service rows - service s of business b has ID (b - 1) * per_business + s
+def generate_services(businesses, per_business):
+    for b in range(1, businesses + 1):
+        for s in range(1, per_business + 1):
+            yield ((b - 1) * per_business + s, SERVICE_NAMES[(b + s) % len(SERVICE_NAMES)],
+                   SERVICE_DURATIONS[(s - 1) % len(SERVICE_DURATIONS)], 25.0 * s, None, b)
+
+
+# Generate Appointments: Yields appointment rows spread evenly across businesses in hourly slots
+    # Slot j of every business is filled before slot j + 1, so each date and time is built once
+def generate_appointments(count, businesses, users, services_per_business, start):
+    status = AppointmentStatus.PENDING_CONFIRMATION.name
+    times = [time(9 + hour) for hour in range(SLOTS_PER_DAY)]
+
+    k = 0
+    for j in range(-(-count // businesses)):
+        day = start + timedelta(days=j // SLOTS_PER_DAY)
+        slot = times[j % SLOTS_PER_DAY]
+        offset = j % services_per_business + 1
+        for b in range(1, min(businesses, count - k) + 1):
+            k += 1
+            yield (k, day, slot, status, k % users + 1, b, (b - 1) * services_per_business + offset, None)
+
+
+# Generate Fixtures: Replaces every table with synthetic rows and returns the number of rows per table
+    # password_hash skips bcrypt entirely; otherwise DEFAULT_PASSWORD is hashed once for all accounts
+def generate_fixtures(users, businesses, appointments, services_per_business=3, password_hash=None, start=date(2024, 1, 1)):
+    if appointments and not (users and businesses and services_per_business):
+        raise ValueError('Appointments need at least one user, business and service')
+
+    password_hash = password_hash or passwords.hash(DEFAULT_PASSWORD)
+    tables = [User.__table__, Business.__table__, Service.__table__, Appointment.__table__]
+
+    with fast_load(db.engine, tables) as connection:
+        # Derived tables are rebuilt once after the load instead of once per row
+        drop_triggers(connection)
+
+        # Clear all tables
+        for table in reversed(tables):
+            connection.execute(table.delete())
+
+        counts = {
+            'users': bulk_insert(connection, User.__table__, USER_COLUMNS, generate_users(users, password_hash)),
+            'businesses': bulk_insert(connection, Business.__table__, BUSINESS_COLUMNS, generate_businesses(businesses, password_hash)),
+            'services': bulk_insert(connection, Service.__table__, SERVICE_COLUMNS, generate_services(businesses, services_per_business)),
+            'appointments': bulk_insert(connection, Appointment.__table__, APPOINTMENT_COLUMNS,
+                                        generate_appointments(appointments, businesses, users, services_per_business, start)),
+        }
+
+    rebuild_all()
+    return counts
@@ -1,91 +1,90 @@
 # Write function to seed data from JSON files in server/seed_data
-from datetime import time, datetime
-from server.models import User, Appointment, Service, Business
-import json
-import bcrypt
+from datetime import datetime
+from server.models import User, Appointment, Service, Business, AppointmentStatus
 from server.database import db
+from server.passwords import passwords
+from server.derived import drop_triggers, rebuild_all
+from server.geo import import_geocodes
+import json
+import os
+
+# Import Bulk Loader
+from seed_data.bulk import bulk_insert, reset_sequences
+
+# Directory holding the seed JSON files
+SEED_DIR = os.path.dirname(os.path.abspath(__file__))
+
 
-def seedData():
+# Load: Returns the rows of a seed JSON file
+def load(filename):
+    with open(os.path.join(SEED_DIR, filename)) as f:
+        return json.load(f)
+
+
+# Seed Data: Replaces every table with the rows in the seed JSON files
+    # password_hash skips bcrypt entirely; otherwise each distinct password is hashed once, in parallel
+    # Errors are re-raised after rolling back, so `flask seed` exits non-zero when seeding fails
+def seedData(password_hash=None):
     try:
-        # Clear all tables
-        db.session.query(User).delete()
-        db.session.query(Appointment).delete()
-        db.session.query(Service).delete()
-        db.session.query(Business).delete()
-
-        # Open User JSON file
-        with open('seed_data/seedUsers.json') as f:
-            users = json.load(f)
-            for user in users:
-                hashed = bcrypt.hashpw(user['password'].encode('utf-8'), bcrypt.gensalt())
-                new_user = User(
-                    full_name=user['full_name'],
-                    email=user['email'],
-                    username=user['username'],
-                    phone_number=user['phone_number'],
-                    password=hashed.decode('utf-8')
-                )
-                db.session.add(new_user)
-            db.session.commit()
-        
-        # Open Business JSON file
-        with open('seed_data/seedBusinesses.json') as f:
-            businesses = json.load(f)
-            for business in businesses:
-                new_business = Business(
-                    name=business['name'],
-                    address=business['address'],
-                    city=business['city'],
-                    state=business['state'],
-                    phone_number=business['phone_number'],
-                    email=business['email'],
-                    password=business['password'],
-                )
-                db.session.add(new_business)
-            db.session.commit()
-
-        # Open Service JSON file
-        with open('seed_data/seedServices.json') as f:
-            services = json.load(f)
-            for service in services:
-                new_service = Service(
-                    name=service['name'],
-                    duration=service['duration'],
-                    price=service['price'],
-                    description=service['description'],
-                    business_id=service['business_id'],
-                )
-                db.session.add(new_service)
-            db.session.commit()
-        
-        # Open Appointment JSON file
-        with open('seed_data/seedAppointments.json') as f:
-            appointments = json.load(f)
-            for appointment in appointments:
-                # Convert date string to date object - Python objects are not JSON serializable
-                date_str = appointment['date']
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                appointment['date'] = date_obj
-
-                # Convert time string to time object - Python objects are not JSON serializable
-                time_str = appointment['time']
-                # Remove milliseconds from time string
-                time_obj = datetime.strptime(time_str[:-3], '%H:%M').time()
-                appointment['time'] = time_obj
-
-                new_appointment = Appointment(
-                    date=appointment['date'],
-                    time=appointment['time'],
-                    user_id=appointment['user_id'],
-                    business_id=appointment['business_id'],
-                    service_id=appointment['service_id'],
-                    notes=appointment['notes']
+        users = load('seedUsers.json')
+        businesses = load('seedBusinesses.json')
+        services = load('seedServices.json')
+        appointments = load('seedAppointments.json')
+
+        # Hash each distinct plaintext password once in the hashing pool
+        if password_hash:
+            hashes = {row['password']: password_hash for row in users + businesses}
+        else:
+            plaintext = sorted({row['password'] for row in users + businesses})
+            hashes = dict(zip(plaintext, passwords.hash_many(plaintext)))
+
+        with db.engine.begin() as connection:
+            # Derived tables are rebuilt once after the load instead of once per row
+            drop_triggers(connection)
+
+            # Clear all tables - appointments first, as they reference the other tables
+            for model in (Appointment, Service, Business, User):
+                connection.execute(model.__table__.delete())
+
+            bulk_insert(connection, User.__table__, ['id', 'full_name', 'email', 'username', 'phone_number', 'password'], (
+                (user['id'], user['full_name'], user['email'], user['username'], user['phone_number'], hashes[user['password']])
+                for user in users
+            ))
+
+            bulk_insert(connection, Business.__table__, ['id', 'name', 'address', 'city', 'state', 'phone_number', 'email', 'password'], (
+                (business['id'], business['name'], business['address'], business['city'], business['state'],
+                 business['phone_number'], business['email'], hashes[business['password']])
+                for business in businesses
+            ))
+
+            bulk_insert(connection, Service.__table__, ['id', 'name', 'duration', 'price', 'description', 'business_id'], (
+                (service['id'], service['name'], service['duration'], service['price'], service['description'], service['business_id'])
+                for service in services
+            ))
+
+            bulk_insert(connection, Appointment.__table__, ['id', 'date', 'time', 'status', 'user_id', 'business_id', 'service_id', 'notes'], (
+                (
+                    appointment['id'],
+                    # Convert date string to date object - Python objects are not JSON serializable
+                    datetime.strptime(appointment['date'], '%Y-%m-%d').date(),
+                    # Convert time string to time object - remove seconds from time string
+                    datetime.strptime(appointment['time'][:-3], '%H:%M').time(),
+                    AppointmentStatus.PENDING_CONFIRMATION,
+                    appointment['user_id'],
+                    appointment['business_id'],
+                    appointment['service_id'],
+                    appointment['notes']
                 )
-                db.session.add(new_appointment)
-            db.session.commit()
-        
-        print('Data Seeded Successfully!')
-    
-    except Exception as e:
-        print(f'Error occurred while seeding data: {str(e)}')
+                for appointment in appointments
+            ))
+
+            # Seed rows carry explicit IDs
+            reset_sequences(connection, [model.__table__ for model in (User, Business, Service, Appointment)])
+
+        rebuild_all()
 
+        # Coordinates come from the offline geocode file - the triggers are back, so the import updates the location index
+        import_geocodes(os.path.join(SEED_DIR, 'geocodes.csv'))
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,97 @@
+# Availability Engine
+    # Computes open slots for a service from a business's existing appointments
+    # Appointments in the range are read in one query and kept as sorted, merged busy intervals per day,
+    # so each day is swept once instead of rescanning appointments for every candidate slot
+
+
+# Import dependencies
+from flask import current_app
+from datetime import datetime, timedelta
+from server.database import db
+
+# Import Models
+from server.models import Appointment, Service, AppointmentStatus
+
+# Default opening hours, slot granularity in minutes and longest range served in one request
+DEFAULT_BUSINESS_HOURS = ('09:00', '17:00')
+DEFAULT_SLOT_INTERVAL = 30
+DEFAULT_MAX_DAYS = 31
+
+
+# Minutes: Converts a time object or 'HH:MM' string to minutes since midnight
+def minutes(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%H:%M').time()
+    return value.hour * 60 + value.minute
+
+
+# Clock: Converts minutes since midnight to an 'HH:MM' string
+def clock(value):
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+
+# Merge: Sorts intervals and merges the ones that overlap or touch
+def merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+# Busy Intervals: Returns {date: merged [start, end] minute intervals} for a business's bookings in a date range
+def busy_intervals(business_id, start_date, end_date):
+    bookings = db.session.query(Appointment.date, Appointment.time, Service.duration).join(
+        Service, Appointment.service_id == Service.id
+    ).filter(
+        Appointment.business_id == business_id,
+        Appointment.date >= start_date,
+        Appointment.date <= end_date,
+        Appointment.status != AppointmentStatus.CANCELLED
+    ).all()
+
+    days = {}
+    for date, time, duration in bookings:
+        start = minutes(time)
+        days.setdefault(date, []).append((start, start + duration))
+
+    return {date: merge(intervals) for date, intervals in days.items()}
+
+
+# Free Slots: Returns start minutes of every slot of the given duration that fits between busy intervals
+    # Candidates and busy intervals are both sorted, so one pointer walks the busy list once per day
+def free_slots(busy, duration, opening, closing, step):
+    slots = []
+    i = 0
+    for start in range(opening, closing - duration + 1, step):
+        # Skip busy intervals that end before this candidate starts
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        # The candidate is free if the next busy interval starts after it ends
+        if i == len(busy) or busy[i][0] >= start + duration:
+            slots.append(start)
+    return slots
+
+
+# Availability: Returns {'YYYY-MM-DD': ['HH:MM', ...]} of open slots for a duration over a date range
+def availability(business_id, duration, start_date, end_date):
+    opening, closing = (minutes(value) for value in current_app.config.get('BUSINESS_HOURS', DEFAULT_BUSINESS_HOURS))
+    step = current_app.config.get('SLOT_INTERVAL', DEFAULT_SLOT_INTERVAL)
+    max_days = current_app.config.get('MAX_AVAILABILITY_DAYS', DEFAULT_MAX_DAYS)
+
+    if end_date < start_date:
+        raise ValueError('end must not be before start')
+    if (end_date - start_date).days >= max_days:
+        raise ValueError(f'Date range cannot exceed {max_days} days')
+
+    busy = busy_intervals(business_id, start_date, end_date)
+
+    days = {}
+    date = start_date
+    while date <= end_date:
+        slots = free_slots(busy.get(date, []), duration, opening, closing, step)
+        days[date.isoformat()] = [clock(slot) for slot in slots]
+        date += timedelta(days=1)
+    return days
@@ -0,0 +1,310 @@
+# Batch Appointment Operations
+    # Creates, updates or cancels many appointments of one business in a single transaction
+    # The business's bookings on the affected days are loaded once into a Calendar, and every item
+    # is checked against it (and against the items accepted before it) in one pass
+
+
+# Import dependencies
+from bisect import bisect_left, insort
+from datetime import datetime
+from flask import current_app
+from server.database import db
+
+# Import Models
+from server.models import User, Appointment, Service, AppointmentStatus
+
+# Import Booking helpers
+from server.booking import lock_business
+from server.availability import minutes
+
+# Import Response Cache - business responses embed appointments
+from server.cache import cache, business_tags
+
+# Import Background Jobs - notifications are sent after the response
+from server.jobs import jobs
+from server.notifications import notification_jobs
+
+# Default maximum number of items in one batch
+DEFAULT_BATCH_LIMIT = 1000
+
+
+# Batch Error: Raised when a batch as a whole is invalid
+class BatchError(ValueError):
+    pass
+
+
+# Item Error: Raised when one item of a batch cannot be applied
+class ItemError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Calendar: Sorted (start, end, id) minute intervals per day for one business
+    # New, unsaved items use negative IDs
+class Calendar:
+    def __init__(self):
+        self.days = {}
+        # Longest interval seen - bounds how far back an overlapping interval can start
+        self.longest = 0
+
+    # Add Method: Adds an interval to a day
+    def add(self, date, start, end, id):
+        insort(self.days.setdefault(date, []), (start, end, id))
+        self.longest = max(self.longest, end - start)
+
+    # Remove Method: Removes an interval added with the same values
+    def remove(self, date, start, end, id):
+        intervals = self.days.get(date, [])
+        i = bisect_left(intervals, (start, end, id))
+        if i < len(intervals) and intervals[i] == (start, end, id):
+            del intervals[i]
+
+    # Conflict Method: Returns the ID of an interval overlapping [start, end) on a day, or None
+    def conflict(self, date, start, end):
+        intervals = self.days.get(date, [])
+        for booked_start, booked_end, id in intervals[bisect_left(intervals, (start - self.longest,)):]:
+            if booked_start >= end:
+                break
+            if booked_end > start:
+                return id
+        return None
+
+
+# Load Calendar: Returns a Calendar of the business's non-cancelled bookings on the given days
+def load_calendar(business_id, dates):
+    calendar = Calendar()
+    if not dates:
+        return calendar
+
+    bookings = db.session.query(Appointment.id, Appointment.date, Appointment.time, Service.duration).join(
+        Service, Appointment.service_id == Service.id
+    ).filter(
+        Appointment.business_id == business_id,
+        Appointment.date.in_(dates),
+        Appointment.status != AppointmentStatus.CANCELLED
+    )
+    for id, date, time, duration in bookings:
+        start = minutes(time)
+        calendar.add(date, start, start + duration, id)
+    return calendar
+
+
+# Get Body: Returns a batch request's JSON body, which must be an object
+def get_body(data):
+    if not isinstance(data, dict):
+        raise BatchError('Request body must be a JSON object')
+    return data
+
+
+# Get Items: Validates the batch size and returns its items
+def get_items(items):
+    limit = current_app.config.get('BATCH_LIMIT', DEFAULT_BATCH_LIMIT)
+    if not isinstance(items, list) or not items:
+        raise BatchError('A non-empty list of items is required')
+    if len(items) > limit:
+        raise BatchError(f'Batches cannot exceed {limit} items')
+    return items
+
+
+# Parse Date / Parse Time: Convert request strings to date and time objects
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ItemError('invalid', 'date must be YYYY-MM-DD')
+
+def parse_time(value):
+    try:
+        return datetime.strptime(value, '%H:%M').time()
+    except (TypeError, ValueError):
+        raise ItemError('invalid', 'time must be HH:MM')
+
+
+# Get ID: Returns an item's integer ID field - other values (e.g. lists or objects) make the item invalid
+def get_id(item, key, default=None):
+    value = item.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ItemError('invalid', f'{key} must be an integer')
+    return value
+
+
+# Apply: Runs apply_item on every item inside one transaction and returns per-item results
+    # load() runs once the business is locked - it reads the rows the items are checked against and returns
+    # the days whose bookings are needed, so no status or slot can change between the checks and the writes
+    # With atomic=True nothing is persisted unless every item succeeds
+    # Each changed appointment gets a notification of the given type once the transaction commits
+def apply(business_id, items, load, apply_item, atomic, notification):
+    try:
+        lock_business(business_id)
+        calendar = load_calendar(business_id, load())
+
+        results = []
+        for index, item in enumerate(items):
+            try:
+                results.append({'index': index, 'status': 'ok', 'appointment': apply_item(index, item, calendar)})
+            except ItemError as e:
+                results.append({'index': index, 'status': e.status, 'error': str(e)})
+
+        failed = sum(result['status'] != 'ok' for result in results)
+        if atomic and failed:
+            db.session.rollback()
+            for result in results:
+                result.pop('appointment', None)
+            return {'results': results, 'succeeded': 0, 'failed': failed, 'committed': False}
+
+        # Flushing assigns IDs to new appointments, so results are serialized before commit
+            # expires them and every row would be reloaded one by one
+        db.session.flush()
+        notifications = notification_jobs(notification, *(result['appointment'] for result in results if 'appointment' in result))
+        for result in results:
+            if 'appointment' in result:
+                result['appointment'] = result['appointment'].serialize()
+
+        db.session.commit()
+        cache.invalidate(*business_tags(business_id))
+        jobs.enqueue_many(notifications)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {'results': results, 'succeeded': len(results) - failed, 'failed': failed, 'committed': True}
+
+
+# Create Many: Books every item that is valid and free
+    # Items can only book for owner_id, the user the request's token was issued to
+def create_many(business_id, items, owner_id, atomic=False):
+    items = get_items(items)
+    services, user_ids = {}, set()
+
+    def load():
+        services.update((service.id, service) for service in Service.query.filter_by(business_id=business_id))
+        user_ids.update(id for id, in db.session.query(User.id).filter(User.id.in_(
+            {item.get('user_id') for item in items if isinstance(item, dict) and isinstance(item.get('user_id'), int)}
+        )))
+        dates = set()
+        for item in items:
+            try:
+                dates.add(parse_date(item.get('date')))
+            except (ItemError, AttributeError):
+                pass
+        return dates
+
+    def create(index, item, calendar):
+        if not isinstance(item, dict):
+            raise ItemError('invalid', 'Item must be an object')
+        user_id = get_id(item, 'user_id')
+        if user_id != owner_id:
+            raise ItemError('forbidden', 'Appointments can only be booked for your own account')
+        date, time = parse_date(item.get('date')), parse_time(item.get('time'))
+        service = services.get(get_id(item, 'service_id'))
+        if service is None:
+            raise ItemError('not_found', 'Service not found')
+        if user_id not in user_ids:
+            raise ItemError('not_found', 'User not found')
+
+        start = minutes(time)
+        if calendar.conflict(date, start, start + service.duration) is not None:
+            raise ItemError('conflict', 'Time slot is already booked')
+        calendar.add(date, start, start + service.duration, -(index + 1))
+
+        appointment = Appointment(
+            date=date,
+            time=time,
+            user_id=user_id,
+            business_id=business_id,
+            service_id=service.id,
+            notes=item.get('notes')
+        )
+        db.session.add(appointment)
+        return appointment
+
+    return apply(business_id, items, load, create, atomic, 'confirmation')
+
+
+# Load Targets: Returns {id: appointment} for the business's appointments named by items
+def load_targets(business_id, ids):
+    return {appointment.id: appointment for appointment in Appointment.query.filter(
+        Appointment.business_id == business_id,
+        Appointment.id.in_(ids)
+    )}
+
+
+# Update Many: Moves or edits every item whose new slot is free
+    # Only appointments of owner_id, the user the request's token was issued to, can be changed
+def update_many(business_id, items, owner_id, atomic=False):
+    items = get_items(items)
+    services, targets = {}, {}
+
+    def load():
+        services.update((service.id, service) for service in Service.query.filter_by(business_id=business_id))
+        targets.update(load_targets(business_id, {item.get('id') for item in items if isinstance(item, dict) and isinstance(item.get('id'), int)}))
+        dates = {appointment.date for appointment in targets.values()}
+        for item in items:
+            try:
+                dates.add(parse_date(item['date']))
+            except (ItemError, KeyError, TypeError):
+                pass
+        return dates
+
+    def update(index, item, calendar):
+        if not isinstance(item, dict):
+            raise ItemError('invalid', 'Item must be an object')
+        appointment = targets.get(get_id(item, 'id'))
+        if appointment is None:
+            raise ItemError('not_found', 'Appointment not found')
+        if appointment.user_id != owner_id:
+            raise ItemError('forbidden', 'Appointment belongs to another user')
+        if appointment.status in (AppointmentStatus.CANCELLED, AppointmentStatus.COMPLETED):
+            raise ItemError('invalid', f'Appointment is {appointment.status.value.lower()}')
+
+        date = parse_date(item['date']) if 'date' in item else appointment.date
+        time = parse_time(item['time']) if 'time' in item else appointment.time
+        service = services.get(get_id(item, 'service_id', appointment.service_id))
+        if service is None:
+            raise ItemError('not_found', 'Service not found')
+
+        # Free the appointment's current slot, then claim the new one
+        old_service = services[appointment.service_id]
+        old_start = minutes(appointment.time)
+        calendar.remove(appointment.date, old_start, old_start + old_service.duration, appointment.id)
+
+        start = minutes(time)
+        if calendar.conflict(date, start, start + service.duration) is not None:
+            calendar.add(appointment.date, old_start, old_start + old_service.duration, appointment.id)
+            raise ItemError('conflict', 'Time slot is already booked')
+        calendar.add(date, start, start + service.duration, appointment.id)
+
+        appointment.date = date
+        appointment.time = time
+        appointment.service_id = service.id
+        if 'notes' in item:
+            appointment.notes = item['notes']
+        return appointment
+
+    return apply(business_id, items, load, update, atomic, 'rescheduled')
+
+
+# Cancel Many: Cancels every appointment named by ID
+    # Only appointments of owner_id, the user the request's token was issued to, can be cancelled
+def cancel_many(business_id, ids, owner_id, atomic=False):
+    ids = get_items(ids)
+    targets = {}
+
+    def load():
+        targets.update(load_targets(business_id, {id for id in ids if isinstance(id, int)}))
+        # Cancelling frees slots and never conflicts, so no calendar is needed
+        return set()
+
+    def cancel(index, id, calendar):
+        appointment = targets.get(id)
+        if appointment is None:
+            raise ItemError('not_found', 'Appointment not found')
+        if appointment.user_id != owner_id:
+            raise ItemError('forbidden', 'Appointment belongs to another user')
+        if appointment.status in (AppointmentStatus.CANCELLED, AppointmentStatus.COMPLETED):
+            raise ItemError('invalid', f'Appointment is {appointment.status.value.lower()}')
+        appointment.status = AppointmentStatus.CANCELLED
+        return appointment
+
+    return apply(business_id, ids, load, cancel, atomic, 'cancellation')
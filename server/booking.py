@@ -0,0 +1,169 @@
+# Appointment Booking
+    # Checks new and rescheduled appointments for overlaps with the business's existing bookings
+    # The check and the write run under a per-business lock so two clients cannot take the same slot
+
+
+# Import dependencies
+from server.database import db
+from datetime import datetime, time as clock_time
+
+# Import Models
+from server.models import Appointment, Business, Service, AppointmentStatus
+
+# Import Availability helpers
+from server.availability import minutes
+
+# Import Response Cache - business responses embed appointments
+from server.cache import cache, business_tags
+
+# Import Background Jobs - confirmations are sent after the response
+from server.jobs import jobs
+from server.notifications import notification_jobs
+
+# Import Appointment Lifecycle - only open appointments can be moved
+from server.lifecycle import OPEN, TransitionError
+
+
+# Booking Conflict: Raised when an appointment overlaps an existing booking
+class BookingConflict(Exception):
+    pass
+
+
+# Booking Not Found: Raised when the business or service being booked does not exist
+class BookingNotFound(Exception):
+    pass
+
+
+# Booking Error: Raised when a booking request is missing a field or has one in the wrong format
+class BookingError(ValueError):
+    pass
+
+
+# Read Booking: Checks a booking request body and returns its date and time as objects (None when absent)
+    # Every field in required must be present
+def read_booking(data, required=()):
+    if not isinstance(data, dict):
+        raise BookingError('Request body must be a JSON object')
+    missing = [field for field in required if field not in data]
+    if missing:
+        raise BookingError(f'Missing required fields: {", ".join(missing)}')
+
+    try:
+        date = datetime.strptime(data['date'], '%Y-%m-%d').date() if 'date' in data else None
+    except (TypeError, ValueError):
+        raise BookingError('date must be YYYY-MM-DD')
+    try:
+        time = datetime.strptime(data['time'], '%H:%M').time() if 'time' in data else None
+    except (TypeError, ValueError):
+        raise BookingError('time must be HH:MM')
+    return date, time
+
+
+# Lock Business: Holds a write lock covering the business's bookings until the transaction ends
+    # SQLite has no row locks, so BEGIN IMMEDIATE takes the database write lock before the overlap check
+    # Server databases lock only the business row, so bookings for other businesses are not serialized
+def lock_business(business_id):
+    if db.engine.dialect.name == 'sqlite':
+        connection = db.session.connection()
+        if not connection.connection.driver_connection.in_transaction:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+    else:
+        db.session.query(Business.id).filter_by(id=business_id).with_for_update().first()
+
+
+# Find Conflict: Returns the first booking that overlaps [time, time + duration) on a date, or None
+    # Uses the (business_id, date, time) index to read only that business's bookings for the day
+def find_conflict(business_id, date, time, duration, exclude_id=None):
+    start = minutes(time)
+    end = start + duration
+
+    query = db.session.query(Appointment, Service.duration).join(
+        Service, Appointment.service_id == Service.id
+    ).filter(
+        Appointment.business_id == business_id,
+        Appointment.date == date,
+        Appointment.status != AppointmentStatus.CANCELLED
+    )
+    # Bookings starting at or after the new end cannot overlap
+    if end < 24 * 60:
+        query = query.filter(Appointment.time < clock_time(end // 60, end % 60))
+    if exclude_id is not None:
+        query = query.filter(Appointment.id != exclude_id)
+
+    for appointment, booked_duration in query.order_by(Appointment.time):
+        booked_start = minutes(appointment.time)
+        if booked_start < end and booked_start + booked_duration > start:
+            return appointment
+    return None
+
+
+# Get Service: Returns a business's service, raising BookingNotFound if the business or service does not exist
+def get_service(business_id, service_id):
+    service = Service.query.filter_by(id=service_id, business_id=business_id).first()
+    if not service:
+        # The business is only looked up to name what is missing
+        if not db.session.get(Business, business_id):
+            raise BookingNotFound('Business not found')
+        raise BookingNotFound('Service not found')
+    return service
+
+
+# Book Appointment: Creates an appointment if its slot is free, atomically with the overlap check
+def book_appointment(user_id, business_id, service_id, date, time, notes=None):
+    service = get_service(business_id, service_id)
+
+    try:
+        lock_business(business_id)
+
+        if find_conflict(business_id, date, time, service.duration):
+            raise BookingConflict('Time slot is already booked')
+
+        appointment = Appointment(
+            date=date,
+            time=time,
+            user_id=user_id,
+            business_id=business_id,
+            service_id=service_id,
+            notes=notes
+        )
+        db.session.add(appointment)
+        db.session.flush()
+        notifications = notification_jobs('confirmation', appointment)
+        db.session.commit()
+        cache.invalidate(*business_tags(business_id))
+        jobs.enqueue_many(notifications)
+        return appointment
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+# Reschedule Appointment: Moves an appointment to a new date, time or service if the new slot is free
+    # Raises TransitionError if the appointment has been cancelled or completed
+def reschedule_appointment(appointment, date=None, time=None, service_id=None, notes=None):
+    if appointment.status not in OPEN:
+        raise TransitionError(f'Appointment is {appointment.status.value.lower()}')
+
+    date = date or appointment.date
+    time = time or appointment.time
+    service = get_service(appointment.business_id, service_id or appointment.service_id)
+
+    try:
+        lock_business(appointment.business_id)
+
+        if find_conflict(appointment.business_id, date, time, service.duration, exclude_id=appointment.id):
+            raise BookingConflict('Time slot is already booked')
+
+        appointment.date = date
+        appointment.time = time
+        appointment.service_id = service.id
+        if notes is not None:
+            appointment.notes = notes
+        notifications = notification_jobs('rescheduled', appointment)
+        db.session.commit()
+        cache.invalidate(*business_tags(appointment.business_id))
+        jobs.enqueue_many(notifications)
+        return appointment
+    except Exception:
+        db.session.rollback()
+        raise
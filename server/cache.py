@@ -0,0 +1,221 @@
+# Response Cache
+    # Caches serialized responses of read-heavy routes, keyed by endpoint, query string and tag generations
+    # Writes bump the generation of the tags they affect, so stale entries are never read again and age out
+    # Every cached response carries an ETag, and If-None-Match requests get a 304 without a body
+    # Live views (a day's schedule, the pending queue) are not cached - an in-memory backend is local to one
+    # worker, so the others would keep serving them stale - but still get ETags through conditional
+
+
+# Import dependencies
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, request, make_response
+import hashlib, os, sqlite3, threading, time
+
+# Default time to live (seconds) and maximum number of cached responses
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1024
+
+
+# Memory Cache: LRU cache with TTL, local to one process
+class MemoryCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # Generations are kept apart from entries so eviction never resets them
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    # Get Method: Returns a cached value, or None if it is missing or expired
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    # Set Method: Caches a value, evicting the least recently used entries beyond max_entries
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # Generation Method: Returns the current generation of a tag
+    def generation(self, tag):
+        return self.generations.get(tag, 0)
+
+    # Bump Method: Invalidates every entry cached under a tag
+    def bump(self, tag):
+        with self.lock:
+            self.generations[tag] = self.generations.get(tag, 0) + 1
+
+    # Clear Method: Removes every entry
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# SQLite Cache: Cache with TTL in a local SQLite file, shared by every worker process on one node
+    # Reads never write, so cached reads in every worker run side by side instead of queueing for the write lock
+    # Entries are evicted by expiry - every entry has the same TTL, so beyond max_entries the oldest written go first
+class SQLiteCache:
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = threading.local()
+
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, body BLOB, mimetype TEXT, etag TEXT, expires REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_cache_entry_expires ON cache_entry (expires)')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache_generation (tag TEXT PRIMARY KEY, generation INTEGER NOT NULL)')
+
+    # Connection Method: Returns this thread's connection to the cache file
+    def _connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = sqlite3.connect(self.path, timeout=5)
+            self.local.connection.execute('PRAGMA journal_mode = WAL')
+        return self.local.connection
+
+    # Get Method: Returns a cached value, or None if it is missing or expired - expired rows are left for set to purge
+    def get(self, key):
+        return self._connection().execute(
+            'SELECT body, mimetype, etag FROM cache_entry WHERE key = ? AND expires >= ?', (key, time.time())
+        ).fetchone()
+
+    # Set Method: Caches a value, then purges expired entries and the oldest beyond max_entries
+    def set(self, key, value):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO cache_entry (key, body, mimetype, etag, expires) VALUES (?, ?, ?, ?, ?)',
+                               (key, *value, now + self.ttl))
+            connection.execute('DELETE FROM cache_entry WHERE expires < ?', (now,))
+            connection.execute('''
+                DELETE FROM cache_entry WHERE key IN (
+                    SELECT key FROM cache_entry ORDER BY expires DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+    def generation(self, tag):
+        row = self._connection().execute('SELECT generation FROM cache_generation WHERE tag = ?', (tag,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, tag):
+        with self._connection() as connection:
+            connection.execute('''
+                INSERT INTO cache_generation VALUES (?, 1)
+                ON CONFLICT (tag) DO UPDATE SET generation = generation + 1
+            ''', (tag,))
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache_entry')
+
+
+# Backends selectable with CACHE_BACKEND
+BACKENDS = {
+    'memory': lambda app, max_entries, ttl: MemoryCache(max_entries, ttl),
+    'sqlite': lambda app, max_entries, ttl: SQLiteCache(
+        app.config.get('CACHE_PATH') or os.path.join(app.instance_path, 'cache.sqlite'), max_entries, ttl
+    ),
+    'none': lambda app, max_entries, ttl: None,
+}
+
+
+# Business Tags: Tags invalidated by any write to a business, its services or its appointments
+def business_tags(business_id):
+    return ('catalog', f'business:{business_id}')
+
+
+# Entry: Returns the (body, mimetype, etag) kept for a response
+def _entry(response):
+    body = response.get_data()
+    return body, response.mimetype, hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+# Conditional: Returns an entry as a response - 304 Not Modified when If-None-Match matches its ETag
+def _conditional(entry):
+    body, mimetype, etag = entry
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+# Response Cache: Flask extension holding the configured backend
+class ResponseCache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    # Init App Method: Creates the backend named by CACHE_BACKEND
+    def init_app(self, app):
+        if app.config.get('CACHE_BACKEND', 'memory') == 'sqlite':
+            os.makedirs(app.instance_path, exist_ok=True)
+
+        app.extensions['cache'] = BACKENDS[app.config.get('CACHE_BACKEND', 'memory')](
+            app,
+            app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            app.config.get('CACHE_TTL', DEFAULT_TTL)
+        )
+
+    # Backend Property: Returns the current app's backend, or None if caching is disabled
+    @property
+    def backend(self):
+        return current_app.extensions.get('cache')
+
+    # Invalidate Method: Bumps the generation of every tag so entries cached under them are no longer read
+    def invalidate(self, *tags):
+        if self.backend is not None:
+            for tag in tags:
+                self.backend.bump(tag)
+
+    # Key Method: Builds the cache key for the current request
+    def _key(self, tags):
+        args = urlencode(sorted(request.args.items(multi=True)))
+        generations = ','.join(f'{tag}={self.backend.generation(tag)}' for tag in tags)
+        return f'{request.endpoint}?{args}|{generations}'
+
+    # Cached Method: Decorator caching a route's 200 responses under the tags returned by tags(**view_args)
+    def cached(self, tags):
+        def decorator(route):
+            @wraps(route)
+            def wrapper(*args, **kwargs):
+                backend = self.backend
+                key = self._key(tags(**kwargs)) if backend is not None else None
+                entry = backend.get(key) if backend is not None else None
+
+                if entry is None:
+                    response = make_response(route(*args, **kwargs))
+                    # Errors are never cached
+                    if response.status_code != 200:
+                        return response
+
+                    entry = _entry(response)
+                    if backend is not None:
+                        backend.set(key, entry)
+
+                return _conditional(entry)
+            return wrapper
+        return decorator
+
+    # Conditional Method: Decorator adding an ETag to a route's 200 responses without caching them
+    def conditional(self, route):
+        @wraps(route)
+        def wrapper(*args, **kwargs):
+            response = make_response(route(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            return _conditional(_entry(response))
+        return wrapper
+
+
+cache = ResponseCache()
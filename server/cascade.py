@@ -0,0 +1,39 @@
+# Cascading Deletes
+    # Removes a business or service together with the rows that depend on it using set-based statements
+    # A business with 100k appointments is deleted in a handful of statements instead of 100k ORM deletes
+    # The caller commits, so a failure rolls every statement back together
+
+
+# Import dependencies
+from sqlalchemy import delete, select, or_
+from server.database import db
+
+# Import Models
+from server.models import Appointment, Service, Business
+
+
+# Execute: Runs a bulk delete without reconciling objects already in the session
+    # Callers commit immediately afterwards, which expires the session anyway
+def _execute(statement):
+    return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+
+# Delete Service: Deletes a service and its appointments, returning the number of appointments removed
+def delete_service(service_id):
+    appointments = _execute(delete(Appointment).where(Appointment.service_id == service_id))
+    _execute(delete(Service).where(Service.id == service_id))
+    return appointments
+
+
+# Delete Business: Deletes a business, its services and their appointments, returning the rows removed per table
+def delete_business(business_id):
+    services = select(Service.id).where(Service.business_id == business_id).scalar_subquery()
+
+    return {
+        'appointments': _execute(delete(Appointment).where(or_(
+            Appointment.business_id == business_id,
+            Appointment.service_id.in_(services)
+        ))),
+        'services': _execute(delete(Service).where(Service.business_id == business_id)),
+        'businesses': _execute(delete(Business).where(Business.id == business_id)),
+    }
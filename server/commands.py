@@ -0,0 +1,176 @@
+# CLI Commands
+    # Startup is split into explicit steps, so starting a process never changes the database:
+    # flask migrate, then optionally flask seed / flask generate-fixtures, then flask serve
+    # Each command imports what it needs when it runs, keeping `import app` cheap
+
+
+# Import dependencies
+import click, os, sys, time
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+# Run Migrations: Creates missing tables, columns, indexes and derived tables
+def run_migrations():
+    from server.migrations import migrate
+    from server.derived import create_all
+
+    started = time.perf_counter()
+    columns, indexes = migrate()
+    create_all()
+    for column in columns:
+        click.echo(f'Added column {column.name} to {column.table.name}')
+    for index in indexes:
+        click.echo(f'Created index {index.name} on {index.table.name}')
+    click.echo(f'Database up to date ({len(indexes)} indexes created) in {time.perf_counter() - started:.1f}s')
+
+
+# Migrate: Brings the database schema up to date
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    run_migrations()
+
+
+# Seed: Replaces every table with the rows in seed_data/*.json
+@click.command('seed')
+@click.option('--password-hash', default=None, help='Precomputed bcrypt hash stored for every account instead of hashing each password.')
+@with_appcontext
+def seed_command(password_hash):
+    from seed_data.main import seedData
+
+    try:
+        seedData(password_hash)
+    except Exception as e:
+        raise click.ClickException(f'Error occurred while seeding data: {e}')
+    click.echo('Data Seeded Successfully!')
+
+
+# Generate Fixtures: Replaces every table with synthetic rows
+@click.command('generate-fixtures')
+@click.option('--users', default=1000, show_default=True, help='Number of users.')
+@click.option('--businesses', default=100, show_default=True, help='Number of businesses.')
+@click.option('--appointments', default=10000, show_default=True, help='Number of appointments, spread evenly across businesses.')
+@click.option('--services-per-business', default=3, show_default=True, help='Number of services per business.')
+@click.option('--password-hash', default=None, help='Precomputed bcrypt hash stored for every account instead of hashing once.')
+@with_appcontext
+def generate_fixtures_command(users, businesses, appointments, services_per_business, password_hash):
+    from seed_data.generate import generate_fixtures
+
+    started = time.perf_counter()
+    counts = generate_fixtures(users, businesses, appointments, services_per_business, password_hash)
+    elapsed = time.perf_counter() - started
+
+    click.echo(', '.join(f'{count} {table}' for table, count in counts.items()) + f' loaded in {elapsed:.1f}s')
+
+
+# Serve: Replaces this process with gunicorn serving wsgi:app with the settings in gunicorn.conf.py
+@click.command('serve')
+@click.option('--migrate', is_flag=True, help='Run migrations once before starting the workers.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: WEB_CONCURRENCY or cores + 1).')
+@click.option('--bind', default=None, help='Address to listen on (default: BIND or 0.0.0.0:PORT).')
+@with_appcontext
+def serve_command(migrate, workers, bind):
+    if migrate:
+        run_migrations()
+
+        # Close the connections opened by migrations - the workers open their own
+        from server.database import db
+        db.engine.dispose()
+
+    root = current_app.root_path
+    args = [sys.executable, '-m', 'gunicorn', '--chdir', root, '-c', os.path.join(root, 'gunicorn.conf.py')]
+    if workers:
+        args += ['--workers', str(workers)]
+    if bind:
+        args += ['--bind', bind]
+
+    sys.stdout.flush()
+    os.execv(sys.executable, args + ['wsgi:app'])
+
+
+# Rebuild Stats: Recomputes the business statistics rollup from the appointment table
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    from server.derived import rebuild_all
+    from server.stats import STATS_ROLLUP
+
+    if not STATS_ROLLUP.enabled():
+        click.echo('Statistics are aggregated from appointments on this database - nothing to rebuild')
+        return
+
+    started = time.perf_counter()
+    rebuild_all(STATS_ROLLUP)
+    click.echo(f'Statistics rebuilt in {time.perf_counter() - started:.1f}s')
+
+
+# Import Geocodes: Sets business coordinates from a local CSV file - no geocoding service is called
+@click.command('import-geocodes')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--overwrite', is_flag=True, help='Replace coordinates of businesses that already have them.')
+@with_appcontext
+def import_geocodes_command(path, overwrite):
+    from server.geo import import_geocodes
+
+    started = time.perf_counter()
+    counts = import_geocodes(path, overwrite)
+    click.echo(f'{counts["address"]} businesses located by address, {counts["city"]} by city, '
+               f'{counts["unmatched"]} unmatched in {time.perf_counter() - started:.1f}s')
+
+
+# Run Jobs: Runs background job workers in the foreground, e.g. when web processes set JOB_WORKERS=0
+@click.command('run-jobs')
+@click.option('--once', is_flag=True, help='Run the jobs due now, then exit.')
+@with_appcontext
+def run_jobs_command(once):
+    from server.jobs import jobs
+
+    app = current_app._get_current_object()
+    if once:
+        started = time.perf_counter()
+        processed = jobs.run(app, once=True)
+        counts = app.extensions['jobs'].counts()
+        click.echo(f'{processed} jobs run in {time.perf_counter() - started:.1f}s; ' +
+                   (', '.join(f'{count} {status}' for status, count in sorted(counts.items())) or 'queue empty'))
+    else:
+        jobs.run(app)
+
+
+# Send Reminders: Queues reminders for a date (default tomorrow) - runs once per date, however often it is called
+@click.command('send-reminders')
+@click.option('--date', 'day', default=None, help='Date of the appointments to remind, YYYY-MM-DD (default: tomorrow).')
+@with_appcontext
+def send_reminders_command(day):
+    from datetime import date, timedelta
+    from server.notifications import queue_reminders
+
+    day = date.fromisoformat(day) if day else date.today() + timedelta(days=1)
+    queue_reminders(day)
+    click.echo(f'Reminders for {day.isoformat()} queued')
+
+
+# Complete Appointments: Marks open appointments dated before a day (default today) as completed
+@click.command('complete-appointments')
+@click.option('--before', default=None, help='Complete open appointments dated before this day, YYYY-MM-DD (default: today).')
+@with_appcontext
+def complete_appointments_command(before):
+    from datetime import date
+    from server.lifecycle import complete_past_appointments
+
+    started = time.perf_counter()
+    completed = complete_past_appointments(date.fromisoformat(before) if before else None)
+    click.echo(f'{completed} appointments completed in {time.perf_counter() - started:.1f}s')
+
+
+# Register Commands: Adds the CLI commands to an app
+def register_commands(app):
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(serve_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(generate_fixtures_command)
+    app.cli.add_command(run_jobs_command)
+    app.cli.add_command(send_reminders_command)
+    app.cli.add_command(complete_appointments_command)
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(import_geocodes_command)
@@ -1,3 +1,69 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+# Database URL: Normalizes a DATABASE_URL, accepting the postgres:// scheme many hosts hand out
+def database_url(url):
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+# Engine Options: Builds SQLALCHEMY_ENGINE_OPTIONS for a database URL from the DB_* settings
+    # Server databases get a bounded connection pool with pre-ping and recycling, so several app nodes
+    # can share one store without exhausting its connections or reusing ones the server has dropped
+    # SQLite files keep the pool defaults and wait up to busy_timeout seconds for the write lock
+def engine_options(url, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True, busy_timeout=5):
+    url = make_url(url)
+
+    if url.get_backend_name() == 'sqlite':
+        options = {'connect_args': {'timeout': busy_timeout}}
+        # In-memory databases use a single shared connection, so pool settings do not apply
+        if url.database and url.database != ':memory:':
+            options.update(pool_pre_ping=pool_pre_ping, pool_recycle=pool_recycle)
+        return options
+
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': pool_pre_ping,
+    }
+
+
+# Set SQLite Pragmas: Applied to every new SQLite connection
+    # WAL lets readers keep reading while a writer commits, and synchronous=NORMAL is safe under WAL
+def _sqlite_pragmas(wal):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
+    return set_pragmas
+
+
+# Init Database: Initializes db for an app and configures its engine
+    # Engine options come from SQLALCHEMY_ENGINE_OPTIONS, or are built from the DB_* settings
+def init_database(app):
+    url = app.config['SQLALCHEMY_DATABASE_URI'] = database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        url,
+        pool_size=app.config.get('DB_POOL_SIZE', 5),
+        max_overflow=app.config.get('DB_MAX_OVERFLOW', 10),
+        pool_timeout=app.config.get('DB_POOL_TIMEOUT', 30),
+        pool_recycle=app.config.get('DB_POOL_RECYCLE', 1800),
+        pool_pre_ping=app.config.get('DB_POOL_PRE_PING', True),
+        busy_timeout=app.config.get('SQLITE_BUSY_TIMEOUT', 5),
+    ))
+
+    db.init_app(app)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _sqlite_pragmas(app.config.get('SQLITE_WAL', True)))
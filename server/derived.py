@@ -0,0 +1,102 @@
+# Derived Tables
+    # SQLite tables computed from the models - the search index, the day schedule, the stats rollup and the location index
+    # Each is created with triggers on the tables it is computed from, so every write path keeps it in sync
+    # Bulk loads drop the triggers with drop_triggers(), write, then call rebuild_all() to recreate and refill each table once
+    # Other databases have none of them - readers check enabled() and use the model indexes instead
+
+
+# Import dependencies
+import importlib, re
+from server.database import db
+
+# Modules defining derived tables - importing them registers their tables, in this order
+MODULES = ('server.search', 'server.schedule', 'server.stats', 'server.geo')
+
+# Registered tables
+TABLES = []
+
+
+# Derived Table: A table created with its sync triggers by schema statements and refilled by rebuild statements
+class DerivedTable:
+    def __init__(self, name, schema, rebuild):
+        self.name = name
+        self.schema = schema
+        self.rebuild_statements = rebuild
+        self.triggers = re.findall(r'CREATE TRIGGER IF NOT EXISTS (\w+)', '\n'.join(schema))
+
+    # Enabled Method: The table is maintained by SQLite triggers - on other databases it does not exist
+    def enabled(self):
+        return enabled()
+
+    # Create Method: Creates the table and triggers if they do not exist yet - returns True if the table is new
+    def create(self, connection):
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.name,)
+        ).first()
+
+        for statement in self.schema:
+            connection.exec_driver_sql(statement)
+        return not exists
+
+    # Drop Triggers Method: Stops per-row maintenance until the table is created again
+    def drop_triggers(self, connection):
+        for name in self.triggers:
+            connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {name}')
+
+    # Rebuild Method: Empties the table and recomputes every row
+    def rebuild(self, connection):
+        connection.exec_driver_sql(f'DELETE FROM {self.name}')
+        for statement in self.rebuild_statements:
+            connection.exec_driver_sql(statement)
+
+
+# Register: Adds a derived table to the registry and returns it
+def register(name, schema, rebuild):
+    table = DerivedTable(name, schema, rebuild)
+    TABLES.append(table)
+    return table
+
+
+# Tables: Returns every registered table, importing the modules that define them
+def tables():
+    for module in MODULES:
+        importlib.import_module(module)
+    return TABLES
+
+
+# Enabled: Derived tables are only kept on SQLite
+def enabled():
+    return db.engine.dialect.name == 'sqlite'
+
+
+# Create All: Creates every derived table and its triggers if they do not exist yet
+    # Tables that did not exist are filled from the rows written before them
+def create_all():
+    if not enabled():
+        return
+
+    with db.engine.begin() as connection:
+        for table in tables():
+            if table.create(connection):
+                table.rebuild(connection)
+
+
+# Drop Triggers: Stops per-row maintenance of every derived table, e.g. during bulk loads
+    # Runs in the caller's transaction - call rebuild_all() once it commits to restore the tables
+def drop_triggers(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+
+    for table in tables():
+        table.drop_triggers(connection)
+
+
+# Rebuild All: Creates the given derived tables (default every one) and their triggers, then recomputes every row
+def rebuild_all(*selected):
+    if not enabled():
+        return
+
+    with db.engine.begin() as connection:
+        for table in selected or tables():
+            table.create(connection)
+            table.rebuild(connection)
@@ -0,0 +1,58 @@
+# Sparse Fieldsets
+    # ?fields=id,name limits serialized columns and ?expand=services limits serialized relationships
+    # Only the requested columns and relationships are loaded from the database
+
+
+# Import dependencies
+from flask import request
+from sqlalchemy.orm import load_only
+
+# Import Loading Strategies
+from server.loading import eager
+
+
+# Fieldset Error: Raised when fields or expand name something the model does not serialize
+class FieldsetError(ValueError):
+    pass
+
+
+# Split: Returns the comma separated values of a query string argument, or None if it is absent
+def _split(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return tuple(item.strip() for item in value.split(',') if item.strip())
+
+
+# Get Fieldset: Returns the (fields, expand) requested for a model
+    # (None, None) means the full representation; a summary is requested with e.g. ?expand= or ?fields=id,name
+def get_fieldset(model):
+    fields = _split('fields')
+    expand = _split('expand')
+
+    # No sparse fieldset requested - serialize everything
+    if fields is None and expand is None:
+        return None, None
+
+    unknown = set(fields or ()) - set(model.FIELDS)
+    if unknown:
+        raise FieldsetError(f'Unknown fields: {", ".join(sorted(unknown))}')
+
+    unknown = set(expand or ()) - set(model.RELATIONSHIPS)
+    if unknown:
+        raise FieldsetError(f'Unknown expand: {", ".join(sorted(unknown))}')
+
+    # A sparse fieldset includes every column unless fields is given, and no relationships unless expanded
+    return fields or model.FIELDS, expand or ()
+
+
+# Fieldset Options: Returns loader options that load only the requested columns and relationships
+def fieldset_options(model, fields, expand, strategy=None):
+    options = eager(model, strategy, relationships=expand)
+
+    if fields is not None:
+        # The primary key is always loaded so identity and pagination keep working
+        columns = {'id', *fields}
+        options.append(load_only(*[getattr(model, column) for column in columns]))
+
+    return options
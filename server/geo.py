@@ -0,0 +1,225 @@
+# Nearby Search
+    # Businesses with coordinates are indexed in an SQLite R*Tree, so a radius search reads only the
+    # businesses inside the radius's bounding box instead of every row, then sorts them by great-circle distance
+    # The R*Tree is a derived table (server/derived.py) kept in sync by triggers on business
+    # Coordinates come from an offline geocode file (import_geocodes) - no geocoding service is called
+
+
+# Import dependencies
+from flask import current_app, request
+from sqlalchemy import and_, or_, select, union_all, table, column, bindparam
+from server.database import db
+import csv, math
+
+# Import Models
+from server.models import Business, Service
+
+# Import Pagination
+from server.pagination import get_limit, encode_cursor, decode_cursor
+
+# Import Response Cache - business responses include coordinates
+from server.cache import cache
+
+# Import Derived Tables
+from server.derived import register
+
+# Name of the R*Tree holding one point (a box of zero size) per business
+LOCATION_TABLE = 'business_location'
+location = table(LOCATION_TABLE, column('id'), column('min_lat'), column('max_lat'), column('min_lng'), column('max_lng'),
+                 column('latitude'), column('longitude'))
+
+# Mean Earth radius and the length of one degree of latitude (km)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Default and largest search radius (km)
+DEFAULT_RADIUS_KM = 10
+DEFAULT_MAX_RADIUS_KM = 100
+
+# Adds a business's point when it has both coordinates
+INSERT_LOCATION = f'''
+    INSERT INTO {LOCATION_TABLE} (id, min_lat, max_lat, min_lng, max_lng, latitude, longitude)
+    SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude, new.latitude, new.longitude
+    WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+'''
+
+# R*Tree and sync triggers
+SCHEMA = [
+    # R*Tree coordinates are 32-bit floats rounded outwards, so a box query never misses a point -
+    # the exact coordinates are kept in auxiliary columns, so distances never need the business row
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {LOCATION_TABLE} USING rtree(id, min_lat, max_lat, min_lng, max_lng, +latitude, +longitude)',
+
+    f'''CREATE TRIGGER IF NOT EXISTS business_location_insert AFTER INSERT ON business BEGIN
+        {INSERT_LOCATION}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS business_location_update AFTER UPDATE OF latitude, longitude ON business BEGIN
+        DELETE FROM {LOCATION_TABLE} WHERE id = old.id;
+        {INSERT_LOCATION}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS business_location_delete AFTER DELETE ON business BEGIN
+        DELETE FROM {LOCATION_TABLE} WHERE id = old.id;
+    END''',
+]
+
+
+# Reindexes every geocoded business in one statement
+REBUILD = [f'''
+    INSERT INTO {LOCATION_TABLE} (id, min_lat, max_lat, min_lng, max_lng, latitude, longitude)
+    SELECT id, latitude, latitude, longitude, longitude, latitude, longitude FROM business
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+''']
+
+# Registered as a derived table - server databases read the (latitude, longitude) index instead
+LOCATION_INDEX = register(LOCATION_TABLE, SCHEMA, REBUILD)
+
+
+# Geo Error: Raised when nearby search parameters are missing or out of range
+class GeoError(ValueError):
+    pass
+
+
+# Distance: Returns the great-circle distance between two points in km (haversine formula)
+def distance_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1, math.sqrt(a)))
+
+
+# Bounding Boxes: Returns (min_lat, max_lat, min_lng, max_lng) boxes covering a circle
+    # A circle crossing the antimeridian is covered by two boxes, and one reaching a pole by a full band of longitude
+def bounding_boxes(lat, lng, radius):
+    dlat = radius / KM_PER_DEGREE
+    min_lat, max_lat = max(lat - dlat, -90), min(lat + dlat, 90)
+
+    if min_lat == -90 or max_lat == 90:
+        return [(min_lat, max_lat, -180, 180)]
+
+    # Degrees of longitude shrink towards the poles - use the widest point of the circle
+    dlng = math.degrees(math.asin(min(1, math.sin(math.radians(dlat)) / math.cos(math.radians(lat)))))
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180:
+        return [(min_lat, max_lat, min_lng + 360, 180), (min_lat, max_lat, -180, max_lng)]
+    if max_lng > 180:
+        return [(min_lat, max_lat, min_lng, 180), (min_lat, max_lat, -180, max_lng - 360)]
+    return [(min_lat, max_lat, min_lng, max_lng)]
+
+
+# Get Point: Returns the (lat, lng, radius) requested in the query string
+def get_point(args):
+    try:
+        lat, lng = float(args['lat']), float(args['lng'])
+        radius = float(args.get('radius', DEFAULT_RADIUS_KM))
+    except KeyError:
+        raise GeoError('lat and lng are required')
+    except ValueError:
+        raise GeoError('lat, lng and radius must be numbers')
+
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise GeoError('lat must be between -90 and 90 and lng between -180 and 180')
+    max_radius = current_app.config.get('MAX_NEARBY_RADIUS', DEFAULT_MAX_RADIUS_KM)
+    if not 0 < radius <= max_radius:
+        raise GeoError(f'radius must be greater than 0 and at most {max_radius:g} km')
+    return lat, lng, radius
+
+
+# Nearby Businesses: Returns one page of businesses within radius km, nearest first, with their
+# distances and the next page cursor
+    # service limits results to businesses offering a service whose name contains it
+def nearby_businesses(lat, lng, radius, service=None, options=()):
+    boxes = bounding_boxes(lat, lng, radius)
+
+    # Checked only for businesses inside the box, through the service business_id index
+    def offers(business_id):
+        return select(Service.id).where(Service.business_id == business_id, Service.name.ilike(f'%{service}%')).exists()
+
+    if LOCATION_INDEX.enabled():
+        # One R*Tree search per box - the R*Tree cannot use constraints joined by OR
+        searches = []
+        for min_lat, max_lat, min_lng, max_lng in boxes:
+            search = select(location.c.id, location.c.latitude, location.c.longitude).where(
+                location.c.max_lat >= min_lat, location.c.min_lat <= max_lat,
+                location.c.max_lng >= min_lng, location.c.min_lng <= max_lng
+            )
+            searches.append(search.where(offers(location.c.id)) if service else search)
+        query = db.session.execute(union_all(*searches) if len(searches) > 1 else searches[0]).all()
+    else:
+        query = db.session.query(Business.id, Business.latitude, Business.longitude).filter(or_(*(and_(
+            Business.latitude.between(min_lat, max_lat), Business.longitude.between(min_lng, max_lng)
+        ) for min_lat, max_lat, min_lng, max_lng in boxes)))
+        if service:
+            query = query.filter(offers(Business.id))
+
+    # Exact distances for the candidates - corners of the box beyond the radius are dropped
+    matches = sorted(
+        (round(distance, 3), id) for id, distance in
+        ((id, distance_km(lat, lng, latitude, longitude)) for id, latitude, longitude in query)
+        if distance <= radius
+    )
+
+    # Results are ordered by distance, then business ID, so the cursor holds both
+    after = request.args.get('after')
+    if after:
+        cursor = tuple(decode_cursor(after, 2))
+        matches = [match for match in matches if match > cursor]
+
+    limit = get_limit()
+    next_cursor = encode_cursor(list(matches[limit - 1])) if len(matches) > limit else None
+    matches = matches[:limit]
+
+    # Load the page's businesses with the requested columns and relationships
+    businesses = {business.id: business for business in Business.query.options(*options).filter(
+        Business.id.in_([id for _, id in matches])
+    )} if matches else {}
+    return [(businesses[id], distance) for distance, id in matches], next_cursor
+
+
+# Normalize: Lowercases and collapses whitespace so addresses written differently still match
+def normalize(*values):
+    return tuple(' '.join(str(value or '').lower().split()) for value in values)
+
+
+# Import Geocodes: Sets business coordinates from a local CSV file with address, city, state, latitude and longitude
+    # Rows with an empty address give a city's coordinates, used for businesses whose street address is not listed
+    # Businesses that already have coordinates are skipped unless overwrite is set
+    # Returns {'address': n, 'city': n, 'unmatched': n} counts of businesses updated or left without coordinates
+def import_geocodes(path, overwrite=False):
+    query = db.session.query(Business.id, Business.address, Business.city, Business.state)
+    if not overwrite:
+        query = query.filter(or_(Business.latitude.is_(None), Business.longitude.is_(None)))
+
+    # Businesses are read once and matched while the file streams, so the file is never held in memory
+    by_address = {}
+    by_city = {}
+    for id, address, city, state in query:
+        by_address.setdefault(normalize(address, city, state), []).append(id)
+        by_city.setdefault(normalize(city, state), []).append(id)
+
+    located = {}
+    cities = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            point = (float(row['latitude']), float(row['longitude']))
+            if row.get('address', '').strip():
+                for id in by_address.get(normalize(row['address'], row['city'], row['state']), ()):
+                    located[id] = point
+            else:
+                cities[normalize(row['city'], row['state'])] = point
+
+    counts = {'address': len(located), 'city': 0, 'unmatched': 0}
+    for key, ids in by_city.items():
+        for id in ids:
+            if id in located:
+                continue
+            if key in cities:
+                located[id] = cities[key]
+                counts['city'] += 1
+            else:
+                counts['unmatched'] += 1
+
+    if located:
+        db.session.execute(Business.__table__.update().where(Business.__table__.c.id == bindparam('business_id')).values(
+            latitude=bindparam('lat'), longitude=bindparam('lng')
+        ), [{'business_id': id, 'lat': lat, 'lng': lng} for id, (lat, lng) in located.items()])
+        db.session.commit()
+        cache.invalidate('catalog', *(f'business:{id}' for id in located))
+    return counts
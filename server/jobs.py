@@ -0,0 +1,272 @@
+# Background Jobs
+    # Work that does not have to finish before a response (e.g. notifications) is queued and run later
+    # The queue is a local SQLite file, so queued jobs survive restarts and are shared by every worker process on a node
+    # Each process runs JOB_WORKERS threads that claim due jobs, run their handler and retry failures with
+    # exponential backoff - enqueueing is one small insert on the request thread
+    # A claimed job is leased for JOB_LEASE seconds, so jobs held by a process that died are picked up again
+    # Handlers are registered by kind with @jobs.handler(kind) and run inside an app context
+
+
+# Import dependencies
+from flask import current_app
+import json, os, random, sqlite3, threading, time
+
+# Defaults: worker threads per process, attempts before a job is marked failed, delay before the first retry
+# (seconds, doubled after every failed attempt), seconds a claimed job is leased, and seconds finished jobs are kept
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 30
+DEFAULT_LEASE = 300
+DEFAULT_RETENTION = 86400
+
+# Seconds an idle worker sleeps before checking for due jobs, and seconds between periodic tasks
+POLL_INTERVAL = 1.0
+TICK_INTERVAL = 60
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+# Job Queue: Jobs stored in a local SQLite file, and the pool of threads running them for one app
+class JobQueue:
+    def __init__(self, path, workers=DEFAULT_WORKERS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 retry_delay=DEFAULT_RETRY_DELAY, lease=DEFAULT_LEASE, retention=DEFAULT_RETENTION):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.retention = retention
+
+        self.local = threading.local()
+        self.threads = []
+        self.lock = threading.Lock()
+        # Set when a job is queued by this process, so idle workers pick it up without waiting for the next poll
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+
+        with self._connection() as connection:
+            # run_at is when a queued job is due, or when the lease of a running job ends
+                # key is an optional unique name - queueing a job whose key exists is a no-op
+            connection.execute('''CREATE TABLE IF NOT EXISTS job (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                key TEXT UNIQUE,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_at REAL NOT NULL,
+                created REAL NOT NULL,
+                error TEXT
+            )''')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_job_status_run_at ON job (status, run_at)')
+
+    # Connection Method: Returns this thread's connection to the queue file
+    def _connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = sqlite3.connect(self.path, timeout=5)
+            self.local.connection.execute('PRAGMA journal_mode = WAL')
+            # Commits survive a crashed process without an fsync each - only a power loss can drop the last ones
+            self.local.connection.execute('PRAGMA synchronous = NORMAL')
+        return self.local.connection
+
+    # Add Method: Queues (kind, payload, key, delay) jobs in one transaction
+    def add(self, jobs):
+        now = time.time()
+        with self._connection() as connection:
+            connection.executemany(
+                'INSERT OR IGNORE INTO job (kind, payload, key, status, run_at, created) VALUES (?, ?, ?, ?, ?, ?)',
+                [(kind, json.dumps(payload), key, QUEUED, now + delay, now) for kind, payload, key, delay in jobs]
+            )
+        self.wakeup.set()
+
+    # Claim Method: Leases the next due job and returns (id, kind, payload, attempts), or None if none is due
+        # One UPDATE takes the write lock before choosing the job, so two processes never claim the same one
+    def claim(self):
+        now = time.time()
+        with self._connection() as connection:
+            return connection.execute('''
+                UPDATE job SET status = ?, attempts = attempts + 1, run_at = ?
+                WHERE id = (
+                    SELECT id FROM job WHERE status IN (?, ?) AND run_at <= ? ORDER BY run_at LIMIT 1
+                )
+                RETURNING id, kind, payload, attempts
+            ''', (RUNNING, now + self.lease, QUEUED, RUNNING, now)).fetchone()
+
+    # Finish Method: Records the outcome of a claimed job
+    def finish(self, id, status, error=None, delay=0):
+        with self._connection() as connection:
+            connection.execute('UPDATE job SET status = ?, error = ?, run_at = ? WHERE id = ?',
+                               (status, error, time.time() + delay, id))
+
+    # Purge Method: Deletes jobs that finished more than retention seconds ago
+    def purge(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM job WHERE status = ? AND run_at < ?', (DONE, time.time() - self.retention))
+
+    # Counts Method: Returns {status: number of jobs}
+    def counts(self):
+        return dict(self._connection().execute('SELECT status, COUNT(*) FROM job GROUP BY status').fetchall())
+
+    # Run Next Method: Claims and runs one due job, returning False if no job was due
+    def run_next(self, app, handlers):
+        job = self.claim()
+        if job is None:
+            return False
+
+        id, kind, payload, attempts = job
+        try:
+            with app.app_context():
+                handlers[kind](json.loads(payload))
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            if attempts >= self.max_attempts:
+                app.logger.error('Job %s (%s) failed after %s attempts: %s', id, kind, attempts, error)
+                self.finish(id, FAILED, error)
+            else:
+                # Exponential backoff with jitter, so jobs failing together don't retry together
+                delay = self.retry_delay * 2 ** (attempts - 1) * random.uniform(1, 1.5)
+                app.logger.warning('Job %s (%s) failed, retrying in %.0fs: %s', id, kind, delay, error)
+                self.finish(id, QUEUED, error, delay)
+        else:
+            self.finish(id, DONE)
+        return True
+
+    # Work Method: Runs due jobs until stopped - the first thread also runs the periodic tasks
+    def work(self, app, handlers, periodic, ticks=False):
+        next_tick = 0
+        while not self.stopping.is_set():
+            try:
+                if ticks and time.monotonic() >= next_tick:
+                    next_tick = time.monotonic() + TICK_INTERVAL
+                    self.tick(app, periodic)
+
+                if self.run_next(app, handlers):
+                    continue
+            except sqlite3.Error as e:
+                app.logger.warning('Job queue unavailable: %s', e)
+
+            self.wakeup.wait(POLL_INTERVAL)
+            self.wakeup.clear()
+
+    # Tick Method: Runs every periodic task and purges finished jobs
+    def tick(self, app, periodic):
+        with app.app_context():
+            for task in periodic:
+                try:
+                    task()
+                except Exception:
+                    app.logger.exception('Periodic task %s failed', task.__name__)
+        self.purge()
+
+    # Start Method: Starts the worker threads once per process
+    def start(self, app, handlers, periodic):
+        if self.threads or not self.workers:
+            return
+        with self.lock:
+            if self.threads:
+                return
+            # Threads are daemons - a job cut off by shutdown is retried once its lease ends
+            self.threads = [threading.Thread(target=self.work, args=(app, handlers, periodic, index == 0),
+                                             name=f'jobs-{index}', daemon=True)
+                            for index in range(self.workers)]
+            for thread in self.threads:
+                thread.start()
+
+    # Stop Method: Asks the worker threads to exit and waits for their current jobs
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+        self.stopping.clear()
+
+
+# Jobs: Flask extension holding job handlers and periodic tasks, and each app's queue
+class Jobs:
+    def __init__(self, app=None):
+        self.handlers = {}
+        self.periodic = []
+
+        if app is not None:
+            self.init_app(app)
+
+    # Init App Method: Opens the queue file and starts the workers on the first request
+        # Workers never start in CLI commands - `flask run-jobs` runs them in the foreground instead
+    def init_app(self, app):
+        path = app.config.get('JOBS_PATH')
+        if not path:
+            os.makedirs(app.instance_path, exist_ok=True)
+            path = os.path.join(app.instance_path, 'jobs.sqlite')
+
+        app.extensions['jobs'] = JobQueue(
+            path,
+            workers=app.config.get('JOB_WORKERS', DEFAULT_WORKERS),
+            max_attempts=app.config.get('JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+            retry_delay=app.config.get('JOB_RETRY_DELAY', DEFAULT_RETRY_DELAY),
+            lease=app.config.get('JOB_LEASE', DEFAULT_LEASE)
+        )
+        app.before_request(self._start)
+
+    # Queue Property: Returns the current app's queue, or None if jobs are not set up
+    @property
+    def queue(self):
+        return current_app.extensions.get('jobs')
+
+    # Handler Method: Decorator registering the function that runs jobs of a kind
+    def handler(self, kind):
+        def decorator(function):
+            self.handlers[kind] = function
+            return function
+        return decorator
+
+    # Every Tick Method: Decorator registering a task run about once a minute by the first worker thread
+    def every_tick(self, function):
+        self.periodic.append(function)
+        return function
+
+    # Enqueue Method: Queues one job, due after delay seconds - a job with an existing key is not queued again
+    def enqueue(self, kind, payload, key=None, delay=0):
+        self.enqueue_many([(kind, payload, key)], delay)
+
+    # Enqueue Many Method: Queues (kind, payload, key) jobs in one transaction
+        # Callers enqueue after their own commit, so a full queue file never fails a request that already succeeded
+    def enqueue_many(self, jobs, delay=0):
+        queue = self.queue
+        if queue is None or not jobs:
+            return
+        try:
+            queue.add([(kind, payload, key, delay) for kind, payload, key in jobs])
+        except sqlite3.Error:
+            current_app.logger.exception('Could not queue %s job(s)', len(jobs))
+
+    # Start Hook: Starts this process's workers, after the fork when served by gunicorn
+    def _start(self):
+        queue = self.queue
+        if queue is not None and not queue.threads:
+            queue.start(current_app._get_current_object(), self.handlers, self.periodic)
+
+    # Run Method: Runs workers in the foreground until interrupted, or only the jobs due now with once=True
+    def run(self, app, once=False):
+        queue = app.extensions['jobs']
+        if once:
+            queue.tick(app, self.periodic)
+            processed = 0
+            while queue.run_next(app, self.handlers):
+                processed += 1
+            return processed
+
+        queue.workers = queue.workers or DEFAULT_WORKERS
+        queue.start(app, self.handlers, self.periodic)
+        try:
+            while True:
+                time.sleep(POLL_INTERVAL)
+        finally:
+            queue.stop()
+
+
+jobs = Jobs()
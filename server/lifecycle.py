@@ -0,0 +1,158 @@
+# Appointment Status Lifecycle
+    # Pending Confirmation -> Confirmed -> Completed, and Pending Confirmation or Confirmed -> Cancelled
+    # Each transition is one conditional UPDATE, so two members of staff acting on the same appointment
+    # at once cannot both succeed, and no row is read before it is changed
+    # The sweeper completes past appointments with one set-based UPDATE per chunk of businesses, which the
+    # (business_id, status, date) index turns into range reads of just the rows still open
+
+
+# Import dependencies
+from datetime import date as Date
+from flask import current_app
+from server.database import db
+
+# Import Models
+from server.models import Appointment, Business, AppointmentStatus
+
+# Import Response Cache - business responses embed appointments
+from server.cache import cache, business_tags
+
+# Import Background Jobs - status changes are sent after the response
+from server.jobs import jobs
+from server.notifications import notification_jobs
+
+# Statuses of appointments that have not happened yet or are waiting on the business
+OPEN = (AppointmentStatus.PENDING_CONFIRMATION, AppointmentStatus.CONFIRMED)
+
+# Transitions: new status -> statuses it can be reached from
+TRANSITIONS = {
+    AppointmentStatus.CONFIRMED: (AppointmentStatus.PENDING_CONFIRMATION,),
+    AppointmentStatus.CANCELLED: OPEN,
+    AppointmentStatus.COMPLETED: OPEN,
+}
+
+# Actions accepted by the status routes, and the status each one sets
+ACTIONS = {
+    'confirm': AppointmentStatus.CONFIRMED,
+    'cancel': AppointmentStatus.CANCELLED,
+    'complete': AppointmentStatus.COMPLETED,
+}
+
+# Notification sent for each new status - completions send none
+NOTIFICATIONS = {
+    AppointmentStatus.CONFIRMED: 'confirmed',
+    AppointmentStatus.CANCELLED: 'cancellation',
+}
+
+# Status names accepted by ?status= on listings
+STATUSES = {
+    'pending': AppointmentStatus.PENDING_CONFIRMATION,
+    'confirmed': AppointmentStatus.CONFIRMED,
+    'cancelled': AppointmentStatus.CANCELLED,
+    'completed': AppointmentStatus.COMPLETED,
+}
+
+# Default number of businesses whose past appointments are completed per statement
+DEFAULT_SWEEP_CHUNK = 500
+
+
+# Transition Error: Raised when an appointment's current status does not allow the change
+class TransitionError(Exception):
+    pass
+
+
+# Transition Forbidden: Raised when the appointment belongs to another user than the one changing it
+class TransitionForbidden(Exception):
+    pass
+
+
+# Status Error: Raised when ?status= names no status
+class StatusError(ValueError):
+    pass
+
+
+# Get Status: Returns the status named by a query string value
+def get_status(name):
+    try:
+        return STATUSES[name.lower()]
+    except KeyError:
+        raise StatusError(f'status must be one of: {", ".join(STATUSES)}')
+
+
+# Transition: Moves a business's appointment to a new status and returns it
+    # Only owner_id's appointments can be changed - until businesses have accounts, the booking user stands in for them
+    # Raises LookupError if the appointment does not exist, TransitionForbidden if it belongs to another user
+    # and TransitionError if its status does not allow the change
+def transition(business_id, appointment_id, status, owner_id):
+    try:
+        updated = Appointment.query.filter(
+            Appointment.id == appointment_id,
+            Appointment.business_id == business_id,
+            Appointment.user_id == owner_id,
+            Appointment.status.in_(TRANSITIONS[status])
+        ).update({Appointment.status: status}, synchronize_session=False)
+
+        appointment = Appointment.query.filter_by(id=appointment_id, business_id=business_id).first()
+        if appointment is None:
+            raise LookupError('Appointment not found')
+        if appointment.user_id != owner_id:
+            raise TransitionForbidden('Appointment belongs to another user')
+        if not updated:
+            raise TransitionError(f'Appointment is {appointment.status.value.lower()}')
+
+        notifications = notification_jobs(NOTIFICATIONS[status], appointment) if status in NOTIFICATIONS else []
+        db.session.commit()
+        cache.invalidate(*business_tags(business_id))
+        jobs.enqueue_many(notifications)
+        return appointment
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+# Complete Past Appointments: Marks every open appointment dated before a day (default today) as completed
+    # Businesses are updated a chunk at a time, each chunk in its own short transaction
+    # Returns the number of appointments completed
+def complete_past_appointments(before=None, chunk=DEFAULT_SWEEP_CHUNK):
+    before = before or Date.today()
+    completed = 0
+    last_id = 0
+
+    while True:
+        business_ids = [id for id, in db.session.query(Business.id).filter(Business.id > last_id).order_by(Business.id).limit(chunk)]
+        if not business_ids:
+            break
+        last_id = business_ids[-1]
+
+        updated = Appointment.query.filter(
+            Appointment.business_id.in_(business_ids),
+            Appointment.status.in_(OPEN),
+            Appointment.date < before
+        ).update({Appointment.status: AppointmentStatus.COMPLETED}, synchronize_session=False)
+        db.session.commit()
+
+        if updated:
+            completed += updated
+            cache.invalidate('catalog', *(f'business:{id}' for id in business_ids))
+
+    return completed
+
+
+# Queue Sweep: Queues today's sweep - the key makes it run once per day
+def queue_sweep(day=None):
+    day = day or Date.today()
+    jobs.enqueue('appointments.complete', {'before': day.isoformat()}, key=f'complete:{day.isoformat()}')
+
+
+# Daily Sweep: Queues the sweep the first time the workers tick each day
+@jobs.every_tick
+def daily_sweep():
+    queue_sweep()
+
+
+# Complete Past Job: Runs a queued sweep
+@jobs.handler('appointments.complete')
+def complete_past_job(payload):
+    completed = complete_past_appointments(Date.fromisoformat(payload['before']))
+    if completed:
+        current_app.logger.info('Completed %s past appointments', completed)
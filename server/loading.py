@@ -0,0 +1,43 @@
+# Loading Strategies
+    # Eager-loads the relationships each model walks in serialize() so listings cost a fixed number of queries
+
+
+# Import dependencies
+from flask import current_app, request
+from sqlalchemy.orm import subqueryload, selectinload, joinedload, lazyload
+
+
+# Strategies map a name to a SQLAlchemy loader option
+STRATEGIES = {
+    # One extra SELECT per relationship, joined against the original query, regardless of row count
+    'subquery': subqueryload,
+    # One extra SELECT ... WHERE id IN (...) per relationship for every 500 parent rows
+    'select': selectinload,
+    # Relationships are loaded in the same query with a LEFT OUTER JOIN
+    'joined': joinedload,
+    # Relationships are loaded as necessary (one query per object)
+    'lazy': lazyload,
+}
+
+# Default strategy used when a route has no override in LOADING_STRATEGIES
+DEFAULT_STRATEGY = 'subquery'
+
+# Get Strategy: Returns the strategy name configured for the current route
+def get_strategy():
+    # Per-route overrides are keyed by endpoint, e.g. {'business.get_businesses': 'joined'}
+    overrides = current_app.config.get('LOADING_STRATEGIES', {})
+    return overrides.get(request.endpoint, current_app.config.get('LOADING_STRATEGY', DEFAULT_STRATEGY))
+
+
+# Eager Options: Returns loader options for the relationships serialized by a model
+def eager(model, strategy=None, relationships=None):
+    strategy = strategy or get_strategy()
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown loading strategy: {strategy}')
+
+    loader = STRATEGIES[strategy]
+    # Models list the relationships walked by serialize() in RELATIONSHIPS
+    relationships = getattr(model, 'RELATIONSHIPS', ()) if relationships is None else relationships
+
+    return [loader(getattr(model, relationship)) for relationship in relationships]
@@ -0,0 +1,198 @@
+# Request Metrics
+    # Times every request and the SQL statements it runs (captured with SQLAlchemy cursor events)
+    # Per-route latency, statement count and SQL time histograms are served at /metrics in the
+    # Prometheus text format, so an N+1 regression in serialize() shows up as a jump in statements per request
+    # Slow or query-heavy requests are logged with their slowest statements
+    # Metrics are kept per process - with several workers, scrape each one or aggregate in Prometheus
+
+
+# Import dependencies
+from bisect import bisect_left
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from server.database import db
+import threading, time
+
+# Histogram buckets: request latency (seconds), statements per request and SQL time per request (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SQL_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# Defaults: requests slower than SLOW_REQUEST_MS or running more than MAX_REQUEST_QUERIES statements are logged
+DEFAULT_SLOW_REQUEST_MS = 500
+DEFAULT_MAX_REQUEST_QUERIES = 20
+# Statements shown per logged request, slowest first
+DEFAULT_LOGGED_QUERIES = 5
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# Histogram: Counts observations per bucket, plus their sum and count
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Observations per bucket - the last slot holds values above every bucket (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    # Observe Method: Records one value
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Samples Method: Yields (suffix, extra labels, value) in exposition order with cumulative buckets
+    def samples(self):
+        total = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            total += count
+            yield '_bucket', {'le': f'{bucket:g}'}, total
+        yield '_bucket', {'le': '+Inf'}, self.count
+        yield '_sum', {}, self.sum
+        yield '_count', {}, self.count
+
+
+# Escape: Escapes a label value for the exposition format
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Labels: Formats a label dict as {name="value",...}
+def _labels(labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}' if labels else ''
+
+
+# Metrics: Flask extension recording request and SQL metrics
+class Metrics:
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.reset()
+
+        if app is not None:
+            self.init_app(app)
+
+    # Reset Method: Clears every recorded metric
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.slow_requests = {}
+            self.latency = {}
+            self.queries = {}
+            self.sql_time = {}
+
+    # Init App Method: Registers request hooks, SQL listeners and the /metrics route
+        # Call after the database is initialized
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        # Streamed responses run their queries after after_request, so recording waits for teardown
+        app.teardown_request(self._record)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+
+        app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', self.export)
+
+    # SQL Events: Time each statement and add it to the current request's list
+        # The start time is kept on the statement's execution context, which is discarded with it - a statement
+        # that raises never reaches after_cursor_execute, and nothing is left behind on the pooled connection
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        queries = g.get('metrics_queries') if has_app_context() else None
+        if queries is not None:
+            queries.append((elapsed, statement))
+
+    # Request Hooks
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = []
+
+    def _finish(self, response):
+        g.metrics_status = response.status_code
+
+        # Server-Timing lets browser dev tools show database time per response
+        queries = g.get('metrics_queries') or []
+        response.headers['Server-Timing'] = f'db;dur={sum(q[0] for q in queries) * 1000:.1f};desc="{len(queries)} queries"'
+        return response
+
+    def _record(self, exception=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+
+        elapsed = time.perf_counter() - started
+        queries = g.pop('metrics_queries', [])
+        status = g.pop('metrics_status', 500)
+        key = (request.endpoint or 'unmatched', request.method)
+        sql_time = sum(query[0] for query in queries)
+
+        with self.lock:
+            status_key = key + (status,)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self.queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(len(queries))
+            self.sql_time.setdefault(key, Histogram(SQL_BUCKETS)).observe(sql_time)
+
+        slow = elapsed * 1000 > current_app.config.get('SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+        heavy = len(queries) > current_app.config.get('MAX_REQUEST_QUERIES', DEFAULT_MAX_REQUEST_QUERIES)
+        if slow or heavy:
+            with self.lock:
+                self.slow_requests[key] = self.slow_requests.get(key, 0) + 1
+            self._log(elapsed, queries, sql_time)
+
+    # Log Method: Logs a slow or query-heavy request with its slowest statements
+    def _log(self, elapsed, queries, sql_time):
+        shown = sorted(queries, key=lambda query: query[0], reverse=True)
+        shown = shown[:current_app.config.get('LOGGED_QUERIES', DEFAULT_LOGGED_QUERIES)]
+        lines = [f'{request.method} {request.full_path.rstrip("?")} took {elapsed * 1000:.1f} ms '
+                 f'with {len(queries)} queries ({sql_time * 1000:.1f} ms in SQL)']
+        lines += [f'    {duration * 1000:8.2f} ms  {" ".join(statement.split())}' for duration, statement in shown]
+        current_app.logger.warning('\n'.join(lines))
+
+    # Render Method: Returns every metric in the Prometheus text format
+    def render(self):
+        lines = []
+
+        def histograms(name, help, values):
+            lines.extend([f'# HELP {name} {help}', f'# TYPE {name} histogram'])
+            for (endpoint, method), histogram in sorted(values.items()):
+                for suffix, labels, value in histogram.samples():
+                    lines.append(f'{name}{suffix}{_labels({"endpoint": endpoint, "method": method, **labels})} {value}')
+
+        with self.lock:
+            lines.extend(['# HELP booksy_requests_total Requests served, by route and status',
+                          '# TYPE booksy_requests_total counter'])
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'booksy_requests_total{_labels({"endpoint": endpoint, "method": method, "status": status})} {count}')
+
+            lines.extend(['# HELP booksy_slow_requests_total Requests over SLOW_REQUEST_MS or MAX_REQUEST_QUERIES, by route',
+                          '# TYPE booksy_slow_requests_total counter'])
+            for (endpoint, method), count in sorted(self.slow_requests.items()):
+                lines.append(f'booksy_slow_requests_total{_labels({"endpoint": endpoint, "method": method})} {count}')
+
+            histograms('booksy_request_duration_seconds', 'Request latency, by route', self.latency)
+            histograms('booksy_request_queries', 'SQL statements per request, by route', self.queries)
+            histograms('booksy_request_sql_seconds', 'Time spent in SQL per request, by route', self.sql_time)
+
+        return '\n'.join(lines) + '\n'
+
+    # Export Method: View serving the metrics
+    def export(self):
+        return current_app.response_class(self.render(), content_type=CONTENT_TYPE)
+
+
+metrics = Metrics()
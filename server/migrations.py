@@ -0,0 +1,60 @@
+# Database Migrations
+    # db.create_all() only creates missing tables, so indexes added to existing models never reach
+    # a database file created by an older version - migrate() adds them in place
+    # Nullable columns added to existing models are added the same way, so older rows simply hold NULL
+
+
+# Import dependencies
+from sqlalchemy import inspect
+from server.database import db
+
+# Import Models so every table is registered on the metadata
+import server.models
+
+
+# Missing Columns: Returns the nullable columns declared on the models that do not exist in the database
+    # Columns that must hold a value cannot be added to a table that already has rows, so they are left to a rebuild
+def missing_columns(connection):
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        missing += [column for column in table.columns if column.name not in existing and column.nullable]
+    return missing
+
+
+# Missing Indexes: Returns the indexes declared on the models that do not exist in the database
+def missing_indexes(connection):
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing += [index for index in table.indexes if index.name not in existing]
+    return missing
+
+
+# Migrate: Creates missing tables, then adds missing columns and indexes to existing tables
+    # Returns (columns, indexes) added, for the caller to report
+def migrate():
+    db.create_all()
+
+    with db.engine.begin() as connection:
+        # Columns first - new indexes may cover them
+        columns = missing_columns(connection)
+        for column in columns:
+            type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(f'ALTER TABLE {column.table.name} ADD COLUMN {column.name} {type}')
+
+        indexes = missing_indexes(connection)
+        for index in indexes:
+            index.create(connection)
+
+    return columns, indexes
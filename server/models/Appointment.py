@@ -7,32 +7,41 @@ from datetime import time
 # Import Enum class from the enum module
 from enum import Enum
 
-# Import AppointmentStatus Enum to avoid circular import
-from . import AppointmentStatus
+
+# Define status options using Enum
+    # Defined at module level so the status column is mapped on the Appointment model
+class AppointmentStatus(Enum):
+    PENDING_CONFIRMATION = 'Pending Confirmation'
+    CONFIRMED = 'Confirmed'
+    CANCELLED = 'Cancelled'
+    COMPLETED = 'Completed'
 
 
 # Define model
 class Appointment(db.Model):
-    # Define status options using Enum
-    class AppointmentStatus(Enum):
-        PENDING_CONFIRMATION = 'Pending Confirmation'
-        CONFIRMED = 'Confirmed'
-        CANCELLED = 'Cancelled'
-        COMPLETED = 'Completed'
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
 
-    # Define the Appointment model
-    class Appointment(db.Model):
-        id = db.Column(db.Integer, primary_key=True)
-        date = db.Column(db.Date, nullable=False)
-        time = db.Column(db.Time, nullable=False)
+    # Define status options using Enum
+    status = db.Column(db.Enum(AppointmentStatus), nullable=False, default=AppointmentStatus.PENDING_CONFIRMATION)
 
-        # Define status options using Enum
-        status = db.Column(db.Enum(AppointmentStatus), nullable=False, default=AppointmentStatus.PENDING_CONFIRMATION)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
+    service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=False)
+    notes = db.Column(db.String(200), nullable=True)
 
-        user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-        business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
-        service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=False)
-        notes = db.Column(db.String(200), nullable=True)
+    # Indexes for the hot appointment lookups
+    __table_args__ = (
+        # filter_by(business_id=...), booking overlap checks and day views
+        db.Index('ix_appointment_business_date_time', 'business_id', 'date', 'time'),
+        # filter_by(business_id=..., status=...) for status queues and the past appointment sweep
+        db.Index('ix_appointment_business_status_date', 'business_id', 'status', 'date'),
+        # filter_by(user_id=...) for profiles and paginated appointment listings
+        db.Index('ix_appointment_user_id', 'user_id'),
+        # filter_by(service_id=..., business_id=...) for service deletes and cascades
+        db.Index('ix_appointment_service_business', 'service_id', 'business_id'),
+    )
 
 
     # Define methods
@@ -54,7 +63,8 @@ class Appointment(db.Model):
             'date': self.date.strftime('%a, %d %b %Y') if self.date else None,
             # Convert time to string if it is a time object and remove milliseconds
             'time': self.time.strftime('%H:%M') if isinstance(self.time, time) else self.time,
-            'status': self.status,
+            # Convert status to its string value - Enum objects are not JSON serializable
+            'status': self.status.value if self.status else None,
             'user_id': self.user_id,
             'business_id': self.business_id,
             'service_id': self.service_id,
@@ -74,4 +84,4 @@ class Appointment(db.Model):
     # Get Service Method: Returns the service associated with the appointment
     def get_service(self):
         return self.service.serialize()
-            # Returns a dictionary representing the service associated with the appointment
\ No newline at end of file
+            # Returns a dictionary representing the service associated with the appointment
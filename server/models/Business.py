@@ -3,7 +3,7 @@
 
 # Import dependencies
 from server.database import db
-from bcrypt import hashpw, gensalt, checkpw
+from server.passwords import passwords
 
 
 # Define model
@@ -17,6 +17,15 @@ class Business(db.Model):
     email = db.Column(db.String(100), nullable=False, unique=True)
     password = db.Column(db.String(100), nullable=False)
 
+    # Coordinates in degrees, set by the offline geocode import - businesses without them are not found by /nearby
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+
+    # Bounding box reads of /nearby on server databases - SQLite uses the business_location R*Tree
+    __table_args__ = (
+        db.Index('ix_business_latitude_longitude', 'latitude', 'longitude'),
+    )
+
     # Services is a list of Service objects associated with the Business
     services = db.relationship('Service', backref='business', lazy=True)
         # backref='business' creates a business attribute in the Service model
@@ -29,35 +38,41 @@ class Business(db.Model):
 
     # Define methods
     # Init Method: Initializes Business object
-    def __init__(self, name, address, city, state, phone_number, email, password):
+    def __init__(self, name, address, city, state, phone_number, email, password, latitude=None, longitude=None):
         self.name = name
         self.address = address
         self.city = city
         self.state = state
         self.phone_number = phone_number
         self.email = email
-        self.password = hashpw(password.encode('utf-8'), gensalt()).decode('utf-8')
-            # hashpw() hashes the password using bcrypt and gensalt() generates a salt value
+        self.latitude = latitude
+        self.longitude = longitude
+        self.password = passwords.hash(password)
+            # passwords.hash() hashes the plaintext password once with bcrypt in the hashing pool
+
+    # Columns and relationships included by serialize() when no sparse fieldset is requested
+    FIELDS = ('id', 'name', 'address', 'city', 'state', 'phone_number', 'email', 'latitude', 'longitude')
+    RELATIONSHIPS = ('services', 'appointments')
 
     # Serialize Method: Converts object to dictionary for JSON serialization
-    def serialize(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'address': self.address,
-            'city': self.city,
-            'state': self.state,
-            'phone_number': self.phone_number,
-            'email': self.email,
-
-            # Services is a list of dictionaries
-            'services': [service.serialize() for service in self.services],
-
-            # Appointments is a list of dictionaries
-            'appointments': [appointment.serialize() for appointment in self.appointments]
-        }
+        # fields limits the columns and expand limits the relationships that are included
+    def serialize(self, fields=None, expand=None):
+        fields = self.FIELDS if fields is None else fields
+        expand = self.RELATIONSHIPS if expand is None else expand
+
+        data = {field: getattr(self, field) for field in fields}
+
+        # Services is a list of dictionaries
+        if 'services' in expand:
+            data['services'] = [service.serialize() for service in self.services]
+
+        # Appointments is a list of dictionaries
+        if 'appointments' in expand:
+            data['appointments'] = [appointment.serialize() for appointment in self.appointments]
+
+        return data
     
     # Check Password Method: Checks if the password is correct
     def check_password(self, password):
-        return checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
-            # checkpw() compares the hashed password with the plaintext password
\ No newline at end of file
+        return passwords.check(password, self.password)
+            # passwords.check() compares the hashed password with the plaintext password in the hashing pool
\ No newline at end of file
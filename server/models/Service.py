@@ -12,8 +12,9 @@ class Service(db.Model):
     duration = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(200), nullable=True) 
-    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False, index=True)
         # Business ID is a foreign key to the Business model
+        # index=True lets services be listed per business without scanning the table
     appointments = db.relationship('Appointment', backref='service', lazy=True)
         # Appointments is a list of Appointment objects associated with the Service
             # backref='service' creates a service attribute in the Appointment model
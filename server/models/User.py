@@ -3,7 +3,7 @@
 
 # Import dependencies
 from server.database import db
-from bcrypt import hashpw, gensalt, checkpw
+from server.passwords import passwords
 
 
 # Define model
@@ -28,26 +28,31 @@ class User(db.Model):
         self.email = email
         self.username = username
         self.phone_number = phone_number
-        self.password = hashpw(password.encode('utf-8'), gensalt()).decode('utf-8')
-            # hashpw() hashes the password using bcrypt and gensalt() generates a salt value
+        self.password = passwords.hash(password)
+            # passwords.hash() hashes the plaintext password once with bcrypt in the hashing pool
+
+# Columns and relationships included by serialize() when no sparse fieldset is requested
+    FIELDS = ('id', 'full_name', 'email', 'username', 'phone_number')
+    RELATIONSHIPS = ('appointments',)
 
 # Serialize Method: Converts object to dictionary for JSON serialization
-    def serialize(self):
-        return {
-            'id': self.id,
-            'full_name': self.full_name,
-            'email': self.email,
-            'username': self.username,
-            'phone_number': self.phone_number,
-
-            # Appointments is a list of dictionaries
-            'appointments': [appointment.serialize() for appointment in self.appointments]
-        }
+    # fields limits the columns and expand limits the relationships that are included
+    def serialize(self, fields=None, expand=None):
+        fields = self.FIELDS if fields is None else fields
+        expand = self.RELATIONSHIPS if expand is None else expand
+
+        data = {field: getattr(self, field) for field in fields}
+
+        # Appointments is a list of dictionaries
+        if 'appointments' in expand:
+            data['appointments'] = [appointment.serialize() for appointment in self.appointments]
+
+        return data
     
 # Check Password Method: Checks if the password is correct
     def check_password(self, password):
-        return checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
-            # checkpw() compares the hashed password with the plaintext password
+        return passwords.check(password, self.password)
+            # passwords.check() compares the hashed password with the plaintext password in the hashing pool
 
 
     
\ No newline at end of file
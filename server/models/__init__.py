@@ -1,4 +1,4 @@
 from server.models.User import User
-from server.models.Appointment import Appointment
+from server.models.Appointment import Appointment, AppointmentStatus
 from server.models.Business import Business
 from server.models.Service import Service
\ No newline at end of file
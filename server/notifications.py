@@ -0,0 +1,156 @@
+# Appointment Notifications
+    # Confirmation, cancellation and next-day reminder messages, sent by background jobs
+    # Routes queue a job after their commit, so delivery never adds to booking latency
+    # Reminders are fanned out per business: one daily job queues a job for every business with appointments
+    # the next day, and each of those loads its reminders with one query and sends them as one batch
+    # Messages go to the NOTIFIER backend - 'log' writes them to the app log until a mail or SMS provider is added
+    # Delivery is at least once: a job that fails part way is retried in full
+
+
+# Import dependencies
+from datetime import date as Date, datetime, timedelta
+from flask import current_app
+from server.database import db
+
+# Import Models
+from server.models import User, Business, Service, Appointment, AppointmentStatus
+
+# Import Background Jobs
+from server.jobs import jobs
+
+# Default hour of the day (local time) after which reminders for the next day are sent
+DEFAULT_REMINDER_HOUR = 18
+
+# Subject line of each message type
+SUBJECTS = {
+    'confirmation': 'Your appointment is booked',
+    'rescheduled': 'Your appointment has changed',
+    'confirmed': 'Your appointment is confirmed',
+    'cancellation': 'Your appointment was cancelled',
+    'reminder': 'Reminder: your appointment is tomorrow',
+}
+
+
+# Log Notifier: Writes messages to the app log
+def log_notifier(messages):
+    for message in messages:
+        current_app.logger.info('Notification to %s: %s - %s', message['to'], message['subject'], message['body'])
+
+
+# Notifiers selectable with NOTIFIER - each takes a list of messages and raises if delivery fails
+NOTIFIERS = {
+    'log': log_notifier,
+    'none': lambda messages: None,
+}
+
+
+# Send: Delivers a batch of messages with the configured notifier
+def send(messages):
+    if messages:
+        NOTIFIERS[current_app.config.get('NOTIFIER', 'log')](messages)
+
+
+# Message: Builds a message from (email, full name, business, service, date, time)
+def message(type, row):
+    email, full_name, business_name, service_name, date, time = row
+    return {
+        'to': email,
+        'subject': SUBJECTS[type],
+        'body': f'Hi {full_name}, {service_name} at {business_name} on {date:%a, %d %b %Y} at {time:%H:%M}.'
+    }
+
+
+# Appointment Payload: The columns a notification needs, copied so cancellations survive the row being deleted
+def appointment_payload(appointment):
+    return {
+        'appointment_id': appointment.id,
+        'user_id': appointment.user_id,
+        'business_id': appointment.business_id,
+        'service_id': appointment.service_id,
+        'date': appointment.date.isoformat(),
+        'time': appointment.time.strftime('%H:%M'),
+    }
+
+
+# Notification Jobs: Returns one notification job per appointment, for jobs.enqueue_many()
+    # type is 'confirmation', 'rescheduled', 'confirmed' or 'cancellation'
+    # Build them after a flush and before the commit, which would expire every attribute read here
+def notification_jobs(type, *appointments):
+    kind = 'appointment.cancellation' if type == 'cancellation' else 'appointment.confirmation'
+    return [(kind, {**appointment_payload(appointment), 'type': type}, None) for appointment in appointments]
+
+
+# Appointment Rows: Selects the columns of a message for every appointment matching filters that is not cancelled
+def appointment_rows(*filters):
+    return db.session.query(
+        User.email, User.full_name, Business.name, Service.name, Appointment.date, Appointment.time
+    ).select_from(Appointment).join(User, Appointment.user_id == User.id).join(
+        Business, Appointment.business_id == Business.id
+    ).join(Service, Appointment.service_id == Service.id).filter(
+        Appointment.status != AppointmentStatus.CANCELLED, *filters
+    )
+
+
+# Send Confirmation: Confirms a booking or a change, unless the appointment was cancelled or deleted since
+@jobs.handler('appointment.confirmation')
+def send_confirmation(payload):
+    row = appointment_rows(Appointment.id == payload['appointment_id']).first()
+
+    if row is not None:
+        send([message(payload.get('type', 'confirmation'), row)])
+
+
+# Send Cancellation: Tells the user an appointment was cancelled, using the copied date and time
+@jobs.handler('appointment.cancellation')
+def send_cancellation(payload):
+    row = db.session.query(User.email, User.full_name, Business.name, Service.name).filter(
+        User.id == payload['user_id'],
+        Business.id == payload['business_id'],
+        Service.id == payload['service_id']
+    ).first()
+
+    # The user, business or service was deleted since
+    if row is not None:
+        date = Date.fromisoformat(payload['date'])
+        time = datetime.strptime(payload['time'], '%H:%M').time()
+        send([message('cancellation', (*row, date, time))])
+
+
+# Queue Reminders: Queues the reminder fan-out for a date - the key makes it run once per date
+def queue_reminders(date):
+    jobs.enqueue('reminders.schedule', {'date': date.isoformat()}, key=f'reminders:{date.isoformat()}')
+
+
+# Daily Reminders: Queues tomorrow's reminders once the reminder hour has passed
+    # A negative REMINDER_HOUR disables it, e.g. when `flask send-reminders` runs from cron on one node
+@jobs.every_tick
+def daily_reminders():
+    hour = current_app.config.get('REMINDER_HOUR', DEFAULT_REMINDER_HOUR)
+    now = datetime.now()
+    if 0 <= hour <= now.hour:
+        queue_reminders(now.date() + timedelta(days=1))
+
+
+# Schedule Reminders: Queues one reminder job per business with appointments on the date
+@jobs.handler('reminders.schedule')
+def schedule_reminders(payload):
+    business_ids = db.session.query(Appointment.business_id).filter(
+        Appointment.date == Date.fromisoformat(payload['date']),
+        Appointment.status != AppointmentStatus.CANCELLED
+    ).distinct()
+
+    jobs.enqueue_many([
+        ('reminders.business', {'business_id': business_id, 'date': payload['date']}, f'reminders:{payload["date"]}:{business_id}')
+        for business_id, in business_ids
+    ])
+
+
+# Send Business Reminders: Sends every reminder of one business for the date as one batch
+@jobs.handler('reminders.business')
+def send_business_reminders(payload):
+    rows = appointment_rows(
+        Appointment.business_id == payload['business_id'],
+        Appointment.date == Date.fromisoformat(payload['date'])
+    ).order_by(Appointment.time)
+
+    send([message('reminder', row) for row in rows])
@@ -0,0 +1,84 @@
+# Keyset Pagination
+    # Pages are read with WHERE id > :after ORDER BY id LIMIT :limit, so every page costs O(page size)
+
+
+# Import dependencies
+from flask import current_app, request
+import base64, json
+
+# Default and maximum number of rows per page
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+# Pagination Error: Raised when limit or after cannot be parsed
+class PaginationError(ValueError):
+    pass
+
+
+# Encode Cursor: Converts the last key of a page to an opaque URL-safe token
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('utf-8').rstrip('=')
+
+
+# Is Key: Returns True for a value a cursor can hold as a key - a string or a number, but not a boolean
+def _is_key(value):
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+# Decode Cursor: Converts a token created by encode_cursor back to its key
+    # With length, the key must be a list of that many values (e.g. [rank, id]); without, a single value
+    # Anything else - objects, nested lists, null - would reach a SQL comparison, so it is rejected here
+def decode_cursor(token, length=None):
+    try:
+        # Restore base64 padding removed by encode_cursor
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('utf-8')))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+    if length is None:
+        valid = _is_key(key)
+    else:
+        valid = isinstance(key, list) and len(key) == length and all(_is_key(value) for value in key)
+    if not valid:
+        raise PaginationError('Invalid cursor')
+    return key
+
+
+# Get Limit: Returns the page size requested in the query string, bounded by the configured maximum
+def get_limit():
+    default = current_app.config.get('PAGE_SIZE', DEFAULT_LIMIT)
+    maximum = current_app.config.get('MAX_PAGE_SIZE', MAX_LIMIT)
+
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, maximum)
+
+
+# Paginate: Returns one page of rows after the requested cursor and the cursor for the next page
+def paginate(query, column):
+    limit = get_limit()
+    after = request.args.get('after')
+
+    if after:
+        query = query.filter(column > decode_cursor(after))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(column).limit(limit + 1).all()
+    next_cursor = encode_cursor(getattr(rows[limit - 1], column.key)) if len(rows) > limit else None
+
+    return rows[:limit], next_cursor
+
+
+# Page: Builds the JSON body for a page of serialized rows
+def page(results, next_cursor):
+    return {
+        'results': results,
+        'next_cursor': next_cursor
+    }
@@ -0,0 +1,59 @@
+# Password Hashing
+    # bcrypt hashing and verification run in a bounded thread pool so signup and login spikes
+    # use at most PASSWORD_WORKERS cores, leaving the rest of the API responsive
+    # bcrypt releases the GIL while hashing, so pool threads run in parallel with request threads
+
+
+# Import dependencies
+from concurrent.futures import ThreadPoolExecutor
+from bcrypt import hashpw, gensalt, checkpw
+import os
+
+# Default bcrypt cost factor - each increment doubles the work per hash
+DEFAULT_ROUNDS = 12
+
+
+# Password Hasher: Flask extension that owns the hashing pool
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.rounds = DEFAULT_ROUNDS
+        self.workers = os.cpu_count() or 1
+        self.executor = None
+
+        if app is not None:
+            self.init_app(app)
+
+    # Init App Method: Reads cost and pool size from app config
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_ROUNDS', DEFAULT_ROUNDS)
+        self.workers = app.config.get('PASSWORD_WORKERS') or os.cpu_count() or 1
+
+        # Replace any pool created with a previous configuration
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+
+        app.extensions['passwords'] = self
+
+    # Submit Method: Runs a function in the pool, creating a default pool on first use
+    def _submit(self, function, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+        return self.executor.submit(function, *args)
+
+    # Hash Method: Returns the bcrypt hash of a plaintext password as a string
+    def hash(self, password):
+        salt = gensalt(self.rounds)
+        return self._submit(hashpw, password.encode('utf-8'), salt).result().decode('utf-8')
+
+    # Hash Many Method: Hashes several plaintext passwords in parallel and returns them in order
+    def hash_many(self, plaintext):
+        futures = [self._submit(hashpw, password.encode('utf-8'), gensalt(self.rounds)) for password in plaintext]
+        return [future.result().decode('utf-8') for future in futures]
+
+    # Check Method: Returns True if a plaintext password matches a stored bcrypt hash
+    def check(self, password, hashed):
+        return self._submit(checkpw, password.encode('utf-8'), hashed.encode('utf-8')).result()
+
+
+passwords = PasswordHasher()
@@ -0,0 +1,257 @@
+# Rate Limiting and Load Shedding
+    # Login, signup and booking routes take a token from a bucket per client IP and one per account before doing
+    # any work - a client over its limit gets a 429 with Retry-After without touching bcrypt or the database
+    # Buckets live in process memory, or in a local SQLite file shared by every worker process on one node
+    # Routes that wait on a bounded resource (the bcrypt pool, database connections) also hold one of a fixed
+    # number of slots per process - when every slot is taken the request gets a 503 at once instead of queueing,
+    # so a burst of logins cannot occupy every server thread and the rest of the API keeps its latency
+
+
+# Import dependencies
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, jsonify
+import math, os, sqlite3, threading, time
+
+# Limits per scope and key kind, as 'requests/period' - a client may burst up to requests at once,
+# and its bucket refills at requests per period
+DEFAULT_LIMITS = {
+    'login.ip': '30/minute',
+    'login.account': '10/minute',
+    'register.ip': '10/minute',
+    'register.account': '3/minute',
+    'booking.ip': '120/minute',
+    'booking.account': '30/minute',
+}
+
+# Seconds in each period a limit can use
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Most buckets kept in memory - idle buckets are dropped first, as a full bucket is the same as none
+DEFAULT_MAX_BUCKETS = 100_000
+
+# Seconds a shed request is told to wait before retrying
+SHED_RETRY_AFTER = 1
+
+
+# Rate Limit Error: Raised when a limit cannot be parsed
+class RateLimitError(ValueError):
+    pass
+
+
+# Parse Limit: Returns (burst, tokens per second) for a 'requests/period' limit
+def parse_limit(limit):
+    try:
+        requests, period = limit.split('/')
+        burst = int(requests)
+        seconds = PERIODS[period.strip()] if period.strip() in PERIODS else float(period)
+    except (ValueError, KeyError):
+        raise RateLimitError(f'Invalid rate limit {limit!r}, expected requests/second|minute|hour|day')
+
+    if burst < 1 or seconds <= 0:
+        raise RateLimitError(f'Invalid rate limit {limit!r}, requests and period must be positive')
+    return burst, burst / seconds
+
+
+# Parse Limits: Returns DEFAULT_LIMITS updated with a 'scope.kind=limit,...' string, e.g. 'login.ip=5/minute'
+    # A limit of 'off' disables that bucket
+def parse_limits(value):
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (item.strip() for item in (value or '').split(','))):
+        name, _, limit = item.partition('=')
+        limits[name.strip()] = limit.strip()
+    return {name: parse_limit(limit) for name, limit in limits.items() if limit != 'off'}
+
+
+# Memory Buckets: Token buckets local to one process
+class MemoryBuckets:
+    def __init__(self, max_buckets=DEFAULT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        # key: (tokens, updated, full_at) - least recently used first
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Take Method: Takes a token from a bucket - returns 0 if one was taken, or the seconds until one is available
+    def take(self, key, burst, rate):
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self.buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            self.buckets.move_to_end(key)
+
+            if len(self.buckets) > self.max_buckets:
+                self._prune(now)
+            return wait
+
+    # Prune Method: Drops buckets that have refilled, then the least recently used beyond max_buckets
+    def _prune(self, now):
+        for key in [key for key, (_, _, full_at) in self.buckets.items() if full_at <= now]:
+            del self.buckets[key]
+        while len(self.buckets) > self.max_buckets:
+            self.buckets.popitem(last=False)
+
+    # Clear Method: Refills every bucket
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+# SQLite Buckets: Token buckets in a local SQLite file, shared by every worker process on one node
+class SQLiteBuckets:
+    # Takes between purges of refilled buckets
+    PURGE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.takes = 0
+
+        with self._connection() as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS rate_bucket (
+                    key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_rate_bucket_full_at ON rate_bucket (full_at)')
+
+    # Connection Method: Returns this thread's connection to the bucket file
+    def _connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            # Transactions are begun explicitly, so a take holds the write lock from its read to its write
+            self.local.connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self.local.connection.execute('PRAGMA journal_mode = WAL')
+            # Losing the last moments of bucket state in a crash only refills a few buckets - skip the fsync
+            self.local.connection.execute('PRAGMA synchronous = OFF')
+        return self.local.connection
+
+    def take(self, key, burst, rate):
+        now = time.time()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM rate_bucket WHERE key = ?', (key,)).fetchone()
+            tokens = min(burst, row[0] + max(0, now - row[1]) * rate) if row else burst
+
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            connection.execute('INSERT OR REPLACE INTO rate_bucket VALUES (?, ?, ?, ?)',
+                               (key, tokens, now, now + (burst - tokens) / rate))
+
+            self.takes += 1
+            if self.takes % self.PURGE_EVERY == 0:
+                connection.execute('DELETE FROM rate_bucket WHERE full_at <= ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+    def clear(self):
+        self._connection().execute('DELETE FROM rate_bucket')
+
+
+# Backends selectable with RATE_LIMIT_BACKEND
+BACKENDS = {
+    'memory': lambda app: MemoryBuckets(app.config.get('RATE_LIMIT_MAX_BUCKETS', DEFAULT_MAX_BUCKETS)),
+    'sqlite': lambda app: SQLiteBuckets(app.config.get('RATE_LIMIT_PATH') or os.path.join(app.instance_path, 'ratelimit.sqlite')),
+    'none': lambda app: None,
+}
+
+
+# Limiter State: One app's bucket backend, parsed limits and concurrency slots
+class LimiterState:
+    def __init__(self, backend, limits, slots):
+        self.backend = backend
+        self.limits = limits
+        # A resource with no slots is not capped
+        self.slots = {name: threading.BoundedSemaphore(size) for name, size in slots.items() if size > 0}
+
+
+# Reject: Returns a 429 or 503 response telling the client when to retry
+def _reject(message, status, retry_after):
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+# Limiter: Flask extension holding the configured buckets and concurrency slots
+class Limiter:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    # Init App Method: Creates the backend named by RATE_LIMIT_BACKEND and the slots of each resource
+        # Call after the password hasher is initialized - the bcrypt slots default to twice its pool size
+    def init_app(self, app):
+        backend = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+        if backend == 'sqlite' and not app.config.get('RATE_LIMIT_PATH'):
+            os.makedirs(app.instance_path, exist_ok=True)
+
+        passwords = app.extensions.get('passwords')
+        app.extensions['ratelimit'] = LimiterState(
+            BACKENDS[backend](app),
+            parse_limits(app.config.get('RATE_LIMITS')),
+            {
+                'passwords': app.config.get('MAX_PASSWORD_REQUESTS') or 2 * (passwords.workers if passwords else os.cpu_count() or 1),
+                'booking': app.config.get('MAX_BOOKING_REQUESTS') or app.config.get('DB_POOL_SIZE', 5),
+            }
+        )
+
+    # State Property: Returns the current app's limiter state, or None if the limiter is not set up
+    @property
+    def state(self):
+        return current_app.extensions.get('ratelimit')
+
+    # Limit Method: Decorator taking a token from the scope's per-IP bucket and, when account(**view_args)
+    # returns a value, its per-account bucket - returns a 429 when either is empty
+    def limit(self, scope, account=None):
+        def decorator(route):
+            @wraps(route)
+            def wrapper(*args, **kwargs):
+                state = self.state
+                if state is not None and state.backend is not None:
+                    keys = [('ip', request.remote_addr)]
+                    if account is not None:
+                        keys.append(('account', account(**kwargs)))
+
+                    for kind, value in keys:
+                        limit = state.limits.get(f'{scope}.{kind}')
+                        if limit is None or value is None:
+                            continue
+                        wait = state.backend.take(f'{scope}:{kind}:{str(value).lower()}', *limit)
+                        if wait:
+                            return _reject('Too many requests, try again later', 429, wait)
+
+                return route(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # Concurrency Method: Decorator holding one of a resource's slots while the route runs - returns a 503
+    # at once when every slot is taken, rather than queueing behind the requests holding them
+    def concurrency(self, name):
+        def decorator(route):
+            @wraps(route)
+            def wrapper(*args, **kwargs):
+                state = self.state
+                semaphore = state.slots.get(name) if state is not None else None
+                if semaphore is None:
+                    return route(*args, **kwargs)
+
+                if not semaphore.acquire(blocking=False):
+                    return _reject('Server busy, try again shortly', 503, SHED_RETRY_AFTER)
+                try:
+                    return route(*args, **kwargs)
+                finally:
+                    semaphore.release()
+            return wrapper
+        return decorator
+
+
+limiter = Limiter()
@@ -1,26 +1,43 @@
 # Import Dependencies
 from flask import Blueprint, request, jsonify
-import json, bcrypt, os
+import json, os
 from server.database import db
-from flask_jwt_extended import create_access_token
 
 # Import Models
 from server.models import User
 
+# Import Access Tokens
+from server.tokens import create_user_token
+
+# Import Rate Limiting - both routes run bcrypt, so floods are turned away before it
+from server.ratelimit import limiter
+
 # Import Environment Variables
 JWT_SECRET = os.getenv('JWT_SECRET')
 
 # Define Blueprint
 auth = Blueprint('auth', __name__)
 
+
+# Request Email: Returns the email in the request body, keying the per-account limits
+    # Bodies that are not JSON objects have no account - the route itself rejects them
+def request_email():
+    data = request.get_json(force=True, silent=True)
+    return data.get('email') if isinstance(data, dict) else None
+
+
 # Define Routes
 
 # Register
 @auth.route('/register', methods=['POST'])
+@limiter.limit('register', account=request_email)
+@limiter.concurrency('passwords')
 def create_user():
     try:
         # Get user data from request body
         data = json.loads(request.data)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
 
         # Check if user already exists by email, phone number, or username
         if User.query.filter_by(email=data['email']).first():
@@ -30,25 +47,20 @@ def create_user():
         if User.query.filter_by(username=data['username']).first():
             return jsonify({'error': 'Username already exists'}), 400   
 
-        # Hash user password
-        hashed = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
-        # Create new user
+        # Create new user - the model hashes the plaintext password once
         user = User(
             full_name=data['full_name'],
             email=data['email'],
             username=data['username'],
             phone_number=data['phone_number'],
-            password=hashed.decode('utf-8')
+            password=data['password']
         )
         # Add user to database
         db.session.add(user)
         db.session.commit()
 
-        # Serialize user to avoid JSON serialization errors
-        serialized_user = user.serialize()
-
-        # Create JWT token
-        token = create_access_token(serialized_user, JWT_SECRET)
+        # Create JWT token with the user ID as identity and the user summary as claims
+        token = create_user_token(user)
         
         # Return Token
         return jsonify({'success': token})
@@ -57,10 +69,15 @@ def create_user():
 
 # Login
 @auth.route('/login', methods=['POST'])
+@limiter.limit('login', account=request_email)
+@limiter.concurrency('passwords')
 def login():
     try:
-        email = request.json['email']
-        password = request.json['password']
+        data = request.get_json(force=True, silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Email and password are required'}), 400
+        email = data.get('email')
+        password = data.get('password')
 
         if not email or not password:
             return jsonify({'error': 'Email and password are required'}), 400
@@ -71,11 +88,11 @@ def login():
         # If user is found, check password
         if user:
             # If password is incorrect, return error
-            if not bcrypt.checkpw(password.encode('utf-8'), user.password.encode('utf-8')):
+            if not user.check_password(password):
                 return jsonify({'error': 'Invalid password'}), 401
             # If password is correct, create JWT token
             else:
-                token = create_access_token({'email': email, 'password': password}, JWT_SECRET, algorithm='HS256')
+                token = create_user_token(user)
                 return jsonify({'success': token})
         # If user is not found, return error
         return jsonify({'error': 'User not found'}), 404
@@ -8,6 +8,51 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 # Import Models
 from server.models import Business, Appointment, Service
 
+# Import Loading Strategies
+from server.loading import eager
+
+# Import Pagination
+from server.pagination import paginate, page, PaginationError
+
+# Import Sparse Fieldsets
+from server.fieldsets import get_fieldset, fieldset_options, FieldsetError
+
+# Import Search Index
+from server.search import search_businesses as search_index
+
+# Import Availability Engine
+from server.availability import availability
+
+# Import Day Schedule
+from server.schedule import day_schedule
+
+# Import Business Statistics
+from server.stats import business_stats, get_range, StatsError
+
+# Import Nearby Search
+from server.geo import nearby_businesses, get_point, GeoError
+
+# Import Streaming Responses
+from server.streaming import stream, StreamError, STREAM_STRATEGY
+
+# Import Response Cache
+from server.cache import cache, business_tags
+
+# Import Batch Operations
+from server.batch import create_many, update_many, cancel_many, get_body, BatchError
+
+# Import Access Tokens - batch bookings act for the token's user
+from server.tokens import current_user_id
+
+# Import Rate Limiting - a batch books up to BATCH_LIMIT appointments, so batches share the booking limits
+from server.ratelimit import limiter
+
+# Import Status Lifecycle
+from server.lifecycle import transition, get_status, ACTIONS, TransitionError, TransitionForbidden, StatusError
+
+# Import Cascading Deletes
+from server.cascade import delete_business as delete_business_rows, delete_service as delete_service_rows
+
 # Import Environment Variables
 JWT_SECRET = os.getenv('JWT_SECRET')    
 
@@ -20,28 +65,147 @@ business = Blueprint('business', __name__)
 # GET
 # Get All Businesses
 @business.route('/all', methods=['GET'])
+@cache.cached(lambda: ('catalog',))
 def get_businesses():
     try:
-        # Get all businesses
-        businesses = Business.query.all()
+        # Get requested columns and relationships
+        fields, expand = get_fieldset(Business)
+
+        # Get a page of businesses with only the requested relationships eager-loaded
+        businesses, next_cursor = paginate(Business.query.options(*fieldset_options(Business, fields, expand)), Business.id)
+
+        # Return serialized businesses and the next page cursor as JSON
+        return jsonify(page([business.serialize(fields, expand) for business in businesses], next_cursor))
+    except (PaginationError, FieldsetError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+# Export All Businesses
+    # Streams every business as a JSON array, or NDJSON with ?format=ndjson - ?fields= and ?expand= apply
+@business.route('/export', methods=['GET'])
+def export_businesses():
+    try:
+        # Get requested columns and relationships
+        fields, expand = get_fieldset(Business)
+
+        # Read businesses in batches, loading each batch's relationships with one query per relationship
+        query = Business.query.options(*fieldset_options(Business, fields, expand, STREAM_STRATEGY)).order_by(Business.id)
+
+        # Stream serialized businesses as they are read
+        return stream(query, lambda business: business.serialize(fields, expand))
+    except (StreamError, FieldsetError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Export a Business's Appointments
+    # Streams every appointment of a business in date and time order, as a JSON array or NDJSON
+@business.route('/<int:business_id>/appointments/export', methods=['GET'])
+def export_business_appointments(business_id):
+    try:
+        # If business is not found, return error
+        if not Business.query.get(business_id):
+            return jsonify({'error': 'Business not found'}), 404
+
+        # Read appointments in (business_id, date, time) index order
+        query = Appointment.query.filter_by(business_id=business_id).order_by(Appointment.date, Appointment.time, Appointment.id)
 
-        # Return serialized businesses as JSON
-        return jsonify([business.serialize() for business in businesses])
+        # Stream serialized appointments as they are read
+        return stream(query, Appointment.serialize)
+    except StreamError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
+# Get a Business's Appointments by Status
+    # ?status= is pending (default), confirmed, cancelled or completed - the pending queue is what staff confirm from
+    # The (business_id, status, date) index reads only the matching rows, not the business's whole history
+    # Not cached - staff act on the queue, so every worker must answer with its current state
+@business.route('/<int:business_id>/appointments', methods=['GET'])
+@cache.conditional
+def get_business_appointments(business_id):
+    try:
+        status = get_status(request.args.get('status', 'pending'))
+
+        # Get a page of the business's appointments with the status
+        query = Appointment.query.filter_by(business_id=business_id, status=status)
+        appointments, next_cursor = paginate(query, Appointment.id)
+
+        # An empty first page may mean the business does not exist
+        if not appointments and not request.args.get('after') and not Business.query.get(business_id):
+            return jsonify({'error': 'Business not found'}), 404
+
+        # Return serialized appointments and the next page cursor as JSON
+        return jsonify(page([appointment.serialize() for appointment in appointments], next_cursor))
+    except (PaginationError, StatusError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get a Business's Statistics (by Date Range)
+    # ?start= and ?end= default to the last 30 days - bookings, cancellations, completions and revenue
+    # per day and per service, read from the maintained rollup rather than the appointment history
+@business.route('/<int:business_id>/stats', methods=['GET'])
+@cache.cached(lambda business_id: (f'business:{business_id}',))
+def get_stats(business_id):
+    try:
+        start, end = get_range(request.args)
+
+        # If business is not found, return error
+        if not Business.query.get(business_id):
+            return jsonify({'error': 'Business not found'}), 404
+
+        # Return the statistics as JSON
+        return jsonify(business_stats(business_id, start, end))
+    except StatsError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Get a Business (by ID)
 @business.route('/<int:business_id>', methods=['GET'])
+@cache.cached(lambda business_id: (f'business:{business_id}',))
 def get_business(business_id):
     try:
-        # Get business by ID
-        business = Business.query.get(business_id)
+        # Get requested columns and relationships
+        fields, expand = get_fieldset(Business)
+
+        # Get business by ID with only the requested relationships eager-loaded
+        business = Business.query.options(*fieldset_options(Business, fields, expand)).get(business_id)
 
         # If business is found, return serialized business as JSON
         if business:
-            return jsonify(business.serialize())
+            return jsonify(business.serialize(fields, expand))
         # If business is not found, return error
         return jsonify({'error': 'Business not found'}), 404
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get Businesses Near a Point
+    # ?lat=&lng= are required; ?radius= is in km (default 10) and ?service= keeps businesses offering a matching service
+    # Results are nearest first, each with its distance_km - ?fields=, ?expand=, ?limit= and ?after= apply
+@business.route('/nearby', methods=['GET'])
+@cache.cached(lambda: ('catalog',))
+def get_nearby_businesses():
+    try:
+        # Get the search point and radius
+        lat, lng, radius = get_point(request.args)
+
+        # Get requested columns and relationships
+        fields, expand = get_fieldset(Business)
+
+        # Get a page of businesses inside the radius from the location index
+        results, next_cursor = nearby_businesses(lat, lng, radius, request.args.get('service'), fieldset_options(Business, fields, expand))
+
+        # Return serialized businesses with their distances and the next page cursor as JSON
+        return jsonify(page([
+            {**business.serialize(fields, expand), 'distance_km': distance} for business, distance in results
+        ], next_cursor))
+    except (GeoError, PaginationError, FieldsetError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
@@ -52,25 +216,29 @@ def search_businesses():
         # Get search query from request args
         query = request.args.get('query')
 
-        # Search businesses
-        businesses = Business.query.filter(
-            (Business.name.ilike(f'%{query}%')) |
-            (Business.city.ilike(f'%{query}%')) |
-            (Business.state.ilike(f'%{query}%')) |
-            (Business.services.any(Service.name.ilike(f'%{query}%')))
-        ).all()
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+
+        # Get requested columns and relationships
+        fields, expand = get_fieldset(Business)
 
-        # Return serialized businesses as JSON
-        return jsonify([business.serialize() for business in businesses])
+        # Search businesses in the search index, best match first
+        businesses, next_cursor = search_index(query, fieldset_options(Business, fields, expand))
+
+        # Return serialized businesses and the next page cursor as JSON
+        return jsonify(page([business.serialize(fields, expand) for business in businesses], next_cursor))
+    except (PaginationError, FieldsetError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
 # Get All Services for a Business
 @business.route('/<int:business_id>/services', methods=['GET'])
+@cache.cached(lambda business_id: (f'business:{business_id}',))
 def get_services(business_id):
     try:
-        # Get business by ID
-        business = Business.query.get(business_id)
+        # Get business by ID with services eager-loaded
+        business = Business.query.options(*eager(Business, relationships=('services',))).get(business_id)
 
         # If business is not found, return error
         if not business:
@@ -83,6 +251,7 @@ def get_services(business_id):
 
 # Get a Service for a Business (by ID)
 @business.route('/<int:business_id>/service/<int:service_id>', methods=['GET'])
+@cache.cached(lambda business_id, service_id: (f'business:{business_id}',))
 def get_service(business_id, service_id):
     try:
         # Get business by ID
@@ -105,6 +274,65 @@ def get_service(business_id, service_id):
         return jsonify({'error': str(e)}), 500
 
 
+# Get Open Slots for a Service (by Date Range)
+@business.route('/<int:business_id>/service/<int:service_id>/availability', methods=['GET'])
+def get_availability(business_id, service_id):
+    try:
+        # Get business service by ID
+        service = Service.query.filter_by(id=service_id, business_id=business_id).first()
+
+        # If service is not found, return error
+        if not service:
+            return jsonify({'error': 'Service not found'}), 404
+
+        # Convert date strings to date objects - start defaults to today and end defaults to start
+        start_str = request.args.get('start')
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else datetime.now().date()
+        end_str = request.args.get('end')
+        end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start_date
+
+        # Return open slots per day as JSON
+        return jsonify({
+            'business_id': business_id,
+            'service_id': service_id,
+            'duration': service.duration,
+            'availability': availability(business_id, service.duration, start_date, end_date)
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get a Business's Schedule for a Day (date defaults to today)
+    # Front-desk screens poll this route - it reads one business day from the precomputed day view
+    # Not cached, so a booking shows on every worker at once - unchanged days still get a 304 by ETag
+@business.route('/<int:business_id>/schedule', methods=['GET'])
+@cache.conditional
+def get_schedule(business_id):
+    try:
+        # Convert date string to date object
+        date_str = request.args.get('date')
+        date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else datetime.now().date()
+
+        # Get the day's appointments with their service names and durations
+        appointments = day_schedule(business_id, date)
+
+        # An empty day may belong to a business that does not exist
+        if not appointments and not Business.query.get(business_id):
+            return jsonify({'error': 'Business not found'}), 404
+
+        # Return the day's schedule as JSON
+        return jsonify({
+            'business_id': business_id,
+            'date': date.isoformat(),
+            'appointments': appointments
+        })
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # POST
 # Create a Business
 @business.route('/new', methods=['POST'])
@@ -121,13 +349,18 @@ def create_business():
             state=data['state'],
             phone_number=data['phone_number'],
             email=data['email'],
-            password=data['password']
+            password=data['password'],
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude')
         )
 
         # Add Business to database
         db.session.add(business)
         db.session.commit()
 
+        # Invalidate cached business listings
+        cache.invalidate('catalog')
+
         # Return serialized business as JSON
         return jsonify(business.serialize())
     except Exception as e:
@@ -160,12 +393,85 @@ def create_service(business_id):
         db.session.add(service)
         db.session.commit()
 
+        # Invalidate cached responses that include the business's services
+        cache.invalidate(*business_tags(business_id))
+
         # Return serialized service as JSON
         return jsonify(business.serialize())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+# Create Appointments in a Batch
+    # Body: {"appointments": [{"user_id", "service_id", "date", "time", "notes"}, ...], "atomic": false}
+    # Every item's user_id must be the token's user - other items fail with status 'forbidden'
+@business.route('/<int:business_id>/appointments/batch', methods=['POST'])
+@jwt_required()
+@limiter.limit('booking', account=lambda business_id: current_user_id())
+@limiter.concurrency('booking')
+def create_appointments(business_id):
+    try:
+        # Get data from request - anything but a JSON object is a bad request
+        data = get_body(request.get_json(silent=True))
+
+        # If business is not found, return error
+        if not Business.query.get(business_id):
+            return jsonify({'error': 'Business not found'}), 404
+
+        # Book every valid, free item in one transaction and return per-item results
+            # With atomic, nothing is booked unless every item succeeds
+        result = create_many(business_id, data.get('appointments'), current_user_id(), atomic=bool(data.get('atomic')))
+        return jsonify(result), 200 if result['committed'] else 409
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Cancel Appointments in a Batch
+    # Body: {"ids": [...], "atomic": false}
+    # Only the token's user's appointments can be cancelled - others fail with status 'forbidden'
+@business.route('/<int:business_id>/appointments/batch/cancel', methods=['POST'])
+@jwt_required()
+@limiter.limit('booking', account=lambda business_id: current_user_id())
+@limiter.concurrency('booking')
+def cancel_appointments(business_id):
+    try:
+        # Get data from request - anything but a JSON object is a bad request
+        data = get_body(request.get_json(silent=True))
+
+        # If business is not found, return error
+        if not Business.query.get(business_id):
+            return jsonify({'error': 'Business not found'}), 404
+
+        # Cancel every listed appointment in one transaction and return per-item results
+        result = cancel_many(business_id, data.get('ids'), current_user_id(), atomic=bool(data.get('atomic')))
+        return jsonify(result), 200 if result['committed'] else 409
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Confirm, Cancel or Complete an Appointment
+    # Returns 409 if the appointment's current status does not allow the change, e.g. confirming a cancelled one
+    # Only the token's user's appointments can be changed, as with the batch routes
+@business.route('/<int:business_id>/appointments/<int:appointment_id>/<any(confirm, cancel, complete):action>', methods=['POST'])
+@jwt_required()
+def change_appointment_status(business_id, appointment_id, action):
+    try:
+        appointment = transition(business_id, appointment_id, ACTIONS[action], current_user_id())
+
+        # Return serialized appointment as JSON
+        return jsonify(appointment.serialize())
+    except TransitionForbidden as e:
+        return jsonify({'error': str(e)}), 403
+    except TransitionError as e:
+        return jsonify({'error': str(e)}), 409
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
 
+
 # PUT
 # Update a Business
 @business.route('/<int:business_id>/update', methods=['PUT'])
@@ -194,15 +500,46 @@ def update_business(business_id):
             business.phone_number = data['phone_number']
         if 'email' in data:
             business.email = data['email']
+        if 'latitude' in data:
+            business.latitude = data['latitude']
+        if 'longitude' in data:
+            business.longitude = data['longitude']
 
         # Commit changes to database
         db.session.commit()
 
+        # Invalidate cached responses for the business
+        cache.invalidate(*business_tags(business_id))
+
         # Return serialized business as JSON
         return jsonify(business.serialize())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
+# Update Appointments in a Batch
+    # Body: {"appointments": [{"id", "date", "time", "service_id", "notes"}, ...], "atomic": false}
+    # Omitted fields keep their current values; only the token's user's appointments can be changed
+@business.route('/<int:business_id>/appointments/batch', methods=['PUT'])
+@jwt_required()
+@limiter.limit('booking', account=lambda business_id: current_user_id())
+@limiter.concurrency('booking')
+def update_appointments(business_id):
+    try:
+        # Get data from request - anything but a JSON object is a bad request
+        data = get_body(request.get_json(silent=True))
+
+        # If business is not found, return error
+        if not Business.query.get(business_id):
+            return jsonify({'error': 'Business not found'}), 404
+
+        # Move or edit every item whose new slot is free in one transaction and return per-item results
+        result = update_many(business_id, data.get('appointments'), current_user_id(), atomic=bool(data.get('atomic')))
+        return jsonify(result), 200 if result['committed'] else 409
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
 # Update a Service for a Business
 @business.route('/<int:business_id>/service/<int:service_id>/update', methods=['PUT'])
 def update_service(business_id, service_id):
@@ -237,6 +574,9 @@ def update_service(business_id, service_id):
         # Commit changes to database
         db.session.commit()
 
+        # Invalidate cached responses for the business
+        cache.invalidate(*business_tags(business_id))
+
         # Return serialized service as JSON
         return jsonify(service.serialize())
     except Exception as e:
@@ -255,17 +595,13 @@ def delete_business(business_id):
         if not business:
             return jsonify({'error': 'Business not found'}), 404
         
-        # Get all appointments for business
-        appointments = Appointment.query.filter_by(business_id=business_id).all()
-
-        # Delete all appointments for business
-        for appointment in appointments:
-            db.session.delete(appointment)
-        
-        # Delete business
-        db.session.delete(business)
+        # Delete business with its services and appointments in set-based statements
+        delete_business_rows(business_id)
         db.session.commit()
 
+        # Invalidate cached responses for the business
+        cache.invalidate(*business_tags(business_id))
+
         # Return success message
         return jsonify({'message': 'Business deleted'})
     except Exception as e:
@@ -289,17 +625,13 @@ def delete_service(business_id, service_id):
         if not service:
             return jsonify({'error': 'Service not found'}), 404
         
-        # Get all appointments for business service
-        appointments = Appointment.query.filter_by(service_id=service_id, business_id=business_id).all()
-
-        # Delete all appointments for business service
-        for appointment in appointments:
-            db.session.delete(appointment)
-
-        # Delete service
-        db.session.delete(service)
+        # Delete service with its appointments in set-based statements
+        delete_service_rows(service_id)
         db.session.commit()
 
+        # Invalidate cached responses for the business
+        cache.invalidate(*business_tags(business_id))
+
         # Return success message
         return jsonify({'message': 'Service deleted'})
     except Exception as e:
@@ -1,13 +1,44 @@
 # Import dependencies
 from flask import Blueprint, request, jsonify
-import json, bcrypt, os
+import json, os
 from server.database import db
 from datetime import datetime, time
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import jwt_required
 
 # Import models
 from server.models import User, Appointment
 
+# Import pagination
+from server.pagination import paginate, page, PaginationError
+
+# Import sparse fieldsets
+from server.fieldsets import get_fieldset, fieldset_options, FieldsetError
+
+# Import booking
+from server.booking import book_appointment, reschedule_appointment, read_booking, BookingConflict, BookingNotFound, BookingError
+
+# Import appointment lifecycle
+from server.lifecycle import TransitionError
+
+# Import password hashing
+from server.passwords import passwords
+
+# Import access tokens
+from server.tokens import current_user_id, owner_required
+
+# Import rate limiting - bookings are limited per IP and per user, and shed when the database is saturated
+from server.ratelimit import limiter
+
+# Import response cache - business responses embed appointments
+from server.cache import cache, business_tags
+
+# Import streaming responses
+from server.streaming import stream, StreamError, STREAM_STRATEGY
+
+# Import background jobs - cancellations are sent after the response
+from server.jobs import jobs
+from server.notifications import notification_jobs
+
 # Import Environment Variables
 JWT_SECRET = os.getenv('JWT_SECRET')
 
@@ -20,40 +51,35 @@ user = Blueprint('user', __name__)
 # POST
 # Create an appointment
 @user.route('/<int:user_id>/appointments', methods=['POST'])
+@owner_required
+@limiter.limit('booking', account=lambda user_id: user_id)
+@limiter.concurrency('booking')
 def create_appointment(user_id):
     try:
-        # Get user by ID
-        user = User.query.get(user_id)
-        
-        # If user is found, create appointment
-        if user:
-            # Get appointment data from request body
-            data = json.loads(request.data)
-
-            # Convert date string to date object
-            date_str = data['date']
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-
-            # Convert time string to time object
-            time_str = data['time']
-            time_obj = datetime.strptime(time_str, '%H:%M').time()
-
-            # Create new appointment
-            appointment = Appointment(
-                date=date_obj,  
-                time=time_obj,
-                user_id=user.id,
-                business_id=data['business_id'],
-                service_id=data['service_id'],
-                notes=data['notes']
-            )
-            # Add appointment to database
-            db.session.add(appointment)
-            db.session.commit()
-            # Return serialized appointment as JSON
-            return jsonify({"message": "Appointment created successfully"})
-        # If user is not found, return error
-        return jsonify({'error': 'User not found'}), 404
+        # Get appointment data from request body
+        data = json.loads(request.data)
+
+        # Check required fields and convert date and time strings to objects
+        date_obj, time_obj = read_booking(data, required=('business_id', 'service_id', 'date', 'time'))
+
+        # Create new appointment if the slot does not overlap an existing booking
+            # The token identifies the user, so no user lookup is needed
+        book_appointment(
+            date=date_obj,  
+            time=time_obj,
+            user_id=user_id,
+            business_id=data['business_id'],
+            service_id=data['service_id'],
+            notes=data.get('notes')
+        )
+        # Return serialized appointment as JSON
+        return jsonify({"message": "Appointment created successfully"})
+    except BookingError as e:
+        return jsonify({'error': str(e)}), 400
+    except BookingConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except BookingNotFound as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -63,22 +89,42 @@ def create_appointment(user_id):
 @user.route('/all', methods=['GET'])
 def get_users():
     try:
-        users = User.query.all()
-        return jsonify([user.serialize() for user in users])
+        # Get requested columns and relationships
+        fields, expand = get_fieldset(User)
+
+        # Get a page of users with only the requested relationships eager-loaded
+        users, next_cursor = paginate(User.query.options(*fieldset_options(User, fields, expand)), User.id)
+        return jsonify(page([user.serialize(fields, expand) for user in users], next_cursor))
+    except (PaginationError, FieldsetError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Export all users
+    # Streams every user as a JSON array, or NDJSON with ?format=ndjson - ?fields= and ?expand= apply
+@user.route('/export', methods=['GET'])
+def export_users():
+    try:
+        # Get requested columns and relationships
+        fields, expand = get_fieldset(User)
+
+        # Read users in batches, loading each batch's appointments with one query
+        query = User.query.options(*fieldset_options(User, fields, expand, STREAM_STRATEGY)).order_by(User.id)
+
+        # Stream serialized users as they are read
+        return stream(query, lambda user: user.serialize(fields, expand))
+    except (StreamError, FieldsetError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # User Profile
 @user.route('/profile', methods=['GET'])
+@jwt_required()
 def get_user():
     try:
-        email = request.json['email']
-        password = request.json['password']
-
-        if not email or not password:
-            return jsonify({'error': 'Email and password are required'}), 400
-
-        user = User.query.filter_by(email=email).first()
+        # Get user from the token identity with appointments eager-loaded
+        user = User.query.options(*fieldset_options(User, None, None)).get(current_user_id())
         # If user is found, return serialized user as JSON
         if user:
             # Create a dictionary with user data excluding the password
@@ -97,44 +143,43 @@ def get_user():
 
 # All User Appointments
 @user.route('/appointments', methods=['GET'])
+@jwt_required()
 def get_appointments():
     try:
-        email = request.json['email']
-        password = request.json['password']
-
-        if not email or not password:
-            return jsonify({'error': 'Email and password are required'}), 400
-        
-        # Find user by email
-        user = User.query.filter_by(email=email).first()
-        # If user is found, return their appointments
-        if user:
-            # Get all appointments for user
-            appointments = Appointment.query.filter_by(user_id=user.id).all()
-            # Return serialized appointments as JSON
-            return jsonify([appointment.serialize() for appointment in appointments])
-        # If user is not found, return error
-        return jsonify({'error': 'User not found'}), 404
+        # Get a page of appointments for the user the token was issued to
+        appointments, next_cursor = paginate(Appointment.query.filter_by(user_id=current_user_id()), Appointment.id)
+        # Return serialized appointments and the next page cursor as JSON
+        return jsonify(page([appointment.serialize() for appointment in appointments], next_cursor))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Export user appointments
+    # Streams every appointment of the user the token was issued to, as a JSON array or NDJSON
+@user.route('/appointments/export', methods=['GET'])
+@jwt_required()
+def export_appointments():
+    try:
+        # Read appointments in user_id index order
+        query = Appointment.query.filter_by(user_id=current_user_id()).order_by(Appointment.id)
+
+        # Stream serialized appointments as they are read
+        return stream(query, Appointment.serialize)
+    except StreamError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Specific User Appointment
 @user.route('/<int:user_id>/appointments/<int:id>', methods=['GET'])
+@owner_required
 def get_appointment(user_id, id):
     try:
-        email = request.json['email']
-        password = request.json['password']
-
-        if not email or not password:
-            return jsonify({'error': 'Email and password are required'}), 400
-
-        user = User.query.get(user_id)
-        if user:
-            appointment = Appointment.query.filter_by(id=id, user_id=user.id).first()
-            if appointment:
-                return jsonify(appointment.serialize())
-            return jsonify({'error': 'Appointment not found'}), 404
-        return jsonify({'error': 'User not found'}), 404
+        appointment = Appointment.query.filter_by(id=id, user_id=user_id).first()
+        if appointment:
+            return jsonify(appointment.serialize())
+        return jsonify({'error': 'Appointment not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -142,14 +187,9 @@ def get_appointment(user_id, id):
 # PUT
 # Update User
 @user.route('/<int:user_id>/profile', methods=['PUT'])
+@owner_required
 def update_user(user_id):
     try:
-        email = request.json['email']
-        password = request.json['password']
-
-        if not email or not password:
-            return jsonify({'error': 'Email and password are required'}), 400
-        
         user = User.query.filter_by(id=user_id).first()
 
         if user:
@@ -180,25 +220,18 @@ def update_user(user_id):
 
 # Update Password
 @user.route('/<int:user_id>/profile/password', methods=['PUT'])
+@owner_required
+@limiter.concurrency('passwords')
 def update_password(user_id):
     try:
-        email = request.json['email']
-        password = request.json['password']
-
-        if not email or not password:
-            return jsonify({'error': 'Email and password are required'}), 400
-        
         user = User.query.filter_by(id=user_id).first()
         if user:
             # Get password data from request body
             data = json.loads(request.data)
             # Check if the current password is correct
-            if bcrypt.checkpw(data['current_password'].encode('utf-8'), user.password):
-                # Hash new password
-                hashed = bcrypt.hashpw(data['new_password'].encode('utf-8'), bcrypt.gensalt())
-                # Update user password
-                new_password = hashed.decode('utf-8')
-                user.password = new_password
+            if user.check_password(data['current_password']):
+                # Hash new password and update user password
+                user.password = passwords.hash(data['new_password'])
 
                 db.session.commit()
                 return jsonify({'message': 'Password updated successfully'})
@@ -209,33 +242,32 @@ def update_password(user_id):
 
 # Update Appointment
 @user.route('/<int:user_id>/appointments/<int:id>', methods=['PUT'])
+@owner_required
+@limiter.limit('booking', account=lambda user_id, id: user_id)
+@limiter.concurrency('booking')
 def update_appointment(user_id, id):
     try:
-        email = request.json['email']
-        password = request.json['password']
-
-        if not email or not password:
-            return jsonify({'error': 'Email and password are required'}), 400
+        appointment = Appointment.query.filter_by(id=id, user_id=user_id).first()
+        if appointment:
+            data = json.loads(request.data)
 
-        user = User.query.get(user_id)
-        if user:
-            appointment = Appointment.query.filter_by(id=id, user_id=user.id).first()
-            if appointment:
-                data = json.loads(request.data)
-
-                if 'date' in data:
-                    appointment.date = data['date']
-                if 'time' in data:
-                    appointment.time = data['time']
-                if 'notes' in data:
-                    appointment.notes = data['notes']
-                if 'service_id' in data:
-                    appointment.service_id = data['service_id']
-                
-                db.session.commit()
-                return jsonify(appointment.serialize())
-            return jsonify({'error': 'Appointment not found'}), 404
-        return jsonify({'error': 'User not found'}), 404
+            # Convert date and time strings to objects and move the appointment if the new slot is free
+            date_obj, time_obj = read_booking(data)
+            reschedule_appointment(
+                appointment,
+                date=date_obj,
+                time=time_obj,
+                service_id=data.get('service_id'),
+                notes=data.get('notes')
+            )
+            return jsonify(appointment.serialize())
+        return jsonify({'error': 'Appointment not found'}), 404
+    except BookingError as e:
+        return jsonify({'error': str(e)}), 400
+    except (BookingConflict, TransitionError) as e:
+        return jsonify({'error': str(e)}), 409
+    except BookingNotFound as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -243,22 +275,18 @@ def update_appointment(user_id, id):
 # DELETE
 # Specific Appointment
 @user.route('/<int:user_id>/appointments/<int:id>', methods=['DELETE'])
+@owner_required
 def delete_appointment(user_id, id):
     try:
-        email = request.json['email']
-        password = request.json['password']
-
-        if not email or not password:
-            return jsonify({'error': 'Email and password are required'}), 400
-
-        user = User.query.get(user_id)
-        if user:
-            appointment = Appointment.query.filter_by(id=id, user_id=user.id).first()
-            if appointment:
-                db.session.delete(appointment)
-                db.session.commit()
-                return jsonify({'message': 'Appointment deleted successfully'})
-            return jsonify({'error': 'Appointment not found'}), 404
-        return jsonify({'error': 'User not found'}), 404
+        appointment = Appointment.query.filter_by(id=id, user_id=user_id).first()
+        if appointment:
+            # The notification copies the appointment's details, so it can be sent after the row is gone
+            notifications = notification_jobs('cancellation', appointment)
+            db.session.delete(appointment)
+            db.session.commit()
+            cache.invalidate(*business_tags(appointment.business_id))
+            jobs.enqueue_many(notifications)
+            return jsonify({'message': 'Appointment deleted successfully'})
+        return jsonify({'error': 'Appointment not found'}), 404
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,120 @@
+# Business Day Schedule
+    # An SQLite table holds one row per appointment, already joined with its service's name and duration
+    # Its primary key starts with (business_id, date, time) and it has no rowid, so the rows of one business day
+    # are stored together and a day's schedule is a single range read in time order
+    # It is a derived table (server/derived.py) kept in sync by triggers on appointment and service
+
+
+# Import dependencies
+from datetime import datetime
+from sqlalchemy import text
+from server.database import db
+
+# Import Models
+from server.models import Appointment, Service, AppointmentStatus
+
+# Import time helpers
+from server.availability import minutes, clock
+
+# Import Derived Tables
+from server.derived import register
+
+
+# Name of the day view table
+SCHEDULE_TABLE = 'business_schedule'
+
+# Adds one appointment to the view with its current service
+INSERT_APPOINTMENT = f'''
+    INSERT INTO {SCHEDULE_TABLE} (business_id, date, time, appointment_id, duration, service_id, service_name, user_id, status, notes)
+    SELECT new.business_id, new.date, new.time, new.id, service.duration, service.id, service.name, new.user_id, new.status, new.notes
+    FROM service WHERE service.id = new.service_id;
+'''
+
+# Removes one appointment from the view by its full primary key
+DELETE_APPOINTMENT = f'''
+    DELETE FROM {SCHEDULE_TABLE}
+    WHERE business_id = old.business_id AND date = old.date AND time = old.time AND appointment_id = old.id;
+'''
+
+# View table and sync triggers
+SCHEMA = [
+    f'''CREATE TABLE IF NOT EXISTS {SCHEDULE_TABLE} (
+        business_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        time TIME NOT NULL,
+        appointment_id INTEGER NOT NULL,
+        duration INTEGER NOT NULL,
+        service_id INTEGER NOT NULL,
+        service_name VARCHAR(100) NOT NULL,
+        user_id INTEGER NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        notes VARCHAR(200),
+        PRIMARY KEY (business_id, date, time, appointment_id)
+    ) WITHOUT ROWID''',
+
+    f'''CREATE TRIGGER IF NOT EXISTS appointment_schedule_insert AFTER INSERT ON appointment BEGIN
+        {INSERT_APPOINTMENT}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS appointment_schedule_update AFTER UPDATE ON appointment BEGIN
+        {DELETE_APPOINTMENT}
+        {INSERT_APPOINTMENT}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS appointment_schedule_delete AFTER DELETE ON appointment BEGIN
+        {DELETE_APPOINTMENT}
+    END''',
+
+    # Services are deleted after their appointments, so only renames and duration changes need syncing
+    f'''CREATE TRIGGER IF NOT EXISTS service_schedule_update AFTER UPDATE OF name, duration ON service BEGIN
+        UPDATE {SCHEDULE_TABLE} SET service_name = new.name, duration = new.duration
+        WHERE business_id = new.business_id AND service_id = new.id;
+    END''',
+]
+
+
+# Rebuilds the view in one statement
+REBUILD = [f'''
+    INSERT INTO {SCHEDULE_TABLE} (business_id, date, time, appointment_id, duration, service_id, service_name, user_id, status, notes)
+    SELECT appointment.business_id, appointment.date, appointment.time, appointment.id, service.duration,
+           service.id, service.name, appointment.user_id, appointment.status, appointment.notes
+    FROM appointment JOIN service ON service.id = appointment.service_id
+''']
+
+# Registered as a derived table - other databases read the appointment index instead
+SCHEDULE_VIEW = register(SCHEDULE_TABLE, SCHEMA, REBUILD)
+
+
+# Day Schedule: Returns a business's appointments on a date in time order, each with its service name and duration
+def day_schedule(business_id, date):
+    if SCHEDULE_VIEW.enabled():
+        rows = db.session.execute(text(f'''
+            SELECT appointment_id, time, duration, service_id, service_name, user_id, status, notes
+            FROM {SCHEDULE_TABLE}
+            WHERE business_id = :business_id AND date = :date
+            ORDER BY time, appointment_id
+        '''), {'business_id': business_id, 'date': date.isoformat()}).all()
+
+        # Raw rows hold SQLite's text forms of the time and status columns
+        rows = [(id, datetime.strptime(time[:5], '%H:%M').time(), duration, service_id, service_name, user_id,
+                 AppointmentStatus[status], notes)
+                for id, time, duration, service_id, service_name, user_id, status, notes in rows]
+    else:
+        # The (business_id, date, time) index serves the same range on server databases
+        rows = db.session.query(
+            Appointment.id, Appointment.time, Service.duration, Service.id, Service.name,
+            Appointment.user_id, Appointment.status, Appointment.notes
+        ).join(Service, Appointment.service_id == Service.id).filter(
+            Appointment.business_id == business_id,
+            Appointment.date == date
+        ).order_by(Appointment.time, Appointment.id).all()
+
+    return [{
+        'id': id,
+        'time': time.strftime('%H:%M'),
+        'end': clock(minutes(time) + duration),
+        'duration': duration,
+        'service_id': service_id,
+        'service_name': service_name,
+        'user_id': user_id,
+        'status': status.value,
+        'notes': notes
+    } for id, time, duration, service_id, service_name, user_id, status, notes in rows]
@@ -0,0 +1,118 @@
+# Business Search Index
+    # An SQLite FTS5 table holds one row per business (name, city, state and service names)
+    # It is a derived table (server/derived.py) kept in sync by triggers on business and service
+
+
+# Import dependencies
+from flask import request
+from sqlalchemy import text
+from server.database import db
+import re
+
+# Import Models
+from server.models import Business, Service
+
+# Import Pagination
+from server.pagination import get_limit, encode_cursor, decode_cursor, paginate
+
+# Import Derived Tables
+from server.derived import register
+
+
+# Name of the FTS5 table - its rowid is the business ID
+SEARCH_TABLE = 'business_search'
+
+# Re-indexes one business from its current row and service names
+REINDEX_BUSINESS = '''
+    DELETE FROM business_search WHERE rowid = {id};
+    INSERT INTO business_search (rowid, name, city, state, services)
+    SELECT business.id, business.name, business.city, business.state,
+           (SELECT group_concat(service.name, ' ') FROM service WHERE service.business_id = business.id)
+    FROM business WHERE business.id = {id};
+'''
+
+# Index table and sync triggers
+    # prefix='2 3' adds prefix indexes so short "query*" terms are answered from the index
+SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(name, city, state, services, prefix='2 3')",
+
+    f'''CREATE TRIGGER IF NOT EXISTS business_search_insert AFTER INSERT ON business BEGIN
+        {REINDEX_BUSINESS.format(id='new.id')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS business_search_update AFTER UPDATE ON business BEGIN
+        {REINDEX_BUSINESS.format(id='new.id')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS business_search_delete AFTER DELETE ON business BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END''',
+
+    f'''CREATE TRIGGER IF NOT EXISTS service_search_insert AFTER INSERT ON service BEGIN
+        {REINDEX_BUSINESS.format(id='new.business_id')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS service_search_update AFTER UPDATE ON service BEGIN
+        {REINDEX_BUSINESS.format(id='old.business_id')}
+        {REINDEX_BUSINESS.format(id='new.business_id')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS service_search_delete AFTER DELETE ON service BEGIN
+        {REINDEX_BUSINESS.format(id='old.business_id')}
+    END''',
+]
+
+
+# Rebuilds the index in one statement
+REBUILD = [f'''
+    INSERT INTO {SEARCH_TABLE} (rowid, name, city, state, services)
+    SELECT business.id, business.name, business.city, business.state, group_concat(service.name, ' ')
+    FROM business LEFT JOIN service ON service.business_id = business.id
+    GROUP BY business.id
+''']
+
+# Registered as a derived table - FTS5 is only available on SQLite, other databases fall back to substring matching
+SEARCH_INDEX = register(SEARCH_TABLE, SCHEMA, REBUILD)
+
+
+# Match Expression: Converts free text to an FTS5 query where every word is a quoted prefix term
+    # 'braid rich' becomes '"braid"* "rich"*', which matches businesses containing both prefixes
+def match_expression(query):
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+# Search Businesses: Returns one page of businesses matching query, best match first, and the next page cursor
+def search_businesses(query, options=()):
+    if not SEARCH_INDEX.enabled():
+        # Substring matching scans both tables - only used when FTS5 is unavailable
+        pattern = f'%{query}%'
+        return paginate(Business.query.options(*options).filter(
+            (Business.name.ilike(pattern)) |
+            (Business.city.ilike(pattern)) |
+            (Business.state.ilike(pattern)) |
+            (Business.services.any(Service.name.ilike(pattern)))
+        ), Business.id)
+
+    expression = match_expression(query)
+    if not expression:
+        return [], None
+
+    limit = get_limit()
+    after = request.args.get('after')
+
+    # Results are ordered by bm25 rank, then business ID, so the cursor holds both
+    params = {'expression': expression, 'limit': limit + 1}
+    keyset = ''
+    if after:
+        params['rank'], params['id'] = decode_cursor(after, 2)
+        keyset = 'AND (rank > :rank OR (rank = :rank AND rowid > :id))'
+
+    matches = db.session.execute(text(f'''
+        SELECT rowid, rank FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH :expression {keyset}
+        ORDER BY rank, rowid
+        LIMIT :limit
+    '''), params).all()
+
+    next_cursor = encode_cursor([matches[limit - 1].rank, matches[limit - 1].rowid]) if len(matches) > limit else None
+    ids = [match.rowid for match in matches[:limit]]
+
+    # Load matching businesses and restore rank order
+    businesses = {business.id: business for business in Business.query.options(*options).filter(Business.id.in_(ids))}
+    return [businesses[id] for id in ids if id in businesses], next_cursor
@@ -0,0 +1,176 @@
+# Business Statistics
+    # An SQLite rollup table holds, per business, day and service, the number of appointments booked,
+    # cancelled and completed - a derived table (server/derived.py) kept in sync by triggers on appointment
+    # Its primary key starts with (business_id, date), so a date range is a single range read and a
+    # dashboard query costs O(days x services) however many appointments the business has
+    # Revenue is completed appointments times the service's current price, joined when the stats are read
+
+
+# Import dependencies
+from datetime import date as Date, timedelta
+from flask import current_app
+from sqlalchemy import func, text, case
+from server.database import db
+
+# Import Models
+from server.models import Appointment, Service, AppointmentStatus
+
+# Import Derived Tables
+from server.derived import register
+
+# Name of the rollup table
+STATS_TABLE = 'business_stats'
+
+# Default and longest date range served in one request (days)
+DEFAULT_STATS_DAYS = 30
+DEFAULT_MAX_STATS_DAYS = 366
+
+# Statuses are stored by name
+CANCELLED = AppointmentStatus.CANCELLED.name
+COMPLETED = AppointmentStatus.COMPLETED.name
+
+# Counts one appointment in its business, day and service
+ADD_APPOINTMENT = f'''
+    INSERT INTO {STATS_TABLE} (business_id, date, service_id, bookings, cancelled, completed)
+    VALUES (new.business_id, new.date, new.service_id, 1, new.status = '{CANCELLED}', new.status = '{COMPLETED}')
+    ON CONFLICT (business_id, date, service_id) DO UPDATE SET
+        bookings = bookings + excluded.bookings,
+        cancelled = cancelled + excluded.cancelled,
+        completed = completed + excluded.completed;
+'''
+
+# Removes one appointment from its counts, and drops the row once it counts nothing
+REMOVE_APPOINTMENT = f'''
+    UPDATE {STATS_TABLE} SET
+        bookings = bookings - 1,
+        cancelled = cancelled - (old.status = '{CANCELLED}'),
+        completed = completed - (old.status = '{COMPLETED}')
+    WHERE business_id = old.business_id AND date = old.date AND service_id = old.service_id;
+    DELETE FROM {STATS_TABLE}
+    WHERE business_id = old.business_id AND date = old.date AND service_id = old.service_id AND bookings = 0;
+'''
+
+# Rollup table and sync triggers
+SCHEMA = [
+    f'''CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+        business_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        service_id INTEGER NOT NULL,
+        bookings INTEGER NOT NULL,
+        cancelled INTEGER NOT NULL,
+        completed INTEGER NOT NULL,
+        PRIMARY KEY (business_id, date, service_id)
+    ) WITHOUT ROWID''',
+
+    f'''CREATE TRIGGER IF NOT EXISTS appointment_stats_insert AFTER INSERT ON appointment BEGIN
+        {ADD_APPOINTMENT}
+    END''',
+    # Moving an appointment or changing its status moves it between counts - notes and times don't count
+    f'''CREATE TRIGGER IF NOT EXISTS appointment_stats_update
+        AFTER UPDATE OF business_id, date, service_id, status ON appointment BEGIN
+        {REMOVE_APPOINTMENT}
+        {ADD_APPOINTMENT}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS appointment_stats_delete AFTER DELETE ON appointment BEGIN
+        {REMOVE_APPOINTMENT}
+    END''',
+]
+
+
+# Rebuilds the rollup in one statement
+REBUILD = [f'''
+    INSERT INTO {STATS_TABLE} (business_id, date, service_id, bookings, cancelled, completed)
+    SELECT business_id, date, service_id, COUNT(*), SUM(status = '{CANCELLED}'), SUM(status = '{COMPLETED}')
+    FROM appointment
+    GROUP BY business_id, date, service_id
+''']
+
+# Registered as a derived table - other databases aggregate the appointment index instead
+STATS_ROLLUP = register(STATS_TABLE, SCHEMA, REBUILD)
+
+
+# Stats Error: Raised when a date range cannot be parsed or is too long
+class StatsError(ValueError):
+    pass
+
+
+# Get Range: Returns the (start, end) dates requested in the query string
+    # end defaults to today and start to DEFAULT_STATS_DAYS days before end
+def get_range(args):
+    try:
+        end = Date.fromisoformat(args['end']) if args.get('end') else Date.today()
+        start = Date.fromisoformat(args['start']) if args.get('start') else end - timedelta(days=DEFAULT_STATS_DAYS - 1)
+    except ValueError:
+        raise StatsError('start and end must be YYYY-MM-DD')
+
+    if end < start:
+        raise StatsError('end must not be before start')
+    max_days = current_app.config.get('MAX_STATS_DAYS', DEFAULT_MAX_STATS_DAYS)
+    if (end - start).days + 1 > max_days:
+        raise StatsError(f'Date range cannot exceed {max_days} days')
+    return start, end
+
+
+# Daily Counts: Returns (date, service_id, bookings, cancelled, completed) rows for a business's date range
+def daily_counts(business_id, start, end):
+    if STATS_ROLLUP.enabled():
+        rows = db.session.execute(text(f'''
+            SELECT date, service_id, bookings, cancelled, completed
+            FROM {STATS_TABLE}
+            WHERE business_id = :business_id AND date BETWEEN :start AND :end
+        '''), {'business_id': business_id, 'start': start.isoformat(), 'end': end.isoformat()}).all()
+
+        # Raw rows hold SQLite's text form of the date
+        return [(Date.fromisoformat(date), *counts) for date, *counts in rows]
+
+    # The (business_id, date, time) index serves the same range on server databases
+    return db.session.query(
+        Appointment.date, Appointment.service_id, func.count(),
+        func.sum(case((Appointment.status == AppointmentStatus.CANCELLED, 1), else_=0)),
+        func.sum(case((Appointment.status == AppointmentStatus.COMPLETED, 1), else_=0))
+    ).filter(
+        Appointment.business_id == business_id,
+        Appointment.date >= start,
+        Appointment.date <= end
+    ).group_by(Appointment.date, Appointment.service_id).all()
+
+
+# Totals: Adds the cancellation rate and revenue to a dict of counts
+def totals(counts):
+    counts['cancellation_rate'] = round(counts['cancelled'] / counts['bookings'], 4) if counts['bookings'] else 0
+    counts['revenue'] = round(counts['revenue'], 2)
+    return counts
+
+
+# Business Stats: Returns bookings, cancellations, completions and revenue per day and per service for a date range
+    # Every day in the range is listed, with zeros for days without appointments
+def business_stats(business_id, start, end):
+    services = {id: (name, price) for id, name, price in db.session.query(Service.id, Service.name, Service.price).filter_by(business_id=business_id)}
+
+    def empty():
+        return {'bookings': 0, 'cancelled': 0, 'completed': 0, 'revenue': 0.0}
+
+    days = {start + timedelta(days=i): empty() for i in range((end - start).days + 1)}
+    per_service = {id: empty() for id in services}
+    total = empty()
+
+    for date, service_id, bookings, cancelled, completed in daily_counts(business_id, start, end):
+        revenue = completed * services[service_id][1] if service_id in services else 0.0
+        for counts in (days[date], per_service.setdefault(service_id, empty()), total):
+            counts['bookings'] += bookings
+            counts['cancelled'] += cancelled
+            counts['completed'] += completed
+            counts['revenue'] += revenue
+
+    return {
+        'business_id': business_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'totals': totals(total),
+        'days': [{'date': date.isoformat(), **totals(counts)} for date, counts in days.items()],
+        'services': [{
+            'service_id': id,
+            'name': services[id][0] if id in services else None,
+            **totals(counts)
+        } for id, counts in per_service.items()],
+    }
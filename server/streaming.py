@@ -0,0 +1,68 @@
+# Streaming Responses
+    # Exports whole collections without holding them in memory: rows are read in batches with yield_per
+    # and each batch is serialized and written to the response before the next one is read
+    # ?format=json (default) streams a JSON array, ?format=ndjson streams one JSON object per line
+
+
+# Import dependencies
+from flask import current_app, request, stream_with_context
+from itertools import islice
+import json
+
+# Rows read from the database and written to the response at a time
+DEFAULT_BATCH_SIZE = 1000
+
+# Supported formats and their content types
+FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Loading strategy for streamed queries - the only eager loader that works with yield_per,
+    # loading each batch's relationships with one extra SELECT per relationship
+STREAM_STRATEGY = 'select'
+
+
+# Stream Error: Raised when the requested format is not supported
+class StreamError(ValueError):
+    pass
+
+
+# Get Format: Returns the export format requested in the query string
+def get_format():
+    format = request.args.get('format', 'json')
+    if format not in FORMATS:
+        raise StreamError(f'format must be one of: {", ".join(FORMATS)}')
+    return format
+
+
+# Stream: Returns a response that writes query results as they are read, serializing each row with serialize(row)
+    # Arguments are validated before the response starts, so errors can still be returned as 400s
+def stream(query, serialize):
+    format = get_format()
+    batch_size = current_app.config.get('STREAM_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    # One compact encoder with the app's JSON settings, reused for every row
+    provider = current_app.json
+    dumps = json.JSONEncoder(
+        default=provider.default, ensure_ascii=provider.ensure_ascii, sort_keys=provider.sort_keys, separators=(',', ':')
+    ).encode
+
+    def generate():
+        ndjson = format == 'ndjson'
+        if not ndjson:
+            yield '['
+
+        rows = iter(query.yield_per(batch_size))
+        written = False
+        for batch in iter(lambda: list(islice(rows, batch_size)), []):
+            lines = [dumps(serialize(row)) for row in batch]
+            if ndjson:
+                yield '\n'.join(lines) + '\n'
+            else:
+                yield (',' if written else '') + ','.join(lines)
+            written = True
+
+        if not ndjson:
+            yield ']'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=FORMATS[format])
@@ -0,0 +1,34 @@
+# Access Tokens
+    # Tokens carry the user ID as their identity and the user summary as claims,
+    # so protected routes authenticate without looking up credentials or running bcrypt
+
+
+# Import dependencies
+from functools import wraps
+from flask import jsonify
+from flask_jwt_extended import create_access_token, get_jwt_identity, verify_jwt_in_request
+
+
+# Create User Token: Returns an access token for a user
+def create_user_token(user):
+    return create_access_token(
+        # JWT subjects must be strings
+        identity=str(user.id),
+        additional_claims=user.serialize(fields=('full_name', 'email', 'username'), expand=())
+    )
+
+
+# Current User ID: Returns the ID of the user the request's token was issued to
+def current_user_id():
+    return int(get_jwt_identity())
+
+
+# Owner Required: Decorator for /<user_id>/... routes - the token must belong to that user
+def owner_required(route):
+    @wraps(route)
+    def wrapper(*args, **kwargs):
+        verify_jwt_in_request()
+        if current_user_id() != kwargs['user_id']:
+            return jsonify({'error': 'Forbidden'}), 403
+        return route(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,9 @@
+# WSGI Entry Point
+    # Production servers import the app from here: flask serve, or gunicorn -c gunicorn.conf.py wsgi:app
+    # Workers only build the app - migrations are a separate step (flask migrate / flask serve --migrate)
+
+
+# Import App Factory
+from app import create_app
+
+app = create_app()